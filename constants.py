@@ -1,5 +1,8 @@
 TRAINED_MUSIC_DURATION_IN_SECONDS = 5
 
+# Unix domain socket of the service for a UI on the same host (not available on Windows)
+LOCAL_SOCKET = "/tmp/beatbot.sock"
+
 GTZAN_GENRES = [
     "Blues",
     "Classical",
@@ -0,0 +1,3 @@
+from .metrics import (DEFAULT_BUCKETS, REGISTRY, SIZE_BUCKETS, Counter, Gauge,
+                      Histogram, MetricsRegistry, stage)
+from .middleware import MetricsMiddleware
@@ -0,0 +1,289 @@
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Sequence, Tuple
+
+# latency buckets in seconds, from sub-millisecond model calls up to slow uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# payload buckets in bytes, 256 B to 64 MiB
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))
+
+
+class _Timer:
+    """Observe elapsed seconds in a histogram, as context manager or decorator.
+
+    As context manager, create one timer per 'with' block.
+    """
+
+    def __init__(self, histogram: '_HistogramChild'):
+        self._histogram = histogram
+        self._start = None
+
+    def __enter__(self) -> '_Timer':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+    def __call__(self, function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    self._histogram.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._histogram.observe(time.perf_counter() - start)
+        return wrapper
+
+
+class _CounterChild:
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError('Counters can only be increased.')
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        yield f'{name}_total{labels} {_format(self.value)}'
+
+
+class _GaugeChild:
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from function whenever metrics are exposed."""
+        self.function = function
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        value = self.value if self.function is None else self.function()
+        yield f'{name}{labels} {_format(value)}'
+
+
+class _HistogramChild:
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Timer observing elapsed seconds, usable as context manager or decorator."""
+        return _Timer(self)
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield f'{name}_bucket{_labels(labels, le=_format(bound))} {cumulative}'
+        yield f'{name}_sum{labels} {_format(total)}'
+        yield f'{name}_count{labels} {cumulative}'
+
+
+class _Metric:
+    """Metric family with one child per combination of label values."""
+
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        """Child metric of the given label values.
+
+        Returns:
+            Child with the methods of the metric (inc, set, observe, time, ...).
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(value) for value in values)
+        # lock-free fast path, children are only ever added
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}.')
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def expose(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {_escape_help(self.documentation)}'
+        yield f'# TYPE {self.name} {self.type_name}'
+        for values, child in list(self._children.items()):
+            labels = ','.join(f'{name}="{_escape_label(value)}"'
+                              for name, value in zip(self.labelnames, values))
+            yield from child.samples(self.name, f'{{{labels}}}' if labels else '')
+
+    def _new_child(self):
+        raise NotImplementedError()
+
+    def __getattr__(self, attribute: str):
+        # metrics without labels behave like their only child
+        if attribute.startswith('_') or self.labelnames:
+            raise AttributeError(attribute)
+        return getattr(self.labels(), attribute)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter, exposed as '<name>_total'."""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    """Value which goes up and down, e.g. in-flight requests or queue depth."""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, e.g. latencies."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class MetricsRegistry:
+    """Collection of metrics exposed together in Prometheus text format."""
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Register counter, or return the counter already registered with name."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Register gauge, or return the gauge already registered with name."""
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Register histogram, or return the histogram already registered with name."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def expose(self) -> str:
+        """All metrics in Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = [line for metric in metrics for line in metric.expose()]
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric_class: type, name: str, documentation: str,
+                  labelnames: Sequence[str], **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not metric_class or metric.labelnames != tuple(labelnames):
+                raise ValueError(f'Metric {name} is already registered differently.')
+            return metric
+
+
+# registry used by EasyMLServer and EasyMLService unless another one is passed
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'easymlserve_stage_duration_seconds',
+    'Duration of processing stages of a service.', ('service', 'stage'))
+
+
+def stage(service: str, name: str) -> _Timer:
+    """Timer of a processing stage, usable as context manager or decorator.
+
+    Args:
+        service (str): Name of the service.
+        name (str): Name of the stage, e.g. 'predict'.
+
+    Returns:
+        Timer observing 'easymlserve_stage_duration_seconds'.
+    """
+    return STAGE_SECONDS.labels(service, name).time()
+
+
+def _labels(labels: str, **extra) -> str:
+    """Label string with extra labels appended."""
+    pairs = [labels[1:-1]] if labels else []
+    pairs.extend(f'{name}="{value}"' for name, value in extra.items())
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
@@ -0,0 +1,73 @@
+import time
+
+from .metrics import REGISTRY, SIZE_BUCKETS, MetricsRegistry
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latencies, payload sizes and in-flight requests.
+
+    Routes are labeled with their path template, unmatched requests with 'unmatched',
+    so the number of label values stays bounded.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY, excluded_paths=('/metrics',)):
+        """Initialize metrics middleware.
+
+        Args:
+            app: ASGI app to instrument.
+            registry (MetricsRegistry, optional): Registry to record in. Defaults to REGISTRY.
+            excluded_paths (optional): Paths which are not recorded. Defaults to ('/metrics',).
+        """
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+        self.requests = registry.counter(
+            'easymlserve_requests', 'Number of HTTP requests.', ('method', 'route', 'status'))
+        self.latency = registry.histogram(
+            'easymlserve_request_duration_seconds', 'Latency of HTTP requests.',
+            ('method', 'route'))
+        self.in_flight = registry.gauge(
+            'easymlserve_requests_in_flight', 'Number of HTTP requests being processed.')
+        self.request_size = registry.histogram(
+            'easymlserve_request_size_bytes', 'Size of HTTP request bodies.',
+            ('route',), buckets=SIZE_BUCKETS)
+        self.response_size = registry.histogram(
+            'easymlserve_response_size_bytes', 'Size of HTTP response bodies.',
+            ('route',), buckets=SIZE_BUCKETS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get('body', b''))
+            return message
+
+        async def counting_send(message):
+            nonlocal response_bytes, status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                response_bytes += len(message.get('body', b''))
+            await send(message)
+
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight.dec()
+            # the router stores the matched route in the scope
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            method = scope['method']
+            self.requests.labels(method, route, status).inc()
+            self.latency.labels(method, route).observe(elapsed)
+            self.request_size.labels(route).observe(request_bytes)
+            self.response_size.labels(route).observe(response_bytes)
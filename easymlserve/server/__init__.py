@@ -1 +1,2 @@
-from .server import EasyMLServer
\ No newline at end of file
+from .rate_limit import RateLimit, RateLimiter
+from .server import EasyMLServer, ServiceMount
@@ -0,0 +1,25 @@
+from easymlserve.service.codec import LOCAL_TRANSPORT
+
+
+class LocalTransportMiddleware:
+    """ASGI middleware marking requests which arrived on the local socket of the server.
+
+    Only marked requests may reference shared memory segments (see LocalEasyMLClient),
+    the same body sent over TCP is rejected by the codec.
+    """
+
+    def __init__(self, app, socket_path: str):
+        """Initialize local transport middleware.
+
+        Args:
+            app: ASGI app to wrap.
+            socket_path (str): Path of the Unix domain socket of the server.
+        """
+        self.app = app
+        # uvicorn reports the path and no port as server address of Unix domain sockets
+        self.server = (socket_path, None)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] in ('http', 'websocket'):
+            scope[LOCAL_TRANSPORT] = tuple(scope.get('server') or ()) == self.server
+        await self.app(scope, receive, send)
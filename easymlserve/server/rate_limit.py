@@ -0,0 +1,178 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, Hashable
+
+from fastapi import HTTPException
+
+from easymlserve.metrics import REGISTRY, MetricsRegistry
+
+
+class RateLimit:
+    """Limits of one API key."""
+
+    def __init__(self,
+                 requests_per_second: float = None,
+                 bytes_per_second: float = None,
+                 burst: float = None,
+                 burst_bytes: float = None,
+                 max_concurrency: int = None):
+        """Initialize rate limit, None disables the respective limit.
+
+        Args:
+            requests_per_second (float, optional): Sustained request rate. Defaults to None.
+            bytes_per_second (float, optional): Sustained request body bytes per second. Defaults to None.
+            burst (float, optional): Requests allowed at once above the sustained rate.
+                                     Defaults to requests_per_second (at least 1).
+            burst_bytes (float, optional): Bytes allowed at once above the sustained rate.
+                                           Defaults to bytes_per_second.
+            max_concurrency (int, optional): Maximum number of requests in flight. Defaults to None.
+        """
+        self.requests_per_second = requests_per_second
+        self.bytes_per_second = bytes_per_second
+        self.burst = burst if burst is not None else max(1, requests_per_second or 0)
+        self.burst_bytes = burst_bytes if burst_bytes is not None else bytes_per_second
+        self.max_concurrency = max_concurrency
+
+
+class _TokenBucket:
+    """Token bucket refilled continuously with rate tokens per second up to capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float) -> float:
+        """Seconds until amount tokens are available, 0 if they are available now."""
+        # requests larger than the capacity pass once the bucket is full
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+
+class _KeyState:
+    """Buckets, in-flight requests and usage counters of one API key."""
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.requests = None if limit.requests_per_second is None else _TokenBucket(
+            limit.requests_per_second, limit.burst)
+        self.bytes = None if limit.bytes_per_second is None else _TokenBucket(
+            limit.bytes_per_second, limit.burst_bytes)
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.received_bytes = 0
+        self.lock = threading.Lock()
+
+
+class RateLimiter:
+    """Per API key token buckets for requests and request bytes plus concurrency caps.
+
+    Requests exceeding a limit are rejected with status 429, a 'Retry-After' header and
+    'X-RateLimit-Reset' (seconds until the request would pass). Usage per key is exported
+    as metrics, labeled with a short hash instead of the key itself.
+    """
+
+    def __init__(self, default: RateLimit = None, limits: Dict[Hashable, RateLimit] = None,
+                 registry: MetricsRegistry = REGISTRY):
+        """Initialize rate limiter.
+
+        Args:
+            default (RateLimit, optional): Limit of keys without own limit, None for no limit.
+                                           Defaults to None.
+            limits (Dict[Hashable, RateLimit], optional): Limits of single keys. Defaults to None.
+            registry (MetricsRegistry, optional): Registry of the usage counters. Defaults to REGISTRY.
+        """
+        self.default = default if default is not None else RateLimit()
+        self.limits = dict(limits or {})
+        self._states: Dict[Hashable, _KeyState] = {}
+        self._lock = threading.Lock()
+        self._requests = registry.counter(
+            'easymlserve_api_key_requests', 'Requests per API key and result.', ('key', 'result'))
+        self._bytes = registry.counter(
+            'easymlserve_api_key_request_bytes', 'Request body bytes per API key.', ('key',))
+
+    def acquire(self, key: Hashable, size: int = 0):
+        """Take one request and size bytes from the buckets of key.
+
+        Args:
+            key (Hashable): API key of the request.
+            size (int, optional): Size of the request body. Defaults to 0.
+
+        Raises:
+            HTTPException: 429 if a limit of key is exceeded.
+        """
+        state = self._state(key)
+        limit = state.limit
+        with state.lock:
+            now = time.monotonic()
+            wait, reason = 0.0, None
+            if limit.max_concurrency is not None and state.in_flight >= limit.max_concurrency:
+                # unknown when a running request finishes, retry soon
+                wait, reason = 1.0, 'concurrency'
+            for bucket, amount, name in ((state.requests, 1, 'requests'),
+                                         (state.bytes, size, 'bytes')):
+                if bucket is not None:
+                    bucket.refill(now)
+                    bucket_wait = bucket.wait(amount)
+                    if bucket_wait > wait:
+                        wait, reason = bucket_wait, name
+            if reason is not None:
+                state.rejected += 1
+            else:
+                if state.requests is not None:
+                    state.requests.tokens -= 1
+                if state.bytes is not None:
+                    state.bytes.tokens -= size
+                state.in_flight += 1
+                state.accepted += 1
+                state.received_bytes += size
+        key_id = self.key_id(key)
+        if reason is not None:
+            self._requests.labels(key_id, f'rejected_{reason}').inc()
+            raise HTTPException(status_code=429, detail=f'Rate limit exceeded ({reason})',
+                                headers={'Retry-After': str(max(1, math.ceil(wait))),
+                                         'X-RateLimit-Reset': f'{wait:.3f}'})
+        self._requests.labels(key_id, 'accepted').inc()
+        self._bytes.labels(key_id).inc(size)
+
+    def release(self, key: Hashable):
+        """Mark a request of key acquired before as finished."""
+        state = self._state(key)
+        with state.lock:
+            state.in_flight -= 1
+
+    def usage(self) -> Dict[str, Dict]:
+        """Usage of every key seen so far.
+
+        Returns:
+            Dict[str, Dict]: Accepted and rejected requests, received bytes and requests
+                             in flight per key id.
+        """
+        with self._lock:
+            states = list(self._states.items())
+        return {self.key_id(key): {'accepted': state.accepted, 'rejected': state.rejected,
+                                   'bytes': state.received_bytes, 'in_flight': state.in_flight}
+                for key, state in states}
+
+    @staticmethod
+    def key_id(key: Hashable) -> str:
+        """Short hash of key, safe to show in metrics and logs."""
+        return hashlib.blake2b(str(key).encode(), digest_size=4).hexdigest()
+
+    def _state(self, key: Hashable) -> _KeyState:
+        state = self._states.get(key)
+        if state is None:
+            with self._lock:
+                state = self._states.get(key)
+                if state is None:
+                    state = _KeyState(self.limits.get(key) or self.default)
+                    self._states[key] = state
+        return state
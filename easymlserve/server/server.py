@@ -1,29 +1,335 @@
-from imp import reload
+import multiprocessing
+import os
+import signal
+import socket
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Union
+
 import uvicorn
-from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
+from starlette.requests import HTTPConnection
 
+from easymlserve.metrics import REGISTRY, MetricsMiddleware
 from easymlserve.service import EasyMLService
 
+from .local_transport import LocalTransportMiddleware
+from .rate_limit import RateLimit, RateLimiter
+
+
+class ServiceMount:
+    """Service served under a route prefix with its own API keys."""
+
+    def __init__(self,
+                 service: Union[EasyMLService, Callable[[], EasyMLService]],
+                 prefix: str = '',
+                 api_keys=None,
+                 router_args: Dict = {}):
+        """Initialize service mount.
+
+        Args:
+            service (Union[EasyMLService, Callable[[], EasyMLService]]): Service or service factory.
+            prefix (str, optional): Route prefix, e.g. '/genre'. Defaults to ''.
+            api_keys (optional): Valid API keys of this service, the API keys of the server
+                                 if None. A dict maps keys to their own RateLimit. Defaults to None.
+            router_args (Dict, optional): Arguments for FastAPI include_router, e.g. tags. Defaults to {}.
+        """
+        self.service = service
+        self.prefix = prefix.rstrip('/')
+        self.api_keys = _key_set(api_keys)
+        self.router_args = router_args
+
+    def created(self) -> 'ServiceMount':
+        """Mount with the service created by its factory."""
+        if isinstance(self.service, EasyMLService):
+            return self
+        return ServiceMount(self.service(), self.prefix, self.api_keys, self.router_args)
+
 
 class EasyMLServer:
 
     def __init__(self,
-                 service: EasyMLService,
+                 service: Union[EasyMLService, Callable[[], EasyMLService], List[ServiceMount]],
                  api_keys=None,
-                 uvicorn_args={}):
-        self.app = FastAPI()
-        self.api_keys = api_keys
-        self.uvicorn_args=uvicorn_args
+                 uvicorn_args={},
+                 workers: int = 1,
+                 cpu_affinity: bool = False,
+                 threads_per_worker: int = None,
+                 metrics: bool = True,
+                 rate_limit: RateLimit = None,
+                 local_socket: str = None):
+        """Initialize EasyMLServer.
+
+        Args:
+            service (Union[EasyMLService, Callable[[], EasyMLService], List[ServiceMount]]): Service,
+                service factory (e.g. the service class) or several services mounted under
+                distinct prefixes. All services of a process share the event loop and thread pools.
+                Multiple workers need factories, every worker creates and loads its own services.
+            api_keys (optional): Valid API keys, no check if None. A dict maps keys to their
+                                 own RateLimit (or None for the default). Defaults to None.
+            uvicorn_args (dict, optional): Arguments for uvicorn. Defaults to {}.
+            workers (int, optional): Number of pre-forked worker processes sharing the
+                                     listening socket. Defaults to 1.
+            cpu_affinity (bool, optional): Pin workers to disjoint sets of CPU cores. Defaults to False.
+            threads_per_worker (int, optional): Size of the intra-op thread pool of every worker.
+                                                Defaults to the CPU cores available per worker.
+            metrics (bool, optional): Record request metrics and expose them on '/metrics'
+                                      in Prometheus text format. Every worker reports its own
+                                      metrics. Defaults to True.
+            rate_limit (RateLimit, optional): Limit of every API key without own limit, requests
+                                              beyond it are rejected with status 429. Every
+                                              worker limits on its own. Defaults to None.
+            local_socket (str, optional): Path of a Unix domain socket the services are served on
+                                          in addition, for UIs on the same host which pass arrays
+                                          in shared memory (see LocalEasyMLClient). Shared memory
+                                          bodies are rejected on every other listener. Defaults to None.
+        """
+        self.api_keys = _key_set(api_keys)
+        self.mounts = list(service) if isinstance(service, (list, tuple)) else [ServiceMount(service)]
+        prefixes = [mount.prefix for mount in self.mounts]
+        if len(set(prefixes)) != len(prefixes):
+            raise ValueError('Every service needs a distinct prefix.')
+        self.rate_limit = rate_limit
+        self.rate_limiter = self._create_rate_limiter()
+        self.uvicorn_args = dict(uvicorn_args)
+        self.workers = self.uvicorn_args.pop('workers', workers) or 1
+        self.cpu_affinity = cpu_affinity
+        self.threads_per_worker = threads_per_worker
+        self.metrics = metrics
+        self.local_socket = local_socket
+        self.app = None
 
-        if api_keys is not None:
-            self.app.include_router(service.router, dependencies=[Depends(self._validate_api_key)])
+        if self.workers > 1:
+            if any(isinstance(mount.service, EasyMLService) for mount in self.mounts):
+                raise ValueError(
+                    'Multiple workers need a service factory (e.g. the service class) '
+                    'instead of a service instance.')
         else:
-            self.app.include_router(service.router)
+            self._create_app([mount.created() for mount in self.mounts])
+
+    def _create_app(self, mounts: List[ServiceMount]):
+        """Create FastAPI app serving the services."""
+        self.app = FastAPI()
+        for mount in mounts:
+            api_keys = mount.api_keys if mount.api_keys is not None else self.api_keys
+            router_args = dict(mount.router_args)
+            if api_keys is not None:
+                router_args['dependencies'] = [Depends(self._api_key_dependency(api_keys)),
+                                               *router_args.get('dependencies', [])]
+            self.app.include_router(mount.service.router, prefix=mount.prefix, **router_args)
+            # load balancers probe readiness without an API key
+            self.app.include_router(mount.service.probe_router, prefix=mount.prefix,
+                                    **mount.router_args)
+            mount.service.register_metrics(mount.prefix)
+        if self.local_socket is not None:
+            self.app.add_middleware(LocalTransportMiddleware, socket_path=self.local_socket)
+        if self.metrics:
+            self.app.add_middleware(MetricsMiddleware)
+            self.app.add_api_route('/metrics', self._metrics_endpoint, methods=['GET'],
+                                   include_in_schema=False)
+
+    def _create_rate_limiter(self) -> RateLimiter:
+        """Rate limiter of all API keys, None if no key has a limit."""
+        key_sets = [self.api_keys] + [mount.api_keys for mount in self.mounts]
+        limits = {}
+        for api_keys in key_sets:
+            if isinstance(api_keys, dict):
+                limits.update({key: limit for key, limit in api_keys.items() if limit is not None})
+        if not limits and (self.rate_limit is None or all(keys is None for keys in key_sets)):
+            return None
+        # a key valid for several services shares its limit between them
+        return RateLimiter(self.rate_limit, limits)
 
-    def _validate_api_key(self, x_api_key: str = Header(...)):
-        """Check if 'x_api_key' in header is valid API key."""
-        if x_api_key not in self.api_keys:
-            raise HTTPException(status_code=400, detail='Invalid API Key')
+    @staticmethod
+    def _metrics_endpoint():
+        """Metrics in Prometheus text format."""
+        return Response(REGISTRY.expose(), media_type=REGISTRY.content_type)
+
+    def _api_key_dependency(self, api_keys) -> Callable:
+        """Create dependency checking the API key and its rate limit."""
+        async def validate_api_key(connection: HTTPConnection, x_api_key: str = Header(...)):
+            """Check if 'x_api_key' in header is valid API key and within its rate limit."""
+            if x_api_key not in api_keys:
+                raise HTTPException(status_code=400, detail='Invalid API Key')
+            if self.rate_limiter is None:
+                yield
+                return
+            # chunked bodies and WebSockets without Content-Length only count as requests
+            try:
+                size = int(connection.headers.get('content-length') or 0)
+            except ValueError:
+                size = -1
+            if size < 0:
+                raise HTTPException(status_code=400, detail='Invalid Content-Length header')
+            self.rate_limiter.acquire(x_api_key, size)
+            try:
+                yield
+            finally:
+                self.rate_limiter.release(x_api_key)
+
+        return validate_api_key
 
     def deploy(self):
-        uvicorn.run(self.app, **self.uvicorn_args)
+        if self.workers > 1:
+            self._deploy_workers()
+        elif self.local_socket is not None:
+            sockets = self._bind_sockets()
+            try:
+                self.serve(sockets)
+            finally:
+                self._close_sockets(sockets)
+        else:
+            uvicorn.run(self.app, **self.uvicorn_args)
+
+    def serve(self, sockets: List[socket.socket]):
+        """Serve app on already bound sockets."""
+        config = uvicorn.Config(self.app, **self.uvicorn_args)
+        uvicorn.Server(config).run(sockets=sockets)
+
+    def _deploy_workers(self):
+        """Pre-fork worker processes which accept connections on shared sockets."""
+        # invalid worker configurations fail before any socket is bound
+        cpu_sets = self._worker_cpu_sets()
+        context = multiprocessing.get_context('spawn')
+        processes = []
+
+        def terminate(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        sockets = self._bind_sockets()
+        try:
+            for i, cpus in enumerate(cpu_sets):
+                process = context.Process(
+                    target=_run_worker, name=f'easymlserve-worker-{i}',
+                    args=(self.mounts, self.api_keys, self.uvicorn_args, self.metrics,
+                          self.rate_limit, self.local_socket, sockets))
+                # workers inherit thread pool sizes and affinity right from the start
+                with _worker_environment(cpus, self._worker_threads(cpus)):
+                    process.start()
+                processes.append(process)
+
+            signal.signal(signal.SIGTERM, terminate)
+            try:
+                for process in processes:
+                    process.join()
+            except KeyboardInterrupt:
+                # workers receive SIGINT as well and shut down gracefully
+                for process in processes:
+                    process.join()
+        except BaseException:
+            terminate(None, None)
+            raise
+        finally:
+            self._close_sockets(sockets)
+
+    def _bind_sockets(self) -> List[socket.socket]:
+        """Bind the TCP socket and, if configured, the local Unix domain socket."""
+        sockets = [self._bind_socket()]
+        if self.local_socket is not None:
+            try:
+                sockets.append(self._bind_local_socket())
+            except BaseException:
+                sockets[0].close()
+                raise
+        return sockets
+
+    def _close_sockets(self, sockets: List[socket.socket]):
+        """Close sockets and remove the file of the local socket."""
+        for sock in sockets:
+            sock.close()
+        if self.local_socket is not None and os.path.exists(self.local_socket):
+            os.unlink(self.local_socket)
+
+    def _bind_socket(self) -> socket.socket:
+        """Bind listening socket shared by all workers."""
+        host = self.uvicorn_args.get('host', '127.0.0.1')
+        port = self.uvicorn_args.get('port', 8000)
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((host, port))
+            sock.listen(self.uvicorn_args.get('backlog', 2048))
+        except OSError:
+            sock.close()
+            raise
+        sock.set_inheritable(True)
+        return sock
+
+    def _bind_local_socket(self) -> socket.socket:
+        """Bind the Unix domain socket shared by all workers, replacing a stale socket file."""
+        if os.path.exists(self.local_socket):
+            os.unlink(self.local_socket)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.local_socket)
+        sock.listen(self.uvicorn_args.get('backlog', 2048))
+        sock.set_inheritable(True)
+        return sock
+
+    def _worker_cpu_sets(self) -> List[List[int]]:
+        """Split available CPU cores into one disjoint set per worker."""
+        if not self.cpu_affinity:
+            return [None] * self.workers
+        if not hasattr(os, 'sched_setaffinity'):
+            raise RuntimeError('CPU affinity is not supported on this platform.')
+        cpus = sorted(os.sched_getaffinity(0))
+        if self.workers > len(cpus):
+            raise ValueError(
+                f'Cannot pin {self.workers} workers to {len(cpus)} CPU cores.')
+        size, rest = divmod(len(cpus), self.workers)
+        cpu_sets, start = [], 0
+        for i in range(self.workers):
+            end = start + size + (1 if i < rest else 0)
+            cpu_sets.append(cpus[start:end])
+            start = end
+        return cpu_sets
+
+    def _worker_threads(self, cpus: List[int]) -> int:
+        """Number of intra-op threads for a worker."""
+        if self.threads_per_worker is not None:
+            return self.threads_per_worker
+        if cpus is not None:
+            return len(cpus)
+        return max(1, (os.cpu_count() or 1) // self.workers)
+
+
+@contextmanager
+def _worker_environment(cpus: List[int], threads: int):
+    """Temporarily set thread pool sizes and CPU affinity inherited by a new worker.
+
+    Thread pool variables explicitly set by the user are kept.
+    """
+    # small per-request graphs gain nothing from concurrent ops, workers provide the parallelism
+    variables = {'TF_NUM_INTRAOP_THREADS': threads,
+                 'TF_NUM_INTEROP_THREADS': 1,
+                 'OMP_NUM_THREADS': threads}
+    added = [key for key in variables if key not in os.environ]
+    for key in added:
+        os.environ[key] = str(variables[key])
+    if cpus is not None:
+        affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        if cpus is not None:
+            os.sched_setaffinity(0, affinity)
+        for key in added:
+            del os.environ[key]
+
+
+def _key_set(api_keys):
+    """API keys as set or dict for constant time lookups, None stays None."""
+    if api_keys is None or isinstance(api_keys, (set, frozenset, dict)):
+        return api_keys
+    return set(api_keys)
+
+
+def _run_worker(mounts: List[ServiceMount], api_keys, uvicorn_args: dict, metrics: bool,
+                rate_limit: RateLimit, local_socket: str, sockets: List[socket.socket]):
+    """Entry point of a worker process: create and load its own services and serve."""
+    server = EasyMLServer([mount.created() for mount in mounts], api_keys=api_keys,
+                          uvicorn_args=uvicorn_args, metrics=metrics, rate_limit=rate_limit,
+                          local_socket=local_socket)
+    server.serve(sockets=sockets)
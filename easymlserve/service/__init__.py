@@ -1 +1,7 @@
-from .service import EasyMLService
\ No newline at end of file
+from .batching import MicroBatcher
+from .cache import ResponseCache
+from .inference_queue import InferenceQueue
+from .numpy_model import NumpyModel, fold_scaler
+from .registry import ModelRegistry
+from .service import EasyMLService
+from .upload import memory_map
\ No newline at end of file
@@ -0,0 +1,108 @@
+import asyncio
+import inspect
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class MicroBatcher:
+    """Collect concurrent requests into batches for one vectorized call."""
+
+    def __init__(self,
+                 max_batch_size: int = 32,
+                 max_wait: float = 0.005):
+        """Initialize micro batcher.
+
+        Args:
+            max_batch_size (int, optional): Maximum number of requests per batch. Defaults to 32.
+            max_wait (float, optional): Maximum time in seconds the first request of a batch
+                                        waits for further requests. Defaults to 0.005.
+        """
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size has to be at least 1.')
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    async def submit(self, key: Hashable, item: Any,
+                     process_batch: Callable[[List], List]) -> Any:
+        """Add item to the batch of key and wait for its result.
+
+        Args:
+            key (Hashable): Batch key, only items with equal keys are batched together.
+            item (Any): Item to process.
+            process_batch (Callable[[List], List]): Vectorized function returning one result
+                                                    per item, coroutine functions are awaited.
+
+        Returns:
+            Any: Result of item.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(key, process_batch)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(
+                self.max_wait, self._flush, key, process_batch)
+        return await future
+
+    def _flush(self, key: Hashable, process_batch: Callable[[List], List]):
+        """Start processing all pending items of key."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        # callers which already gave up are not processed at all
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch, process_batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]],
+                   process_batch: Callable[[List], List]):
+        """Run batch in threadpool and hand every caller its own result."""
+        items = [item for item, _ in batch]
+        try:
+            results = await self._call(process_batch, items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f'process_batch returned {len(results)} results '
+                    f'for {len(items)} requests.')
+        except Exception as exception:
+            if len(batch) == 1:
+                self._set_exception(batch[0][1], exception)
+                return
+            # isolate failing requests instead of failing the whole batch
+            for item, future in batch:
+                try:
+                    result = (await self._call(process_batch, [item]))[0]
+                except Exception as item_exception:
+                    self._set_exception(future, item_exception)
+                else:
+                    self._set_result(future, result)
+            return
+        for (_, future), result in zip(batch, results):
+            self._set_result(future, result)
+
+    @staticmethod
+    async def _call(process_batch: Callable[[List], List], items: List) -> List:
+        """Await coroutine functions, run blocking functions in the threadpool."""
+        if inspect.iscoroutinefunction(process_batch):
+            return await process_batch(items)
+        return await run_in_threadpool(process_batch, items)
+
+    @staticmethod
+    def _set_result(future: asyncio.Future, result: Any):
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _set_exception(future: asyncio.Future, exception: Exception):
+        if not future.done():
+            future.set_exception(exception)
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+
+class ResponseCache:
+    """LRU response cache with time to live and memory bound.
+
+    Entries are keyed on a stable hash of the validated request and the model
+    version of the service, i.e. they are invalidated whenever the service reloads its models.
+    """
+
+    def __init__(self,
+                 max_entries: int = 4096,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600,
+                 excluded_routes: Iterable[str] = ()):
+        """Initialize response cache.
+
+        Args:
+            max_entries (int, optional): Maximum number of cached responses. Defaults to 4096.
+            max_bytes (int, optional): Maximum estimated size of all cached responses. Defaults to 64 MiB.
+            ttl (float, optional): Seconds a response stays valid, None to keep it until evicted.
+                                   Defaults to 3600.
+            excluded_routes (Iterable[str], optional): Routes which are never cached,
+                                                       e.g. '/process_batch'. Defaults to ().
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.excluded_routes = set(excluded_routes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_enabled(self, route: str) -> bool:
+        """Check whether responses of route are cached."""
+        return route not in self.excluded_routes
+
+    def key(self, namespace: str, request: Any, model_version: int = 0) -> str:
+        """Stable key of a validated request.
+
+        Args:
+            namespace (str): Namespace of the key, e.g. the processing method.
+            request (Any): Validated request (pydantic model, dict, list, array or scalar).
+            model_version (int, optional): Version of the loaded models. Defaults to 0.
+
+        Returns:
+            str: Hex digest identifying request.
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(f'{namespace}:{model_version}:'.encode())
+        _feed(hasher, request)
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look up cached response.
+
+        Args:
+            key (str): Key of the request.
+
+        Returns:
+            Tuple[bool, Any]: Whether a valid response was found and the response.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, size, value = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value: Any):
+        """Store response and evict least recently used responses if bounds are exceeded.
+
+        Args:
+            key (str): Key of the request.
+            value (Any): Response to cache.
+        """
+        size = len(key) + _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, size, value)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all cached responses."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict:
+        """Cache statistics.
+
+        Returns:
+            Dict: Number of entries, estimated size in bytes, hits, misses and evictions.
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size,
+                    'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+
+def _feed(hasher, value: Any):
+    """Feed canonical, type tagged representation of value into hasher."""
+    if isinstance(value, BaseModel):
+        hasher.update(f'M{type(value).__qualname__}('.encode())
+        for name, field in value:
+            hasher.update(f'{name}='.encode())
+            _feed(hasher, field)
+        hasher.update(b')')
+    elif isinstance(value, dict):
+        hasher.update(b'D{')
+        for name in sorted(value, key=repr):
+            _feed(hasher, name)
+            _feed(hasher, value[name])
+        hasher.update(b'}')
+    elif isinstance(value, (list, tuple)) and all(type(item) in (float, int) for item in value):
+        # fast path for plain number lists like feature vectors
+        hasher.update(f'N{value!r}'.encode())
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b'L[')
+        for item in value:
+            _feed(hasher, item)
+        hasher.update(b']')
+    elif isinstance(value, np.ndarray):
+        hasher.update(f'A{value.dtype.str}{value.shape}'.encode())
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        hasher.update(f'B{len(value)}:'.encode())
+        hasher.update(value)
+    else:
+        hasher.update(f'{type(value).__name__}:{value!r};'.encode())
+
+
+def _estimate_size(value: Any) -> int:
+    """Rough size in bytes of a response."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 32
+    if isinstance(value, BaseModel):
+        return sum(_estimate_size(field) for _, field in value) + 64
+    if isinstance(value, dict):
+        return sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_size(item) for item in value) + 56
+    return 32
@@ -0,0 +1,347 @@
+import io
+import json
+import os
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Type
+
+import numpy as np
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+NPY = 'application/x-npy'
+OCTET_STREAM = 'application/octet-stream'
+# JSON whose array values may reference shared memory segments of a client on the same host
+SHARED_MEMORY = 'application/x-easymlserve-shm'
+
+MSGPACK_TYPES = {MSGPACK, 'application/x-msgpack'}
+TENSOR_TYPES = {NPY, OCTET_STREAM}
+BINARY_TYPES = MSGPACK_TYPES | TENSOR_TYPES | {SHARED_MEMORY}
+
+SHAPE_HEADER = 'X-Tensor-Shape'
+DTYPE_HEADER = 'X-Tensor-Dtype'
+# set to 'unavailable' if referenced segments can not be attached, e.g. on another host
+SHARED_MEMORY_HEADER = 'X-Shared-Memory'
+# ASGI scope key set by the server on connections of its local socket, the only ones
+# allowed to reference shared memory
+LOCAL_TRANSPORT = 'easymlserve.local_transport'
+
+
+class BinaryBodyRoute(APIRoute):
+    """Route which hands binary request bodies to the endpoint instead of JSON validation.
+
+    The body of a binary request is stored in 'request.state.binary_body' and FastAPI
+    sees an empty body, so dependencies (e.g. API key checks) still run as usual.
+    Shared memory segments attached while decoding are closed after the response.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if media_type(request.headers.get('content-type')) in BINARY_TYPES:
+                request.state.binary_body = await request.body()
+                request.state.shared_memory = []
+                request = Request(request.scope, receive=_empty_body(request.receive))
+            try:
+                return await handler(request)
+            finally:
+                _close_shared_memory(request)
+
+        return route_handler
+
+
+def media_type(header: Optional[str]) -> str:
+    """Media type of a Content-Type header without parameters."""
+    if not header:
+        return ''
+    return header.split(';', 1)[0].strip().lower()
+
+
+def binary_body(http_request: Request) -> Optional[bytes]:
+    """Binary body stored by BinaryBodyRoute, None for JSON requests."""
+    return getattr(http_request.state, 'binary_body', None)
+
+
+def decode_request(http_request: Request, request_model: Type[BaseModel],
+                   tensor_field: str = None) -> Any:
+    """Decode binary body of http_request into one validated request.
+
+    Raw float32 (or 'X-Tensor-Dtype') and .npy bodies are put into tensor_field, other
+    fields are read from query parameters. msgpack bodies are maps of all fields,
+    binary values of tensor_field are read as float32.
+    """
+    content_type = media_type(http_request.headers.get('content-type'))
+    body = binary_body(http_request)
+    if content_type in MSGPACK_TYPES:
+        return _validate(request_model, _unpack(body), tensor_field)
+    if content_type == SHARED_MEMORY:
+        _require_local_transport(http_request)
+        fields = _shared_fields(http_request, _load_json(body), tensor_field)
+        return _validate(request_model, fields, tensor_field)
+    fields = dict(http_request.query_params)
+    fields[_require_tensor_field(tensor_field)] = _decode_tensor(http_request, body)
+    return _validate(request_model, fields, tensor_field)
+
+
+def decode_requests(http_request: Request, request_model: Type[BaseModel],
+                    tensor_field: str = None) -> List[Any]:
+    """Decode binary body of http_request into a list of validated requests.
+
+    Tensor bodies contain one row per request, all requests share the query parameters.
+    msgpack bodies are lists of maps.
+    """
+    content_type = media_type(http_request.headers.get('content-type'))
+    body = binary_body(http_request)
+    if content_type in MSGPACK_TYPES:
+        items = _unpack(body)
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail='Expected a msgpack list of requests')
+        return [_validate(request_model, item, tensor_field) for item in items]
+    if content_type == SHARED_MEMORY:
+        _require_local_transport(http_request)
+        items = _load_json(body)
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail='Expected a JSON list of requests')
+        return [_validate(request_model, _shared_fields(http_request, item, tensor_field),
+                          tensor_field) for item in items]
+    tensor_field = _require_tensor_field(tensor_field)
+    tensor = _decode_tensor(http_request, body)
+    if tensor.ndim < 2:
+        tensor = tensor.reshape(1, -1)
+    query = dict(http_request.query_params)
+    return [_validate(request_model, {**query, tensor_field: row}, tensor_field)
+            for row in tensor]
+
+
+def encode_response(response: Any, accept: Optional[str]) -> Optional[Response]:
+    """Encode response in the binary format preferred by the Accept header.
+
+    Returns:
+        Optional[Response]: Binary response, None if JSON should be used.
+    """
+    for media in _accepted(accept):
+        if media in (JSON, '*/*', 'application/*'):
+            return None
+        if media in MSGPACK_TYPES and msgpack is not None:
+            return Response(msgpack.packb(response, default=_packable, use_bin_type=True),
+                            media_type=MSGPACK)
+        if media == NPY and isinstance(response, np.ndarray):
+            buffer = io.BytesIO()
+            np.save(buffer, response, allow_pickle=False)
+            return Response(buffer.getvalue(), media_type=NPY)
+        if media == OCTET_STREAM and isinstance(response, np.ndarray):
+            return Response(np.ascontiguousarray(response).tobytes(), media_type=OCTET_STREAM,
+                            headers={SHAPE_HEADER: ','.join(map(str, response.shape)),
+                                     DTYPE_HEADER: response.dtype.str})
+    return None
+
+
+def _decode_tensor(http_request: Request, body: bytes) -> np.ndarray:
+    """Zero-copy view on a raw or .npy tensor body."""
+    if media_type(http_request.headers.get('content-type')) == NPY:
+        return _decode_npy(body)
+    try:
+        dtype = np.dtype(http_request.headers.get(DTYPE_HEADER, '<f4'))
+        tensor = np.frombuffer(body, dtype=dtype)
+        shape = http_request.headers.get(SHAPE_HEADER)
+        if shape:
+            tensor = tensor.reshape([int(size) for size in shape.split(',')])
+    except (TypeError, ValueError) as exception:
+        raise HTTPException(status_code=400, detail=f'Invalid tensor body: {exception}')
+    return tensor
+
+
+def _decode_npy(body: bytes) -> np.ndarray:
+    """Zero-copy view on the data of a .npy file."""
+    stream = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        if dtype.hasobject:
+            raise ValueError('object arrays are not supported')
+        tensor = np.frombuffer(body, dtype=dtype, count=int(np.prod(shape)),
+                               offset=stream.tell())
+    except ValueError as exception:
+        raise HTTPException(status_code=400, detail=f'Invalid .npy body: {exception}')
+    return tensor.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def _unpack(body: bytes) -> Any:
+    if msgpack is None:
+        raise HTTPException(status_code=415, detail='msgpack is not installed on the server')
+    try:
+        return msgpack.unpackb(body, raw=False)
+    except Exception as exception:
+        raise HTTPException(status_code=400, detail=f'Invalid msgpack body: {exception}')
+
+
+def _load_json(body: bytes) -> Any:
+    try:
+        return json.loads(body)
+    except ValueError as exception:
+        raise HTTPException(status_code=400, detail=f'Invalid JSON body: {exception}')
+
+
+def _shared_fields(http_request: Request, fields: Any, tensor_field: str) -> Any:
+    """Replace shared memory references in fields by arrays.
+
+    The tensor_field gets a zero-copy view on the segment, other fields a list.
+    """
+    if not isinstance(fields, dict):
+        return fields
+    resolved = {}
+    for key, value in fields.items():
+        if isinstance(value, dict) and {'shm', 'dtype', 'shape'} <= value.keys():
+            value = _attach_array(http_request, value)
+            if key != tensor_field:
+                value = value.tolist()
+        resolved[key] = value
+    return resolved
+
+
+def _attach_array(http_request: Request, reference: Dict) -> np.ndarray:
+    """View on the array in a shared memory segment of the client."""
+    try:
+        memory = _attach_shared_memory(reference['shm'])
+    except (FileNotFoundError, PermissionError, ValueError):
+        # not co-located with the client, it falls back to plain requests
+        raise HTTPException(status_code=409, detail='Shared memory segment not available',
+                            headers={SHARED_MEMORY_HEADER: 'unavailable'})
+    http_request.state.shared_memory.append(memory)
+    try:
+        dtype = np.dtype(reference['dtype'])
+        if dtype.hasobject:
+            raise ValueError('object arrays are not supported')
+        return np.ndarray(reference['shape'], dtype=dtype, buffer=memory.buf,
+                          offset=reference.get('offset', 0))
+    except (TypeError, ValueError) as exception:
+        raise HTTPException(status_code=400, detail=f'Invalid shared memory tensor: {exception}')
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment owned (and unlinked) by the client."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        # Python < 3.13 tracks attached segments and would unlink them on exit
+        if os.name == 'posix':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        return memory
+
+
+def _close_shared_memory(http_request: Request):
+    """Detach segments of a finished request, views still in use keep theirs attached."""
+    for memory in getattr(http_request.state, 'shared_memory', ()):
+        try:
+            memory.close()
+        except BufferError:
+            pass
+
+
+def _require_local_transport(http_request: Request):
+    """Reject shared memory bodies which did not arrive on the local socket of the server."""
+    if not http_request.scope.get(LOCAL_TRANSPORT, False):
+        raise HTTPException(status_code=415,
+                            detail='Shared memory bodies are only accepted on the local socket')
+
+
+def _require_tensor_field(tensor_field: str) -> str:
+    if tensor_field is None:
+        raise HTTPException(status_code=415,
+                            detail='This service does not accept tensor bodies')
+    return tensor_field
+
+
+def _validate(request_model: Type[BaseModel], fields: Any, tensor_field: str) -> Any:
+    """Validate fields against request_model without element-wise validation of the tensor."""
+    if not isinstance(fields, dict):
+        raise HTTPException(status_code=400, detail='Expected a map of request fields')
+    tensor = None
+    if tensor_field is not None and tensor_field in fields:
+        try:
+            tensor = _as_tensor(fields[tensor_field])
+        except (TypeError, ValueError) as exception:
+            raise HTTPException(status_code=400, detail=f'Invalid tensor: {exception}')
+        if tensor is not None:
+            fields = {**fields, tensor_field: []}
+    try:
+        request = request_model(**fields)
+    except ValidationError as exception:
+        raise RequestValidationError(exception.errors())
+    if tensor is not None:
+        setattr(request, tensor_field, tensor)
+    return request
+
+
+def _as_tensor(value: Any) -> Optional[np.ndarray]:
+    """Tensor of an already decoded or msgpack encoded value, None for plain lists."""
+    if isinstance(value, np.ndarray):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return np.frombuffer(value, dtype='<f4')
+    if isinstance(value, dict) and {'dtype', 'shape', 'data'} <= value.keys():
+        dtype = np.dtype(value['dtype'])
+        if dtype.hasobject:
+            raise ValueError('object arrays are not supported')
+        return np.frombuffer(value['data'], dtype=dtype).reshape(value['shape'])
+    return None
+
+
+def _packable(value: Any) -> Any:
+    """Convert values msgpack cannot serialize itself."""
+    if isinstance(value, np.ndarray):
+        return {'dtype': value.dtype.str, 'shape': list(value.shape),
+                'data': np.ascontiguousarray(value).tobytes()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, BaseModel):
+        return dict(value)
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def _accepted(accept: Optional[str]) -> List[str]:
+    """Media types of an Accept header ordered by preference."""
+    if not accept:
+        return []
+    media_types = []
+    for i, part in enumerate(accept.split(',')):
+        media, *parameters = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for parameter in parameters:
+            if parameter.startswith('q='):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            media_types.append((-quality, i, media.lower()))
+    return [media for _, _, media in sorted(media_types)]
+
+
+def _empty_body(receive):
+    """ASGI receive which first reports an empty body, then delegates to receive."""
+    sent = False
+
+    async def wrapper() -> Dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        return await receive()
+
+    return wrapper
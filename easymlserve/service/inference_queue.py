@@ -0,0 +1,114 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, Request
+
+
+class InferenceQueue:
+    """Bounded queue in front of the inference path with load shedding.
+
+    At most 'max_concurrency' requests are processed at once, at most 'max_queue_size'
+    further requests wait for a free slot. Requests beyond that are rejected at once
+    instead of piling up in the threadpool. Together with a MicroBatcher, 'max_concurrency'
+    also bounds the size of the batches.
+    """
+
+    deadline_header = 'X-Request-Deadline'
+
+    def __init__(self,
+                 max_concurrency: int = 4,
+                 max_queue_size: int = 64,
+                 retry_after: int = 1,
+                 status_code: int = 503,
+                 poll_interval: float = 0.05):
+        """Initialize inference queue.
+
+        Args:
+            max_concurrency (int, optional): Maximum number of requests processed at once. Defaults to 4.
+            max_queue_size (int, optional): Maximum number of waiting requests. Defaults to 64.
+            retry_after (int, optional): Seconds sent in 'Retry-After' header if queue is full. Defaults to 1.
+            status_code (int, optional): Status code if queue is full, 503 or 429. Defaults to 503.
+            poll_interval (float, optional): Seconds between checks whether a waiting client
+                                             disconnected. Defaults to 0.05.
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency has to be at least 1.')
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.retry_after = retry_after
+        self.status_code = status_code
+        self.poll_interval = poll_interval
+        self.waiting = 0
+        self.running = 0
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def slot(self, http_request: Request = None):
+        """Wait for a free processing slot.
+
+        Args:
+            http_request (Request, optional): Request to read the deadline header from and
+                                              to watch for client disconnects. Defaults to None.
+
+        Raises:
+            HTTPException: 503/429 if queue is full, 504 if deadline expired, 499 if client disconnected.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        deadline = self._deadline(http_request)
+        self._check_deadline(deadline)
+        if self._semaphore.locked() and self.waiting >= self.max_queue_size:
+            raise HTTPException(status_code=self.status_code,
+                                detail='Inference queue is full',
+                                headers={'Retry-After': str(self.retry_after)})
+        self.waiting += 1
+        try:
+            await self._acquire(deadline, http_request)
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    async def _acquire(self, deadline: float, http_request: Request):
+        """Acquire semaphore unless deadline expires or client disconnects first."""
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            while True:
+                timeout = self.poll_interval
+                if deadline is not None:
+                    timeout = max(0, min(timeout, deadline - time.time()))
+                done, _ = await asyncio.wait({acquire}, timeout=timeout)
+                if done:
+                    return
+                self._check_deadline(deadline)
+                if http_request is not None and await http_request.is_disconnected():
+                    raise HTTPException(status_code=499, detail='Client disconnected')
+        except BaseException:
+            if acquire.done() and not acquire.cancelled():
+                self._semaphore.release()
+            else:
+                acquire.cancel()
+            raise
+
+    def _deadline(self, http_request: Request) -> float:
+        """Absolute deadline (UNIX timestamp in seconds) sent by the client, if any."""
+        if http_request is None:
+            return None
+        value = http_request.headers.get(self.deadline_header)
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise HTTPException(status_code=400,
+                                detail=f'Invalid {self.deadline_header} header')
+
+    @staticmethod
+    def _check_deadline(deadline: float):
+        if deadline is not None and time.time() >= deadline:
+            raise HTTPException(status_code=504, detail='Request deadline expired')
@@ -0,0 +1,252 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Union
+
+import numpy as np
+
+
+class _Entry:
+    """Registered model and its bookkeeping."""
+
+    def __init__(self, loader: Callable[[], Any], pinned: bool,
+                 size: Union[int, Callable[[Any], int]]):
+        self.loader = loader
+        self.pinned = pinned
+        self.size_hint = size
+        self.model = None
+        self.size = 0
+        self.loads = 0
+        self.last_used = None
+        self.load_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Registry of lazily loaded models with memory budget and LRU eviction.
+
+    Models are registered with a loader and loaded on first use. If the estimated
+    memory of all loaded models exceeds the budget, the least recently used models
+    which are not pinned are unloaded again.
+    """
+
+    def __init__(self, memory_budget: int = None):
+        """Initialize model registry.
+
+        Args:
+            memory_budget (int, optional): Maximum estimated bytes of all loaded models,
+                                           None for no limit. Defaults to None.
+        """
+        self.memory_budget = memory_budget
+        self.memory_usage = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+    def register(self, key: Hashable, loader: Callable[[], Any], pinned: bool = False,
+                 size: Union[int, Callable[[Any], int]] = None):
+        """Register model loader, an already loaded model with the same key is dropped.
+
+        Args:
+            key (Hashable): Key to request the model with.
+            loader (Callable[[], Any]): Function loading the model.
+            pinned (bool, optional): Never evict the model once loaded. Defaults to False.
+            size (Union[int, Callable[[Any], int]], optional): Bytes of the loaded model or function
+                computing them. Defaults to an estimate of the arrays held by the model.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.unload(key)
+            self._entries[key] = _Entry(loader, pinned, size)
+
+    def get(self, key: Hashable) -> Any:
+        """Return model of key, load it if necessary.
+
+        Args:
+            key (Hashable): Key of the model.
+
+        Raises:
+            KeyError: If no model is registered with key.
+
+        Returns:
+            Any: Loaded model.
+        """
+        entry = self._entry(key)
+        with self._lock:
+            if entry.model is not None:
+                return self._touch(key, entry)
+        # different models load concurrently, the same model only once
+        with entry.load_lock:
+            with self._lock:
+                if entry.model is not None:
+                    return self._touch(key, entry)
+            model = entry.loader()
+            size = self._measure(entry, model)
+            with self._lock:
+                if self._entries.get(key) is not entry:
+                    # registration was replaced while loading
+                    return model
+                entry.model = model
+                entry.size = size
+                entry.loads += 1
+                self.memory_usage += size
+                self._touch(key, entry)
+                self._evict(keep=key)
+            return model
+
+    def pin(self, key: Hashable, pinned: bool = True):
+        """Pin (or unpin) model, pinned models are never evicted."""
+        with self._lock:
+            self._entry(key).pinned = pinned
+            if not pinned:
+                self._evict()
+
+    def unload(self, key: Hashable):
+        """Unload model of key, it is loaded again on next use."""
+        with self._lock:
+            entry = self._entry(key)
+            if entry.model is not None:
+                self.memory_usage -= entry.size
+                entry.model = None
+                entry.size = 0
+
+    def is_loaded(self, key: Hashable) -> bool:
+        """Check whether model of key is loaded."""
+        return self._entry(key).model is not None
+
+    def is_pinned(self, key: Hashable) -> bool:
+        """Check whether model of key is pinned."""
+        return self._entry(key).pinned
+
+    def keys(self) -> List[Hashable]:
+        """Keys of all registered models."""
+        with self._lock:
+            return list(self._entries)
+
+    def namespace(self, name: Hashable) -> 'RegistryNamespace':
+        """View on the registry which prefixes all keys with name.
+
+        Services sharing one registry and its memory budget use distinct namespaces,
+        so their model keys do not collide.
+
+        Args:
+            name (Hashable): Name of the namespace, e.g. the service name.
+
+        Returns:
+            RegistryNamespace: Registry view with the interface of ModelRegistry.
+        """
+        return RegistryNamespace(self, name)
+
+    def memory_report(self) -> List[Dict]:
+        """Memory and usage of every registered model.
+
+        Returns:
+            List[Dict]: Key, loaded and pinned state, estimated bytes, number of loads
+                        and seconds since last use of every model.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{'key': key,
+                     'loaded': entry.model is not None,
+                     'pinned': entry.pinned,
+                     'bytes': entry.size,
+                     'loads': entry.loads,
+                     'idle_seconds': None if entry.last_used is None else now - entry.last_used}
+                    for key, entry in self._entries.items()]
+
+    def _entry(self, key: Hashable) -> _Entry:
+        try:
+            return self._entries[key]
+        except KeyError:
+            raise KeyError(f'No model registered with key {key!r}.')
+
+    def _touch(self, key: Hashable, entry: _Entry) -> Any:
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry.model
+
+    def _evict(self, keep: Hashable = None):
+        """Unload least recently used, unpinned models until the budget is met."""
+        if self.memory_budget is None:
+            return
+        for key, entry in list(self._entries.items()):
+            if self.memory_usage <= self.memory_budget:
+                return
+            if entry.model is not None and not entry.pinned and key != keep:
+                self.unload(key)
+
+    @staticmethod
+    def _measure(entry: _Entry, model: Any) -> int:
+        if entry.size_hint is None:
+            return estimate_size(model)
+        if callable(entry.size_hint):
+            return entry.size_hint(model)
+        return entry.size_hint
+
+
+class RegistryNamespace:
+    """Models of one namespace of a shared ModelRegistry, keys are stored as (name, key)."""
+
+    def __init__(self, registry: ModelRegistry, name: Hashable):
+        self.registry = registry
+        self.name = name
+
+    @property
+    def memory_budget(self) -> int:
+        return self.registry.memory_budget
+
+    @property
+    def memory_usage(self) -> int:
+        return self.registry.memory_usage
+
+    def register(self, key: Hashable, loader: Callable[[], Any], pinned: bool = False,
+                 size: Union[int, Callable[[Any], int]] = None):
+        self.registry.register((self.name, key), loader, pinned=pinned, size=size)
+
+    def get(self, key: Hashable) -> Any:
+        return self.registry.get((self.name, key))
+
+    def pin(self, key: Hashable, pinned: bool = True):
+        self.registry.pin((self.name, key), pinned)
+
+    def unload(self, key: Hashable):
+        self.registry.unload((self.name, key))
+
+    def is_loaded(self, key: Hashable) -> bool:
+        return self.registry.is_loaded((self.name, key))
+
+    def is_pinned(self, key: Hashable) -> bool:
+        return self.registry.is_pinned((self.name, key))
+
+    def keys(self) -> List[Hashable]:
+        return [key[1] for key in self.registry.keys() if self._owns(key)]
+
+    def memory_report(self) -> List[Dict]:
+        return [{**report, 'key': report['key'][1]}
+                for report in self.registry.memory_report() if self._owns(report['key'])]
+
+    def _owns(self, key: Hashable) -> bool:
+        return isinstance(key, tuple) and len(key) == 2 and key[0] == self.name
+
+
+def estimate_size(model: Any, _seen: set = None) -> int:
+    """Estimate bytes held by a model from its arrays.
+
+    Handles arrays, containers, Keras-like models (get_weights) and objects keeping
+    their parameters as array attributes (e.g. scikit-learn estimators).
+    """
+    seen = set() if _seen is None else _seen
+    if id(model) in seen:
+        return 0
+    seen.add(id(model))
+    if isinstance(model, np.ndarray):
+        return model.nbytes
+    if isinstance(model, (list, tuple, set)):
+        return sum(estimate_size(item, seen) for item in model)
+    if isinstance(model, dict):
+        return sum(estimate_size(item, seen) for item in model.values())
+    if hasattr(model, 'get_weights'):
+        return sum(np.asarray(weight).nbytes for weight in model.get_weights())
+    if hasattr(model, '__dict__'):
+        return sys.getsizeof(model) + sum(estimate_size(value, seen)
+                                          for value in vars(model).values())
+    return sys.getsizeof(model)
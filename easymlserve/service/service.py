@@ -1,27 +1,130 @@
-from typing import Dict
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
 
-from fastapi import APIRouter
+from fastapi import (APIRouter, Body, HTTPException, Request, UploadFile, WebSocket,
+                     WebSocketDisconnect)
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel
+
+from easymlserve.metrics import REGISTRY, stage
+
+from .batching import MicroBatcher
+from .cache import ResponseCache
+from .codec import (BinaryBodyRoute, MSGPACK, NPY, OCTET_STREAM, binary_body,
+                    decode_request, decode_requests, encode_response)
+from .inference_queue import InferenceQueue
+from .registry import ModelRegistry
+from .upload import receive_upload, upload_route_args
+
+logger = logging.getLogger(__name__)
 
 
 class EasyMLService:
     """EasyMLServe Service base class every Service need to implement."""
 
-    def __init__(self, route_args: Dict = {}):
+    # field of the request model which takes raw float32, .npy or msgpack binary tensors
+    tensor_field: str = None
+    # bytes of an upload kept in memory before it is spooled to disk, and the size limit of uploads
+    upload_spool_size: int = 1024 * 1024
+    max_upload_bytes: int = None
+
+    def __init__(self,
+                 route_args: Dict = {},
+                 batcher: MicroBatcher = None,
+                 queue: InferenceQueue = None,
+                 cache: ResponseCache = None,
+                 registry: ModelRegistry = None,
+                 preload_models: Iterable[Hashable] = None,
+                 warmup_batch_sizes: Iterable[int] = (),
+                 load_workers: int = 4):
         """Initialize EasyMLService base class.
 
         Args:
             route_args (Dict, optional): Arguments for FastAPI route. Defaults to {}.
+            batcher (MicroBatcher, optional): Batch concurrent '/process' calls
+                                              into one 'process_batch' call. Defaults to None.
+            queue (InferenceQueue, optional): Bound concurrent and waiting requests. Defaults to None.
+            cache (ResponseCache, optional): Cache responses of repeated requests. Defaults to None.
+            registry (ModelRegistry, optional): Registry the service loads its models from, services
+                                                sharing a registry use 'registry.namespace(name)'.
+                                                Defaults to a new registry without memory budget.
+            preload_models (Iterable[Hashable], optional): Keys of registered models loaded at
+                                                           startup, other models are loaded on first
+                                                           use. Defaults to the pinned models.
+            warmup_batch_sizes (Iterable[int], optional): Batch sizes 'warmup' runs with after
+                                                          loading. Defaults to ().
+            load_workers (int, optional): Threads loading models in parallel at startup. Defaults to 4.
         """
         self.router = APIRouter()
-        self.router.add_api_route('/process', self.process,
-                                  methods=['POST'], **route_args)
+        # health and readiness probes, served without API key check
+        self.probe_router = APIRouter()
+        self.batcher = batcher
+        self.queue = queue
+        self.cache = cache
+        self.model_version = 0
+        self.models = registry if registry is not None else ModelRegistry()
+        self.preload_models = preload_models
+        self.warmup_batch_sizes = list(warmup_batch_sizes)
+        self.load_workers = load_workers
+        self.ready = False
+        self._warmup_started = False
+        self.router.add_api_route('/process', self._process_endpoint(),
+                                  methods=['POST'], route_class_override=BinaryBodyRoute,
+                                  **self._binary_route_args(route_args))
+        self.router.add_api_route('/process_batch', self._process_batch_endpoint(),
+                                  methods=['POST'], route_class_override=BinaryBodyRoute,
+                                  **self._binary_route_args(self._batch_route_args(route_args)))
+        self.probe_router.add_api_route('/models', self.models.memory_report, methods=['GET'])
+        self.probe_router.add_api_route('/ready', self._ready_endpoint, methods=['GET'])
+        if type(self).process_stream is not EasyMLService.process_stream:
+            self.router.add_api_websocket_route('/stream', self._stream_endpoint)
+        if type(self).process_upload is not EasyMLService.process_upload:
+            self.router.add_api_route('/upload', self._upload_endpoint, methods=['POST'],
+                                      **upload_route_args({}))
+        self.router.on_startup.append(self._start_warmup)
         self.route_args = route_args
         self.load_model()
 
+    def __init_subclass__(cls, **kwargs):
+        """Invalidate cached responses whenever a child class (re)loads its models."""
+        super().__init_subclass__(**kwargs)
+        if 'load_model' in cls.__dict__:
+            cls.load_model = _invalidates_cache(cls.__dict__['load_model'])
+
     def load_model(self):
-        """Optional load model routine."""
+        """Optional load model routine, e.g. registering model loaders at self.models."""
+        pass
+
+    def warmup(self, batch_size: int):
+        """Optional warm-up routine, e.g. predicting a dummy batch with every loaded model.
+
+        Args:
+            batch_size (int): Size of the dummy batch.
+        """
         pass
 
+    def prepare(self):
+        """Load models in parallel, warm them up and mark the service as ready."""
+        if self.preload_models is None:
+            keys = [key for key in self.models.keys() if self.models.is_pinned(key)]
+        else:
+            keys = list(self.preload_models)
+        if keys:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.load_workers, len(keys))),
+                                    thread_name_prefix='easymlserve-load') as pool:
+                list(pool.map(self.models.get, keys))
+        for batch_size in self.warmup_batch_sizes:
+            self.warmup(batch_size)
+        self.ready = True
+
     def api_call(self, **kwargs) -> Dict:
         """Process incomming REST API call.
 
@@ -32,3 +135,342 @@ class EasyMLService:
             Dict: JSON response of API call.
         """
         raise NotImplementedError('TODO')
+
+    def process_batch(self, requests: List) -> List:
+        """Process a batch of requests at once.
+
+        Services should override this method with a vectorized implementation.
+        The default processes every request on its own, an 'async def process' is
+        awaited for all requests concurrently instead (see '_batch_processor').
+
+        Args:
+            requests (List): Validated requests to process.
+
+        Returns:
+            List: One response per request in the same order.
+        """
+        return [self.process(request) for request in requests]
+
+    def open_stream(self, params: Dict) -> Any:
+        """Create the state of a new '/stream' connection, e.g. buffers of the received audio.
+
+        Args:
+            params (Dict): Query parameters of the WebSocket connection.
+
+        Raises:
+            ValueError: If params are invalid, the connection is closed.
+
+        Returns:
+            Any: State passed to every 'process_stream' call of the connection.
+        """
+        return None
+
+    def process_stream(self, state: Any, chunk: bytes) -> List:
+        """Process a binary chunk received on '/stream'.
+
+        Services implementing this method get a WebSocket route '/stream'.
+
+        Args:
+            state (Any): State created by 'open_stream'.
+            chunk (bytes): Received binary message.
+
+        Returns:
+            List: JSON results to send back, e.g. one per completed window.
+        """
+        raise NotImplementedError()
+
+    def process_upload(self, file: UploadFile, params: Dict) -> Any:
+        """Process a file uploaded to '/upload', e.g. a large audio or CSV file.
+
+        Services implementing this method get a route '/upload'. The body is streamed
+        into a spooled temporary file, at most 'upload_spool_size' bytes are held in
+        memory. Read it incrementally with 'file.file.read(size)' or map it with
+        'easymlserve.service.memory_map(file)'.
+
+        Args:
+            file (UploadFile): Received upload positioned at its start.
+            params (Dict): Query parameters, or the other fields of a multipart body.
+
+        Returns:
+            Any: JSON response of the upload.
+        """
+        raise NotImplementedError()
+
+    def batch_key(self, request: Any) -> Hashable:
+        """Key of requests which may be processed in the same batch.
+
+        Args:
+            request (Any): Validated request.
+
+        Returns:
+            Hashable: Batch key. Defaults to None, i.e. all requests are batched together.
+        """
+        return None
+
+    def stage(self, name: str):
+        """Timer of a processing stage, exposed on '/metrics' of the server.
+
+        Usable as context manager ('with self.stage("predict"): ...') or decorator.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        return stage(type(self).__name__, name)
+
+    def register_metrics(self, prefix: str = ''):
+        """Expose queue depth of the service as gauges, called by the server when mounting it.
+
+        Args:
+            prefix (str, optional): Route prefix the service is mounted under, it tells
+                                    mounts of the same service class apart. Defaults to ''.
+        """
+        if self.queue is None:
+            return
+        labels = (type(self).__name__, prefix or '/')
+        waiting = REGISTRY.gauge('easymlserve_queue_waiting',
+                                 'Requests waiting for a processing slot.', ('service', 'prefix'))
+        running = REGISTRY.gauge('easymlserve_queue_running',
+                                 'Requests being processed.', ('service', 'prefix'))
+        waiting.labels(*labels).set_function(lambda: self.queue.waiting)
+        running.labels(*labels).set_function(lambda: self.queue.running)
+
+    def _start_warmup(self):
+        """Prepare the service in the background, the server accepts requests meanwhile."""
+        # depending on the FastAPI version, startup handlers of included routers may run twice
+        if self._warmup_started:
+            return
+        self._warmup_started = True
+
+        def prepare():
+            try:
+                self.prepare()
+            except Exception:
+                logger.exception('Preparing %s failed, service stays not ready.',
+                                 type(self).__name__)
+
+        threading.Thread(target=prepare, name='easymlserve-warmup', daemon=True).start()
+
+    def _ready_endpoint(self):
+        """Readiness probe, 503 until models are loaded and warmed up."""
+        return JSONResponse({'ready': self.ready}, status_code=200 if self.ready else 503)
+
+    async def _stream_endpoint(self, websocket: WebSocket):
+        """WebSocket receiving binary chunks and pushing results as soon as they are ready."""
+        try:
+            state = await self._call(self.open_stream, dict(websocket.query_params))
+        except ValueError as exception:
+            await websocket.close(code=1008, reason=str(exception))
+            return
+        await websocket.accept()
+        try:
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    return
+                if message.get('bytes') is None:
+                    await websocket.close(code=1003, reason='Expected binary chunks')
+                    return
+                # chunks share the inference queue with the HTTP requests
+                try:
+                    async with self._admit(None):
+                        with self.stage('stream'):
+                            results = await self._call(self.process_stream, state,
+                                                       message['bytes'])
+                except HTTPException as exception:
+                    await websocket.close(code=1013, reason=str(exception.detail))
+                    return
+                for result in results:
+                    await websocket.send_json(result)
+        except WebSocketDisconnect:
+            pass
+
+    async def _upload_endpoint(self, http_request: Request):
+        """Endpoint receiving a streamed upload and passing it to process_upload."""
+        async with receive_upload(http_request, self.upload_spool_size,
+                                  self.max_upload_bytes) as (file, params):
+            async with self._admit(http_request):
+                with self.stage('process_upload'):
+                    response = await self._call(self.process_upload, file, params)
+        return self._encode(response, http_request)
+
+    def _process_endpoint(self):
+        """Create '/process' endpoint running process or the batcher behind the queue."""
+        async def endpoint(request=None, *, http_request: Request):
+            if request is None:
+                with self.stage('decode'):
+                    request = self._decode_binary(http_request, decode_request)
+            key = self._cache_key('/process', request)
+            if key is not None:
+                found, response = self.cache.get(key)
+                if found:
+                    return self._encode(response, http_request)
+            async with self._admit(http_request):
+                with self.stage('process'):
+                    if self.batcher is not None:
+                        response = await self.batcher.submit(
+                            self.batch_key(request), request, self._batch_processor())
+                    else:
+                        response = await self._call(self.process, request)
+            if key is not None:
+                self.cache.put(key, response)
+            return self._encode(response, http_request)
+
+        # expose the signature of process so FastAPI validates the same request model,
+        # binary bodies are not validated by FastAPI and arrive as None
+        signature = inspect.signature(self.process)
+        parameters = list(signature.parameters.values())
+        parameters[0] = parameters[0].replace(
+            name='request', default=Body(None),
+            annotation=self._optional(parameters[0].annotation))
+        endpoint.__signature__ = self._with_http_request(
+            signature.replace(parameters=parameters))
+        endpoint.__name__ = self.process.__name__
+        endpoint.__doc__ = self.process.__doc__
+        return endpoint
+
+    def _process_batch_endpoint(self):
+        """Create '/process_batch' endpoint taking a list of '/process' requests."""
+        async def endpoint(requests=None, *, http_request: Request):
+            if requests is None:
+                with self.stage('decode'):
+                    requests = self._decode_binary(http_request, decode_requests)
+            keys = [self._cache_key('/process_batch', request) for request in requests]
+            responses = [None] * len(requests)
+            missing = []
+            for i, key in enumerate(keys):
+                found = False
+                if key is not None:
+                    found, responses[i] = self.cache.get(key)
+                if not found:
+                    missing.append(i)
+            if missing:
+                async with self._admit(http_request):
+                    with self.stage('process_batch'):
+                        results = await self._call(
+                            self._batch_processor(), [requests[i] for i in missing])
+                for i, result in zip(missing, results):
+                    responses[i] = result
+                    if keys[i] is not None:
+                        self.cache.put(keys[i], result)
+            return self._encode(responses, http_request)
+
+        request_type = self._request_model()
+        response_type = inspect.signature(self.process).return_annotation
+        endpoint.__signature__ = self._with_http_request(inspect.Signature(
+            [inspect.Parameter('requests', inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                               default=Body(None),
+                               annotation=self._optional(self._list_of(request_type)))],
+            return_annotation=self._list_of(response_type)))
+        endpoint.__name__ = 'process_batch'
+        endpoint.__doc__ = self.process_batch.__doc__
+        return endpoint
+
+    def _batch_processor(self) -> Callable[[List], Any]:
+        """process_batch, or awaiting process per request if only an async process exists."""
+        if type(self).process_batch is EasyMLService.process_batch \
+                and inspect.iscoroutinefunction(self.process):
+            return self._process_each
+        return self.process_batch
+
+    async def _process_each(self, requests: List) -> List:
+        """Default process_batch of services with 'async def process'."""
+        return list(await asyncio.gather(*[self.process(request) for request in requests]))
+
+    def _cache_key(self, route: str, request: Any) -> str:
+        """Cache key of a request to route, None if the response must not be cached."""
+        if self.cache is None or not self.cache.is_enabled(route):
+            return None
+        # '/process' and '/process_batch' share entries, both give the same response per request
+        return self.cache.key('process', request, self.model_version)
+
+    def _decode_binary(self, http_request: Request, decode: Callable) -> Any:
+        """Decode binary body of http_request with decode, which fails for missing bodies."""
+        if binary_body(http_request) is None:
+            raise RequestValidationError([{'type': 'missing', 'loc': ('body',),
+                                           'msg': 'Field required', 'input': None}])
+        request_model = self._request_model()
+        if not (inspect.isclass(request_model) and issubclass(request_model, BaseModel)):
+            raise HTTPException(status_code=415,
+                                detail='This service only accepts JSON requests')
+        return decode(http_request, request_model, self.tensor_field)
+
+    def _request_model(self) -> Any:
+        """Request type annotated at the first parameter of process."""
+        signature = inspect.signature(self.process)
+        return next(iter(signature.parameters.values())).annotation
+
+    def _encode(self, response: Any, http_request: Request) -> Any:
+        """Binary response if requested by the Accept header, else response for JSON encoding."""
+        with self.stage('encode'):
+            binary_response = encode_response(response, http_request.headers.get('accept'))
+        return response if binary_response is None else binary_response
+
+    @asynccontextmanager
+    async def _admit(self, http_request: Request):
+        """Wait for a processing slot if the service has an inference queue."""
+        if self.queue is None:
+            yield
+        else:
+            async with self.queue.slot(http_request):
+                yield
+
+    @staticmethod
+    async def _call(function: Callable, *args) -> Any:
+        """Await coroutine functions, run blocking functions in the threadpool."""
+        if inspect.iscoroutinefunction(function):
+            return await function(*args)
+        return await run_in_threadpool(function, *args)
+
+    @staticmethod
+    def _with_http_request(signature: inspect.Signature) -> inspect.Signature:
+        """Append the raw HTTP request parameter to an endpoint signature."""
+        parameters = list(signature.parameters.values())
+        parameters.append(inspect.Parameter('http_request', inspect.Parameter.KEYWORD_ONLY,
+                                            annotation=Request))
+        return signature.replace(parameters=parameters)
+
+    def _binary_route_args(self, route_args: Dict) -> Dict:
+        """Route arguments documenting the binary request bodies in OpenAPI."""
+        binary_schema = {'schema': {'type': 'string', 'format': 'binary'}}
+        content = {MSGPACK: binary_schema}
+        if self.tensor_field is not None:
+            content.update({OCTET_STREAM: binary_schema, NPY: binary_schema})
+        openapi_extra = dict(route_args.get('openapi_extra') or {})
+        request_body = dict(openapi_extra.get('requestBody', {}))
+        request_body['required'] = True
+        request_body['content'] = {**content, **request_body.get('content', {})}
+        openapi_extra['requestBody'] = request_body
+        return {**route_args, 'openapi_extra': openapi_extra}
+
+    def _batch_route_args(self, route_args: Dict) -> Dict:
+        """Route arguments of '/process' adapted to a list of responses."""
+        batch_route_args = dict(route_args)
+        if batch_route_args.get('response_model') is not None:
+            batch_route_args['response_model'] = List[route_args['response_model']]
+        return batch_route_args
+
+    @staticmethod
+    def _optional(annotation: Any) -> Any:
+        """Optional type of annotation, unchanged if annotation is missing."""
+        if annotation is inspect.Parameter.empty:
+            return annotation
+        return Optional[annotation]
+
+    @staticmethod
+    def _list_of(annotation: Any) -> Any:
+        """List type of annotation, plain List if annotation is missing."""
+        if annotation is inspect.Parameter.empty:
+            return List
+        return List[annotation]
+
+
+def _invalidates_cache(load_model: Callable) -> Callable:
+    """Wrap load_model to bump the model version and clear the response cache."""
+    @functools.wraps(load_model)
+    def wrapper(self, *args, **kwargs):
+        result = load_model(self, *args, **kwargs)
+        self.model_version += 1
+        if self.cache is not None:
+            self.cache.clear()
+        return result
+    return wrapper
@@ -0,0 +1,116 @@
+import mmap
+from contextlib import asynccontextmanager
+from tempfile import SpooledTemporaryFile
+from typing import Dict
+
+from fastapi import HTTPException, Request, UploadFile
+
+from .codec import media_type
+
+MULTIPART = 'multipart/form-data'
+
+
+@asynccontextmanager
+async def receive_upload(http_request: Request, spool_size: int, max_bytes: int = None):
+    """Receive the uploaded file of http_request without holding it in memory.
+
+    Raw bodies (any content type except multipart, optionally with chunked transfer
+    encoding) are streamed into a spooled temporary file which moves to disk once it
+    exceeds spool_size bytes. Parameters are taken from the query string. Multipart
+    bodies are parsed by Starlette, which spools file parts the same way; the part
+    'file' (or the first file part) is the upload and the other fields are parameters.
+    For multipart bodies max_bytes limits the whole body. Bodies are rejected as soon as
+    they exceed max_bytes, before they are received completely. The file is closed when
+    the context exits.
+
+    Args:
+        http_request (Request): Request with the upload as body.
+        spool_size (int): Bytes kept in memory before the upload is written to disk.
+        max_bytes (int, optional): Maximum size of the upload, larger ones get 413. Defaults to None.
+
+    Raises:
+        HTTPException: 400 if a multipart body has no file, 413 if the upload is too large.
+
+    Yields:
+        Tuple[UploadFile, Dict]: Upload positioned at its start and the parameters.
+    """
+    params = dict(http_request.query_params)
+    if media_type(http_request.headers.get('content-type')) == MULTIPART:
+        if max_bytes is not None:
+            length = http_request.headers.get('content-length', '')
+            if length.isdigit() and int(length) > max_bytes:
+                raise HTTPException(status_code=413, detail='Upload too large')
+            # chunked bodies are counted while Starlette parses and spools them
+            http_request = Request(http_request.scope,
+                                   receive=_limited_receive(http_request.receive, max_bytes))
+        form = await http_request.form()
+        try:
+            files = [value for value in form.values() if not isinstance(value, str)]
+            if not files:
+                raise HTTPException(status_code=400, detail='Multipart body has no file')
+            upload = form.get('file') if 'file' in form else files[0]
+            params.update({key: value for key, value in form.items() if isinstance(value, str)})
+            await upload.seek(0)
+            yield upload, params
+        finally:
+            await form.close()
+        return
+
+    upload = UploadFile(SpooledTemporaryFile(max_size=spool_size), size=0,
+                        filename=http_request.headers.get('x-filename'),
+                        headers=http_request.headers)
+    try:
+        async for chunk in http_request.stream():
+            if max_bytes is not None and upload.size + len(chunk) > max_bytes:
+                raise HTTPException(status_code=413, detail='Upload too large')
+            # writes to the spooled file run in the threadpool once it rolled over to disk
+            await upload.write(chunk)
+        await upload.seek(0)
+        yield upload, params
+    finally:
+        await upload.close()
+
+
+def _limited_receive(receive, max_bytes: int):
+    """ASGI receive callable which fails with 413 once more than max_bytes body bytes arrived."""
+    received = 0
+
+    async def limited_receive():
+        nonlocal received
+        message = await receive()
+        received += len(message.get('body', b''))
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail='Upload too large')
+        return message
+
+    return limited_receive
+
+
+def memory_map(upload: UploadFile) -> mmap.mmap:
+    """Read-only memory map of a received upload, spooled uploads are moved to disk first.
+
+    Args:
+        upload (UploadFile): Upload passed to 'process_upload', must not be empty.
+
+    Returns:
+        mmap.mmap: Mapping of the whole upload, close it before returning.
+    """
+    spool = upload.file
+    if hasattr(spool, 'rollover'):
+        spool.rollover()
+    spool.flush()
+    return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def upload_route_args(route_args: Dict) -> Dict:
+    """Route arguments documenting the streamed and multipart request bodies in OpenAPI."""
+    binary_schema = {'schema': {'type': 'string', 'format': 'binary'}}
+    multipart_schema = {'schema': {'type': 'object',
+                                   'properties': {'file': {'type': 'string', 'format': 'binary'}},
+                                   'required': ['file']}}
+    openapi_extra = dict(route_args.get('openapi_extra') or {})
+    openapi_extra['requestBody'] = {
+        'required': True,
+        'content': {'application/octet-stream': binary_schema, MULTIPART: multipart_schema},
+    }
+    return {**route_args, 'openapi_extra': openapi_extra}
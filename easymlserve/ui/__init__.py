@@ -1,3 +1,5 @@
+from .client import AsyncEasyMLClient, EasyMLClient, FileUpload
+from .local_client import LocalEasyMLClient
 from .base_ui import BaseEasyMLUI
 from .gradio_ui import GradioEasyMLUI
 from .qt_ui import QtEasyMLUI
\ No newline at end of file
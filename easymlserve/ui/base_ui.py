@@ -1,6 +1,7 @@
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Tuple, Union
 
-import requests
+from .client import EasyMLClient, FileUpload
+from .local_client import LocalEasyMLClient
 
 
 class BaseEasyMLUI:
@@ -13,6 +14,9 @@ class BaseEasyMLUI:
                  rest_api_host: str = '127.0.0.1',
                  rest_api_port: int = 8080,
                  rest_api_protocol: str = 'http',
+                 rest_api_timeout: Union[float, Tuple[float, float]] = (3.05, 30),
+                 rest_api_retries: int = 3,
+                 rest_api_local_socket: str = None,
                  **kwargs):
         """Initialize basic UI elements.
 
@@ -23,6 +27,12 @@ class BaseEasyMLUI:
             rest_api_host (str, optional): REST API server address. Defaults to '127.0.0.1'.
             rest_api_port (int, optional): REST API server Port. Defaults to 8080.
             rest_api_protocol (str, optional): REST API server protocoll. Defaults to 'http'.
+            rest_api_timeout (Union[float, Tuple[float, float]], optional): Connect and read timeout
+                                                                            of REST API calls. Defaults to (3.05, 30).
+            rest_api_retries (int, optional): Retries of failed REST API calls. Defaults to 3.
+            rest_api_local_socket (str, optional): Unix domain socket of a server on the same host,
+                                                   large arrays are passed in shared memory. Falls back
+                                                   to the REST API address if not reachable. Defaults to None.
         """
         self.name = name
         self.input_schema = input_schema
@@ -32,23 +42,56 @@ class BaseEasyMLUI:
         self.rest_api_protocol = rest_api_protocol
         if not isinstance(self.output_schema, Iterable):
             self.output_schema = [self.output_schema]
+        # one keep-alive connection pool for all REST API calls
+        self.client = EasyMLClient(
+            f'{rest_api_protocol}://{rest_api_host}:{rest_api_port}',
+            timeout=rest_api_timeout, retries=rest_api_retries)
+        if rest_api_local_socket is not None:
+            self.client = LocalEasyMLClient(rest_api_local_socket, self.client)
 
     def call_process_api(self, request: Dict) -> Dict:
         """Call REST API server interface with request dict.
 
+        Requests containing a FileUpload (e.g. of a streaming File input) are sent to
+        the upload interface, see call_upload_api.
+
         Args:
             request (Dict): Request to send to REST API server.
 
         Returns:
             Dict: Response of REST API server.
         """
-        r = requests.post(
-            f'{self.rest_api_protocol}://'
-            f'{self.rest_api_host}:{self.rest_api_port}'
-            '/process',
-            json=request
-        )
-        return r.json()
+        if isinstance(request, dict):
+            uploads = [key for key, value in request.items() if isinstance(value, FileUpload)]
+            if len(uploads) > 1:
+                raise ValueError('A request can stream only one file upload.')
+            if uploads:
+                params = {key: value for key, value in request.items() if key != uploads[0]}
+                return self.call_upload_api(request[uploads[0]], params)
+        return self.client.process(request)
+
+    def call_upload_api(self, file: FileUpload, params: Dict = None) -> Dict:
+        """Stream a file in chunks to the REST API server upload interface.
+
+        Args:
+            file (FileUpload): File to send.
+            params (Dict, optional): Other request fields, sent as query parameters. Defaults to None.
+
+        Returns:
+            Dict: Response of REST API server.
+        """
+        return self.client.upload(file, params)
+
+    def call_process_batch_api(self, batch: List[Dict]) -> List[Dict]:
+        """Call REST API server batch interface with a list of request dicts.
+
+        Args:
+            batch (List[Dict]): Requests to send to REST API server at once.
+
+        Returns:
+            List[Dict]: Responses of REST API server in the order of the requests.
+        """
+        return self.client.process_batch(batch)
 
     def clicked(self, **kwargs) -> List:
         """UI clicked event to prepare and send REST API request.
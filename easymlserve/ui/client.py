@@ -0,0 +1,252 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Iterable, List, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# statuses of overloaded or restarting servers which are worth another try
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class _RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter."""
+
+    def __init__(self, retries: int, backoff: float, max_backoff: float,
+                 retry_statuses: Iterable[int]):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+
+    def delay(self, attempt: int, retry_after: str = None) -> float:
+        """Seconds to wait before the next attempt, honoring a 'Retry-After' header."""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class FileUpload:
+    """File which is sent to '/upload' in chunks instead of being read into memory.
+
+    Iterating yields the file from its start in chunks of 'chunk_size' bytes, so
+    retries resend the whole file. At most one chunk is held in memory.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 1024 * 1024):
+        """Initialize file upload.
+
+        Args:
+            path (str): Path of the file.
+            chunk_size (int, optional): Bytes read and sent at once. Defaults to 1 MiB.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+
+    @property
+    def size(self) -> int:
+        """Size of the file in bytes."""
+        return os.path.getsize(self.path)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as file:
+            while True:
+                chunk = file.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class EasyMLClient:
+    """HTTP client of an EasyMLServer with keep-alive connection pool, timeouts and retries.
+
+    The client is thread-safe and should be shared, every request reuses pooled connections.
+    Requests failing with a connection error, timeout or a retry status are repeated at most
+    'retries' times. Like a plain 'requests.post', error responses are returned, the UIs
+    display their JSON body (e.g. {'detail': ...}).
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 timeout: Union[float, Tuple[float, float]] = (3.05, 30),
+                 retries: int = 3,
+                 backoff: float = 0.1,
+                 max_backoff: float = 2.0,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES,
+                 pool_size: int = 16,
+                 headers: Dict = None):
+        """Initialize client.
+
+        Args:
+            base_url (str): URL of the server, e.g. 'http://127.0.0.1:8000'.
+            timeout (Union[float, Tuple[float, float]], optional): Connect and read timeout in seconds.
+                                                                   Defaults to (3.05, 30).
+            retries (int, optional): Maximum number of retries. Defaults to 3.
+            backoff (float, optional): Base of the exponential backoff in seconds. Defaults to 0.1.
+            max_backoff (float, optional): Maximum seconds between two attempts. Defaults to 2.0.
+            retry_statuses (Iterable[int], optional): Statuses which are retried.
+                                                      Defaults to 429, 502, 503 and 504.
+            pool_size (int, optional): Maximum number of kept-alive connections. Defaults to 16.
+            headers (Dict, optional): Headers sent with every request, e.g. 'x-api-key'. Defaults to None.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retry = _RetryPolicy(retries, backoff, max_backoff, retry_statuses)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def post(self, route: str, **kwargs) -> requests.Response:
+        """POST to route of the server with retries.
+
+        Args:
+            route (str): Route, e.g. '/process'.
+            **kwargs: Arguments of 'requests.Session.post', e.g. json.
+
+        Raises:
+            requests.RequestException: If the last attempt failed to connect or timed out.
+
+        Returns:
+            requests.Response: Response of the last attempt, error statuses included.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        url = self.base_url + route
+        for attempt in range(self.retry.retries + 1):
+            last_attempt = attempt == self.retry.retries
+            try:
+                response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                continue
+            if response.status_code not in self.retry.retry_statuses or last_attempt:
+                return response
+            time.sleep(self.retry.delay(attempt, response.headers.get('retry-after')))
+
+    def process(self, request: Dict) -> Dict:
+        """Call '/process' with request and return the JSON response."""
+        return self.post('/process', json=request).json()
+
+    def process_batch(self, batch: List[Dict]) -> List[Dict]:
+        """Call '/process_batch' with a list of requests and return the JSON responses."""
+        return self.post('/process_batch', json=batch).json()
+
+    def upload(self, file: FileUpload, params: Dict = None, route: str = '/upload') -> Dict:
+        """Stream file with chunked transfer encoding and return the JSON response.
+
+        Args:
+            file (FileUpload): File to send.
+            params (Dict, optional): Parameters sent in the query string. Defaults to None.
+            route (str, optional): Route receiving the upload. Defaults to '/upload'.
+
+        Returns:
+            Dict: JSON response.
+        """
+        headers = {'Content-Type': 'application/octet-stream',
+                   'X-Filename': os.path.basename(file.path)}
+        return self.post(route, data=file, params=params, headers=headers).json()
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+class AsyncEasyMLClient:
+    """Asynchronous variant of EasyMLClient based on httpx.
+
+    'process_many' sends many requests at once, at most 'max_concurrency' of them in flight.
+    Create and use the client within one event loop.
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 timeout: float = 30,
+                 retries: int = 3,
+                 backoff: float = 0.1,
+                 max_backoff: float = 2.0,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES,
+                 max_concurrency: int = 8,
+                 headers: Dict = None):
+        """Initialize asynchronous client.
+
+        Args:
+            base_url (str): URL of the server, e.g. 'http://127.0.0.1:8000'.
+            timeout (float, optional): Timeout of a request in seconds. Defaults to 30.
+            retries (int, optional): Maximum number of retries. Defaults to 3.
+            backoff (float, optional): Base of the exponential backoff in seconds. Defaults to 0.1.
+            max_backoff (float, optional): Maximum seconds between two attempts. Defaults to 2.0.
+            retry_statuses (Iterable[int], optional): Statuses which are retried.
+                                                      Defaults to 429, 502, 503 and 504.
+            max_concurrency (int, optional): Maximum number of requests in flight. Defaults to 8.
+            headers (Dict, optional): Headers sent with every request, e.g. 'x-api-key'. Defaults to None.
+
+        Raises:
+            ImportError: If httpx is not installed.
+        """
+        if httpx is None:
+            raise ImportError('AsyncEasyMLClient requires httpx.')
+        self.retry = _RetryPolicy(retries, backoff, max_backoff, retry_statuses)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'), timeout=timeout, headers=headers,
+            limits=httpx.Limits(max_connections=max_concurrency,
+                                max_keepalive_connections=max_concurrency))
+
+    async def post(self, route: str, **kwargs) -> 'httpx.Response':
+        """POST to route of the server with retries, see EasyMLClient.post."""
+        async with self.semaphore:
+            for attempt in range(self.retry.retries + 1):
+                last_attempt = attempt == self.retry.retries
+                try:
+                    response = await self.client.post(route, **kwargs)
+                except httpx.TransportError:
+                    if last_attempt:
+                        raise
+                    await asyncio.sleep(self.retry.delay(attempt))
+                    continue
+                if response.status_code not in self.retry.retry_statuses or last_attempt:
+                    return response
+                await asyncio.sleep(self.retry.delay(attempt, response.headers.get('retry-after')))
+
+    async def process(self, request: Dict) -> Dict:
+        """Call '/process' with request and return the JSON response."""
+        return (await self.post('/process', json=request)).json()
+
+    async def process_batch(self, batch: List[Dict]) -> List[Dict]:
+        """Call '/process_batch' with a list of requests and return the JSON responses."""
+        return (await self.post('/process_batch', json=batch)).json()
+
+    async def process_many(self, requests: List[Dict]) -> List[Dict]:
+        """Call '/process' with every request concurrently.
+
+        Args:
+            requests (List[Dict]): Requests to send.
+
+        Returns:
+            List[Dict]: Responses in the order of the requests.
+        """
+        return list(await asyncio.gather(*[self.process(request) for request in requests]))
+
+    async def close(self):
+        """Close all pooled connections."""
+        await self.client.aclose()
+
+    async def __aenter__(self) -> 'AsyncEasyMLClient':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
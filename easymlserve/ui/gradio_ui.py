@@ -2,7 +2,7 @@ from typing import Dict, List
 
 import gradio
 
-from . import BaseEasyMLUI
+from . import BaseEasyMLUI, FileUpload
 
 
 class GradioEasyMLUI(BaseEasyMLUI):
@@ -42,5 +42,9 @@ class GradioEasyMLUI(BaseEasyMLUI):
         """
         parent_kwargs = {}
         for i, key in enumerate(self.input_schema):
-            parent_kwargs[key] = kwargs[i]
+            value = kwargs[i]
+            # streaming file inputs arrive as temporary files, they are sent in chunks
+            if getattr(self.input_schema[key], 'streaming', False) and value is not None:
+                value = FileUpload(getattr(value, 'name', value))
+            parent_kwargs[key] = value
         return super().clicked(**parent_kwargs)
@@ -0,0 +1,186 @@
+import http.client
+import json
+import logging
+import socket
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .client import EasyMLClient, FileUpload
+
+logger = logging.getLogger(__name__)
+
+# media type and header of easymlserve.service.codec
+SHARED_MEMORY = 'application/x-easymlserve-shm'
+SHARED_MEMORY_HEADER = 'X-Shared-Memory'
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket."""
+
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class LocalEasyMLClient:
+    """Client of an EasyMLServer on the same host, see 'local_socket' of EasyMLServer.
+
+    Requests are sent over the Unix domain socket of the server. Arrays of at least
+    'min_shared_bytes' are copied once into shared memory segments and only their names
+    cross the socket, the service reads them in place. Smaller arrays are sent as JSON.
+    If the socket is missing or the server can not attach the segments (i.e. it runs on
+    another host), requests are sent with http_client instead and the local transport
+    is retried after 'retry_interval' seconds.
+    """
+
+    def __init__(self,
+                 socket_path: str,
+                 http_client: EasyMLClient,
+                 min_shared_bytes: int = 64 * 1024,
+                 timeout: float = 30,
+                 retry_interval: float = 30.0,
+                 headers: Dict = None):
+        """Initialize local client.
+
+        Args:
+            socket_path (str): Path of the Unix domain socket of the server.
+            http_client (EasyMLClient): Fallback client, its URL path is the route prefix as well.
+            min_shared_bytes (int, optional): Minimum size of arrays passed in shared memory.
+                                              Defaults to 64 KiB.
+            timeout (float, optional): Timeout of a request in seconds. Defaults to 30.
+            retry_interval (float, optional): Seconds the local transport is skipped after it
+                                              failed. Defaults to 30.0.
+            headers (Dict, optional): Headers sent with every request, e.g. 'x-api-key'.
+                                      Defaults to the headers of http_client.
+        """
+        self.socket_path = socket_path
+        self.http_client = http_client
+        self.min_shared_bytes = min_shared_bytes
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.headers = dict(http_client.session.headers if headers is None else headers)
+        self.prefix = urlsplit(http_client.base_url).path.rstrip('/')
+        # platforms without Unix domain sockets always use HTTP
+        self.unavailable_until = 0.0 if hasattr(socket, 'AF_UNIX') else float('inf')
+        self.local = threading.local()
+
+    def process(self, request: Dict) -> Dict:
+        """Call '/process' with request and return the JSON response."""
+        return self._call('/process', request, self.http_client.process)
+
+    def process_batch(self, batch: List[Dict]) -> List[Dict]:
+        """Call '/process_batch' with a list of requests and return the JSON responses."""
+        return self._call('/process_batch', batch, self.http_client.process_batch)
+
+    def upload(self, file: FileUpload, params: Dict = None) -> Dict:
+        """Stream file to '/upload', files on disk are always sent over HTTP."""
+        return self.http_client.upload(file, params)
+
+    def close(self):
+        """Close the connection of the calling thread and the fallback client."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+        self.http_client.close()
+
+    def _call(self, route: str, payload: Any, fallback) -> Any:
+        """Send payload over the local socket, or with fallback if not possible."""
+        if time.monotonic() >= self.unavailable_until:
+            segments = []
+            try:
+                body = json.dumps(self._share(payload, segments)).encode()
+                content_type = SHARED_MEMORY if segments else 'application/json'
+                found, response = self._post(route, body, content_type)
+                if found:
+                    return response
+            finally:
+                for memory in segments:
+                    memory.close()
+                    memory.unlink()
+            self.unavailable_until = time.monotonic() + self.retry_interval
+        return fallback(_plain(payload))
+
+    def _post(self, route: str, body: bytes, content_type: str) -> Tuple[bool, Any]:
+        """POST over the local socket.
+
+        Returns:
+            Tuple[bool, Any]: False if the local transport is not available, else True and the
+                              JSON response, which describes the error if the service rejected it.
+        """
+        headers = {**self.headers, 'Content-Type': content_type,
+                   'Content-Length': str(len(body))}
+        # a kept-alive connection may have been closed by the server meanwhile
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request('POST', self.prefix + route, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (FileNotFoundError, ConnectionRefusedError, PermissionError) as exception:
+                connection.close()
+                logger.info('Local socket %s not available (%s), using HTTP.',
+                            self.socket_path, exception)
+                return False, None
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if attempt:
+                    raise
+        if response.status == 409 and response.getheader(SHARED_MEMORY_HEADER) == 'unavailable':
+            logger.info('Server cannot attach shared memory, using HTTP.')
+            return False, None
+        return True, json.loads(data)
+
+    def _connection(self) -> _UnixHTTPConnection:
+        """Kept-alive connection of the calling thread."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = _UnixHTTPConnection(self.socket_path, self.timeout)
+            self.local.connection = connection
+        return connection
+
+    def _share(self, payload: Any, segments: List[shared_memory.SharedMemory]) -> Any:
+        """Payload with large arrays replaced by references to new shared memory segments."""
+        if isinstance(payload, list):
+            return [self._share(item, segments) for item in payload]
+        if not isinstance(payload, dict):
+            return _plain(payload)
+        shared = {}
+        for key, value in payload.items():
+            if isinstance(value, np.ndarray) and value.nbytes >= self.min_shared_bytes \
+                    and not value.dtype.hasobject:
+                memory = shared_memory.SharedMemory(create=True, size=value.nbytes)
+                segments.append(memory)
+                np.ndarray(value.shape, dtype=value.dtype, buffer=memory.buf)[...] = value
+                shared[key] = {'shm': memory.name, 'dtype': value.dtype.str,
+                               'shape': list(value.shape)}
+            else:
+                shared[key] = _plain(value)
+        return shared
+
+
+def _plain(value: Any) -> Any:
+    """JSON serializable value, arrays become lists."""
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
@@ -2,6 +2,8 @@ import sys
 
 from PyQt6.QtWidgets import (
     QApplication,
+    QLabel,
+    QProgressBar,
     QPushButton,
     QVBoxLayout,
     QHBoxLayout,
@@ -9,25 +11,38 @@ from PyQt6.QtWidgets import (
 )
 
 from .base_ui import BaseEasyMLUI
+from .qt_worker import RequestQueue
 
 
 class QtEasyMLUI(BaseEasyMLUI):
-    """Qt UI class to display a Qt UI for REST API calls."""
+    """Qt UI class to display a Qt UI for REST API calls.
+
+    REST API calls run on a background thread pool, the window stays responsive.
+    Results are displayed in the order of the clicks, pending requests are
+    cancelled when an input changes.
+    """
 
     def __init__(self,
                  width: int = 1024,
                  height: int = 768,
+                 max_in_flight: int = 4,
                  **kwargs):
         """Initialize Qt UI class.
 
         Args:
             width (int, optional): Qt UI width. Defaults to 1024.
             height (int, optional): Qt UI height. Defaults to 768.
+            max_in_flight (int, optional): Maximum number of concurrent REST API calls. Defaults to 4.
         """
         super().__init__(**kwargs)
         self.width = width
         self.height = height
-        self.app = QApplication([])
+        # an application may already exist, e.g. of another window or of tests
+        self.app = QApplication.instance() or QApplication([])
+        self.requests = RequestQueue(max_in_flight)
+        self.requests.result_ready.connect(self.show_response)
+        self.requests.error.connect(self.show_error)
+        self.requests.progress.connect(self.show_progress)
         self.window = QWidget()
         self.window.setWindowTitle(self.name)
         main_layout = QHBoxLayout()
@@ -39,10 +54,19 @@ class QtEasyMLUI(BaseEasyMLUI):
         for key, input_type in self.input_schema.items():
             qt_widget = input_type.to_qt(kind='input')
             side_bar_layout.addWidget(qt_widget)
+            # results of older inputs are stale
+            qt_widget.changed.connect(self.requests.cancel_all)
             self.inputs[key] = qt_widget
         btn_send = QPushButton('Send')
         btn_send.clicked.connect(self.clicked)
         side_bar_layout.addWidget(btn_send)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFormat('%v / %m requests')
+        self.progress_bar.hide()
+        side_bar_layout.addWidget(self.progress_bar)
+        self.status = QLabel()
+        self.status.setWordWrap(True)
+        side_bar_layout.addWidget(self.status)
         side_bar_layout.addStretch()
 
         self.outputs = []
@@ -62,15 +86,67 @@ class QtEasyMLUI(BaseEasyMLUI):
         sys.exit(self.app.exec())
 
     def clicked(self):
-        """Clicked event of Qt UI class."""
+        """Clicked event of Qt UI class, sends the REST API request in the background."""
         parent_kwargs = {}
         for key, element in self.inputs.items():
             value = element.get_value()
             parent_kwargs[key] = value
             if value is None:
                 return
-        results =  super().clicked(**parent_kwargs)
+        self.status.clear()
+        # only prepare_request and the REST API call run on a worker thread,
+        # process_response may create widgets or pixmaps and runs on the GUI thread
+        self.requests.submit(self.send_request, **parent_kwargs)
+
+    def send_request(self, **kwargs) -> tuple:
+        """Prepare and send the REST API request, called on a worker thread.
+
+        Returns:
+            tuple: Sent request and received response.
+        """
+        request = self.prepare_request(**kwargs)
+        return request, self.call_process_api(request)
+
+    def show_response(self, outcome: tuple):
+        """Process a REST API response on the GUI thread and display its results.
+
+        Args:
+            outcome (tuple): Sent request and received response of 'send_request'.
+        """
+        request, response = outcome
+        try:
+            results = self.process_response(request, response)
+        except Exception as e:
+            self.show_error(e)
+            return
+        self.show_results(results)
+
+    def show_results(self, results):
+        """Display results of a REST API call on the output elements.
+
+        Args:
+            results: Results of process_response.
+        """
         if not (isinstance(results, list) or isinstance(results, tuple)):
             results = [results]
         for element, result in zip(self.outputs, results):
             element.set_value(result)
+
+    def show_error(self, exception: Exception):
+        """Display a failed REST API call.
+
+        Args:
+            exception (Exception): Raised exception.
+        """
+        self.status.setText(f'Request failed: {exception}')
+
+    def show_progress(self, done: int, total: int):
+        """Display the number of finished and sent requests, hidden if none is pending.
+
+        Args:
+            done (int): Number of delivered requests.
+            total (int): Number of sent requests.
+        """
+        self.progress_bar.setVisible(total > 0)
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
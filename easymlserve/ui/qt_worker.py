@@ -0,0 +1,156 @@
+import threading
+from typing import Callable, Dict
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+# result marker of cancelled requests, they are skipped on delivery
+_CANCELLED = object()
+
+
+class _WorkerSignals(QObject):
+    """Signals of a RequestWorker, QRunnable itself can not emit signals."""
+
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object)
+
+
+class RequestWorker(QRunnable):
+    """Runs one UI request (e.g. prepare, REST API call and processing) on a thread pool."""
+
+    def __init__(self, sequence: int, function: Callable, kwargs: Dict):
+        """Initialize worker.
+
+        Args:
+            sequence (int): Sequence number of the request.
+            function (Callable): Function to call on the worker thread.
+            kwargs (Dict): Keyword arguments of function.
+        """
+        super().__init__()
+        # the queue keeps a reference until the result is delivered
+        self.setAutoDelete(False)
+        self.sequence = sequence
+        self.function = function
+        self.kwargs = kwargs
+        self.cancelled = threading.Event()
+        self.signals = _WorkerSignals()
+
+    def cancel(self):
+        """Drop the result, a running REST API call is not interrupted."""
+        self.cancelled.set()
+
+    def run(self):
+        # exactly one signal is emitted, the queue releases the worker on it
+        if self.cancelled.is_set():
+            self.signals.finished.emit(self.sequence, _CANCELLED)
+            return
+        try:
+            result = self.function(**self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self.sequence, e)
+            return
+        self.signals.finished.emit(self.sequence, result)
+
+
+class RequestQueue(QObject):
+    """Sends UI requests on background threads and delivers their results in order.
+
+    At most 'max_in_flight' requests run at once, further requests wait in the thread
+    pool queue. Results are emitted on the GUI thread in the order the requests were
+    submitted, a result waits for all earlier ones. Cancelled requests are skipped.
+    """
+
+    result_ready = pyqtSignal(object)
+    error = pyqtSignal(object)
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, max_in_flight: int = 4, parent: QObject = None):
+        """Initialize request queue.
+
+        Args:
+            max_in_flight (int, optional): Maximum number of concurrently running requests.
+                                           Defaults to 4.
+            parent (QObject, optional): Qt parent object. Defaults to None.
+        """
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_in_flight)
+        # workers are referenced until they finished or were taken from the pool
+        self.workers = {}
+        self.results = {}
+        self.next_sequence = 0
+        self.next_delivery = 0
+        self.delivered = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of submitted requests which are not delivered yet."""
+        return self.next_sequence - self.next_delivery
+
+    def submit(self, function: Callable, **kwargs) -> int:
+        """Run function(**kwargs) on the thread pool.
+
+        Args:
+            function (Callable): Function to call on the worker thread.
+            **kwargs: Keyword arguments of function.
+
+        Returns:
+            int: Sequence number of the request.
+        """
+        worker = RequestWorker(self.next_sequence, function, kwargs)
+        worker.signals.finished.connect(self._finished)
+        worker.signals.failed.connect(self._failed)
+        self.workers[worker.sequence] = worker
+        self.next_sequence += 1
+        self.pool.start(worker)
+        self._emit_progress()
+        return worker.sequence
+
+    def cancel_all(self):
+        """Cancel every pending request, e.g. because its inputs are stale."""
+        for sequence in range(self.next_delivery, self.next_sequence):
+            self.results[sequence] = (True, _CANCELLED)
+            worker = self.workers.get(sequence)
+            if worker is None:
+                # finished, its result waited for an earlier request
+                continue
+            worker.cancel()
+            # requests still waiting for a thread never run and emit nothing
+            if self.pool.tryTake(worker):
+                del self.workers[sequence]
+        self._deliver()
+
+    @pyqtSlot(int, object)
+    def _finished(self, sequence: int, result):
+        self._store(sequence, (True, result))
+
+    @pyqtSlot(int, object)
+    def _failed(self, sequence: int, exception):
+        self._store(sequence, (False, exception))
+
+    def _store(self, sequence: int, outcome):
+        del self.workers[sequence]
+        # a result arriving after cancel_all keeps the cancelled marker
+        if sequence >= self.next_delivery:
+            self.results.setdefault(sequence, outcome)
+        self._deliver()
+
+    def _deliver(self):
+        while self.next_delivery in self.results:
+            ok, value = self.results.pop(self.next_delivery)
+            self.next_delivery += 1
+            if value is _CANCELLED:
+                continue
+            self.delivered += 1
+            if ok:
+                self.result_ready.emit(value)
+            else:
+                self.error.emit(value)
+        self._emit_progress()
+
+    def _emit_progress(self):
+        """Emit delivered and submitted requests since the queue was last idle."""
+        if self.pending == 0:
+            self.delivered = 0
+            self.progress.emit(0, 0)
+        else:
+            self.progress.emit(self.delivered, self.delivered + self.pending)
@@ -1,9 +1,13 @@
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import QWidget
 
 
 class BaseQtUI(QWidget):
     """Basic QT UI element for QtEasyMLUI."""
 
+    # emitted by inputs whenever the user changes their value
+    changed = pyqtSignal()
+
     def __init__(self,
                  name: str = '',
                  kind: str = 'input',
@@ -20,6 +20,7 @@ class QtMultipleChoiceUI(BaseQtUI):
         self.checkboxes = []
         for choice in choices:
             checkbox = QCheckBox(choice)
+            checkbox.toggled.connect(self.changed)
             self.checkboxes.append(checkbox)
             group_box_layout.addWidget(checkbox)
         groupbox = QGroupBox(self.name)
@@ -60,6 +61,7 @@ class QtSingleChoiceUI(BaseQtUI):
         self.radios = []
         for choice in choices:
             radio = QRadioButton(choice)
+            radio.toggled.connect(self.changed)
             self.radios.append(radio)
             group_box_layout.addWidget(radio)
         groupbox = QGroupBox(self.name)
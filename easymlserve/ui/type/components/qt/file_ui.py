@@ -2,6 +2,8 @@ import shutil
 
 from PyQt6.QtWidgets import *
 
+from easymlserve.ui.client import FileUpload
+
 from . import BaseQtUI
 
 
@@ -9,8 +11,10 @@ class QtFileUI(BaseQtUI):
     """File Input or Output Qt UI element."""
 
     def __init__(self,
+                 streaming: bool = False,
                  **kwargs):
         super().__init__(**kwargs)
+        self.streaming = streaming
         self.file_path = None
 
         group_box_layout = QVBoxLayout()
@@ -42,6 +46,7 @@ class QtFileUI(BaseQtUI):
             self, 'Load File', '.', 'Files (*)')
         if fname[0]:
             self.file_path = fname[0]
+            self.changed.emit()
         self.update_file_path()
 
     def save_file_dialog(self):
@@ -54,6 +59,9 @@ class QtFileUI(BaseQtUI):
     def get_value(self):
         if self.file_path is None:
             return None
+        elif self.streaming:
+            # the file is read in chunks while it is sent
+            return FileUpload(self.file_path)
         else:
             with open(self.file_path, 'rb') as file:
                 return file.read()
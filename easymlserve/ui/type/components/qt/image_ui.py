@@ -1,22 +1,50 @@
-from itertools import groupby
 import numpy as np
 import PIL
-from PIL.ImageQt import ImageQt
 
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import *
 
 from . import BaseQtUI
 
+# QImage formats of uint8 arrays by number of channels
+IMAGE_FORMATS = {
+    1: QImage.Format.Format_Grayscale8,
+    3: QImage.Format.Format_RGB888,
+    4: QImage.Format.Format_RGBA8888,
+}
+
+
+def array_to_pixmap(image: np.ndarray) -> QPixmap:
+    """Convert an image array to a pixmap without intermediate PIL images.
+
+    The QImage wraps the array buffer, only QPixmap.fromImage copies it.
+
+    Args:
+        image (np.ndarray): Image (height, width) or (height, width, channels) with 1, 3 or 4 channels.
+
+    Returns:
+        QPixmap: Pixmap of the image.
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    height, width = image.shape[:2]
+    qimage = QImage(image.data, width, height, image.strides[0],
+                    IMAGE_FORMATS[channels])
+    return QPixmap.fromImage(qimage)
+
 
 class QtImageUI(BaseQtUI):
-    """Image Qt UI element."""
+    """Image Qt UI element.
+
+    The image is converted once to a base pixmap, resizing only rescales it.
+    """
 
     def __init__(self,
                  **kwargs):
         super().__init__(**kwargs)
         self.image = None
+        self.pixmap = None
         group_box_layout = QVBoxLayout()
         self.image_plane = QLabel()
         self.image_plane.setMinimumHeight(300)
@@ -37,19 +65,23 @@ class QtImageUI(BaseQtUI):
         self.update_image()
 
     def update_image(self):
-        if self.image is None:
+        if self.pixmap is None:
             return
         else:
-            pil_image = PIL.Image.fromarray(
-                self.image.astype('uint8'), 'RGB')
-            qimage = ImageQt(pil_image)
-            qimage.bits()
-            pix = QPixmap.fromImage(qimage)
-            pix = pix.scaled(0.95 * self.image_plane.width(),
-                             0.95 * self.image_plane.height(),
-                             Qt.AspectRatioMode.KeepAspectRatio)
+            pix = self.pixmap.scaled(int(0.95 * self.image_plane.width()),
+                                     int(0.95 * self.image_plane.height()),
+                                     Qt.AspectRatioMode.KeepAspectRatio)
             self.image_plane.setPixmap(pix)
 
+    def update_pixmap(self):
+        """Convert the image to the base pixmap, only needed if the image changed."""
+        if self.image is None:
+            self.pixmap = None
+            self.image_plane.clear()
+        else:
+            self.pixmap = array_to_pixmap(self.image)
+        self.update_image()
+
     def file_dialog(self):
         fname = QFileDialog.getOpenFileName(
             self, 'Load Image', '.', 'Image Files (*.png, *.jpg)')
@@ -57,11 +89,12 @@ class QtImageUI(BaseQtUI):
             image = PIL.Image.open(fname[0])
             image = np.asarray(image)
             self.image = image
-        self.update_image()
+            self.update_pixmap()
+            self.changed.emit()
 
     def get_value(self):
         return self.image
 
     def set_value(self, value: np.ndarray):
         self.image = value
-        self.update_image()
\ No newline at end of file
+        self.update_pixmap()
\ No newline at end of file
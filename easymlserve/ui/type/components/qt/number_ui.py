@@ -24,6 +24,7 @@ class QtNumberUI(BaseQtUI):
             self.spin_box.setSingleStep(0.1)
         if self.kind == 'output':
             self.spin_box.setReadOnly(True)
+        self.spin_box.valueChanged.connect(self.changed)
         group_box_layout.addWidget(self.spin_box)
         groupbox = QGroupBox(self.name)
         groupbox.setLayout(group_box_layout)
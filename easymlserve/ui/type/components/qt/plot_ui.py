@@ -1,23 +1,24 @@
-from matplotlib.backends.backend_qt5agg import FigureCanvasAgg as FigureCanvas
+from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 import matplotlib.pyplot as plt
 
-import PIL
-from PIL.ImageQt import ImageQt
-
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QResizeEvent
+from PyQt6.QtGui import QImage, QPixmap, QResizeEvent
 from PyQt6.QtWidgets import *
 
 from . import BaseQtUI
 
 
 class QtPlotUI(BaseQtUI):
-    """Plot Qt UI element."""
+    """Plot Qt UI element.
+
+    The figure is drawn once to a base pixmap, resizing only rescales it.
+    """
 
     def __init__(self,
                  **kwargs):
         super().__init__(**kwargs)
         self.figure = None
+        self.pixmap = None
 
         group_box_layout = QVBoxLayout()
         self.figure_plane = QLabel()
@@ -36,25 +37,30 @@ class QtPlotUI(BaseQtUI):
         self.update_figure()
 
     def update_figure(self):
-        if self.figure is None:
+        if self.pixmap is None:
             return
+        else:
+            pix = self.pixmap.scaled(int(0.95 * self.figure_plane.width()),
+                                     int(0.95 * self.figure_plane.height()),
+                                     Qt.AspectRatioMode.KeepAspectRatio)
+            self.figure_plane.setPixmap(pix)
+
+    def update_pixmap(self):
+        """Draw the figure to the base pixmap, only needed if the figure changed."""
+        if self.figure is None:
+            self.pixmap = None
+            self.figure_plane.clear()
         else:
             canvas = FigureCanvas(self.figure)
-            ax = self.figure.gca()
             canvas.draw()
-            pil_image = PIL.Image.frombytes(
-                'RGB',
-                canvas.get_width_height(),
-                canvas.tostring_rgb()
-            )
-            qimage = ImageQt(pil_image)
-            qimage.bits()
-            pix = QPixmap.fromImage(qimage)
-            pix = pix.scaled(0.95 * self.figure_plane.width(),
-                             0.95 * self.figure_plane.height(),
-                             Qt.AspectRatioMode.KeepAspectRatio)
-            self.figure_plane.setPixmap(pix)
+            # the QImage wraps the RGBA buffer of the canvas, only fromImage copies it
+            buffer = canvas.buffer_rgba()
+            height, width = buffer.shape[:2]
+            qimage = QImage(buffer, width, height, buffer.strides[0],
+                            QImage.Format.Format_RGBA8888)
+            self.pixmap = QPixmap.fromImage(qimage)
+        self.update_figure()
 
     def set_value(self, value: plt.Figure):
         self.figure = value
-        self.update_figure()
\ No newline at end of file
+        self.update_pixmap()
\ No newline at end of file
@@ -38,6 +38,7 @@ class QtSliderUI(BaseQtUI):
     def slider_changed(self):
         value = self.slider.value()
         self.slider_state.setText(str(value))
+        self.changed.emit()
 
     def get_value(self):
         return self.slider.value()
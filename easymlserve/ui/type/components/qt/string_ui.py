@@ -10,6 +10,7 @@ class QtTextUI(BaseQtUI):
         super().__init__(**kwargs)
         group_box_layout = QVBoxLayout()
         self.line_edit = QLineEdit()
+        self.line_edit.textChanged.connect(self.changed)
         group_box_layout.addWidget(self.line_edit)
         groupbox = QGroupBox(self.name)
         groupbox.setLayout(group_box_layout)
@@ -34,6 +35,7 @@ class QtTextLongUI(BaseQtUI):
             label = QLabel(self.name)
             layout.addWidget(label)
         self.text_edit = QTextEdit()
+        self.text_edit.textChanged.connect(self.changed)
         layout.addWidget(self.text_edit)
         self.setLayout(layout)
 
@@ -10,18 +10,27 @@ from . import BaseType
 class File(BaseType):
     """File UI type."""
 
-    def __init__(self, is_output=False, **kwargs) -> None:
+    def __init__(self, is_output=False, streaming=False, **kwargs) -> None:
+        """Initialize file type.
+
+        Args:
+            is_output (bool, optional): Whether the type is an output. Defaults to False.
+            streaming (bool, optional): Pass a FileUpload, which is streamed to the '/upload' route
+                                        of the service, instead of the file content. Defaults to False.
+        """
         super().__init__(**kwargs)
         self.is_output = is_output
+        self.streaming = streaming
 
     def to_gradio(self):
+        file_type = "file" if self.streaming else "bytes"
         if self.name == "":
-            return gradio.File(show_label=False, type="bytes")
+            return gradio.File(show_label=False, type=file_type)
         else:
-            return gradio.File(label=self.name, type="bytes")
+            return gradio.File(label=self.name, type=file_type)
 
     def to_qt(self, kind: Literal["input", "output"]):
-        return QtFileUI(name=self.name, kind=kind)
+        return QtFileUI(name=self.name, kind=kind, streaming=self.streaming)
 
 
 class MusicFile(File):
@@ -29,18 +38,35 @@ class MusicFile(File):
 
     # https://gradio.app/docs/#audio
 
-    def __init__(self, is_output=False, **kwargs) -> None:
+    def __init__(self, is_output=False, in_memory=False, **kwargs) -> None:
+        """Initialize music file type.
+
+        Args:
+            is_output (bool, optional): Whether the type is an output. Defaults to False.
+            in_memory (bool, optional): Pass the decoded audio as a tuple (sample_rate, samples)
+                                        instead of the path of a temporary file. Defaults to False.
+            **kwargs: Arguments of File, with 'streaming' the temporary file is streamed to the
+                      service.
+
+        Raises:
+            ValueError: If in_memory and streaming are both set.
+        """
         super().__init__(**kwargs)
+        if in_memory and self.streaming:
+            raise ValueError("A music file is either passed in memory or streamed, not both.")
         self.is_output = is_output
+        self.in_memory = in_memory
 
     def to_gradio(self):
+        # streamed uploads need the temporary file, see GradioEasyMLUI.clicked
+        audio_type = "numpy" if self.in_memory else "filepath"
         if self.name == "":
-            return gradio.Audio(show_label=False, type="filepath")
+            return gradio.Audio(show_label=False, type=audio_type)
         else:
-            return gradio.Audio(label=self.name, type="filepath")
+            return gradio.Audio(label=self.name, type=audio_type)
 
     def to_qt(self, kind: Literal["input", "output"]):
-        return QtFileUI(name=self.name, kind=kind)
+        return QtFileUI(name=self.name, kind=kind, streaming=self.streaming)
 
 
 class ImageFile(File):
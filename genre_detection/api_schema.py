@@ -12,3 +12,7 @@ class APIRequest(BaseModel):
 class APIResponse(BaseModel):
     genre: str
     confidences: dict
+
+
+class SongResponse(APIResponse):
+    snippets: int
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import librosa
+import numpy as np
+
+import constants
+from features import HOP_LENGTH, N_FFT, N_MFCC, SAMPLE_RATE
+
+# bump whenever the feature extraction changes its results
+FEATURE_VERSION = 3
+
+
+class FeatureCache:
+    """Persistent cache of snippet features and predictions in a local SQLite file.
+
+    Entries are keyed by a fingerprint of the decoded audio and the extraction parameters.
+    Per key the (snippets, 40) feature matrix and the song-level prediction of every
+    model and sampling are stored. Rows of snippets which were not extracted yet, e.g. by
+    the adaptive sampling, are NaN. If the stored bytes exceed max_bytes, the least
+    recently used songs are removed.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        """Open (or create) the cache.
+
+        Args:
+            path (str): Path of the SQLite file
+            max_bytes (int, optional): Maximum bytes of stored features and predictions. Defaults to 256 MiB.
+        """
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # UI callbacks run in several threads, they share the connection under the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT PRIMARY KEY, data BLOB, rows INTEGER, size INTEGER, last_used REAL)"
+            )
+            columns = [
+                row[1] for row in self.connection.execute("PRAGMA table_info(predictions)")
+            ]
+            # predictions of older caches don't know their sampling, they are predicted again
+            if columns and "sampling" not in columns:
+                self.connection.execute("DROP TABLE predictions")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT, model INTEGER, sampling TEXT, data TEXT, size INTEGER, "
+                "PRIMARY KEY (key, model, sampling))"
+            )
+
+    def fingerprint(self, y: np.ndarray) -> str:
+        """Key of decoded audio and the feature extraction parameters.
+
+        Args:
+            y (np.ndarray): Decoded mono samples
+
+        Returns:
+            str: Hex digest
+        """
+
+        parameters = (
+            FEATURE_VERSION,
+            librosa.__version__,
+            SAMPLE_RATE,
+            N_MFCC,
+            N_FFT,
+            HOP_LENGTH,
+            constants.TRAINED_MUSIC_DURATION_IN_SECONDS,
+        )
+        hasher = hashlib.blake2b(repr(parameters).encode(), digest_size=20)
+        hasher.update(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+        return hasher.hexdigest()
+
+    def get_features(self, key: str) -> Optional[np.ndarray]:
+        """Stored features of key, None if missing.
+
+        Args:
+            key (str): Fingerprint of the song
+
+        Returns:
+            Optional[np.ndarray]: float32 array (snippets, 40), NaN rows were not extracted yet
+        """
+
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT data, rows FROM features WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(key)
+        data, rows = row
+        return np.frombuffer(data, dtype=np.float32).reshape(rows, -1)
+
+    def put_features(self, key: str, features: np.ndarray):
+        """Store features of key and evict old songs if the cache is too large.
+
+        Args:
+            key (str): Fingerprint of the song
+            features (np.ndarray): float32 array (snippets, 40), NaN rows were not extracted yet
+        """
+
+        data = np.ascontiguousarray(features, dtype=np.float32).tobytes()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(features), len(data), time.time()),
+            )
+            self._evict()
+
+    def get_prediction(
+        self, key: str, model_to_use: int, sampling: str = "full"
+    ) -> Optional[dict]:
+        """Stored song-level prediction of key with the given model and sampling, None if missing.
+
+        Args:
+            key (str): Fingerprint of the song
+            model_to_use (int): The used model
+            sampling (str, optional): How the predicted snippets were chosen. Defaults to "full".
+
+        Returns:
+            Optional[dict]: The stored response
+        """
+
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT data FROM predictions WHERE key = ? AND model = ? AND sampling = ?",
+                (key, model_to_use, sampling),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(key)
+        return json.loads(row[0])
+
+    def put_prediction(
+        self, key: str, model_to_use: int, response: dict, sampling: str = "full"
+    ):
+        """Store song-level prediction of key with the given model and sampling.
+
+        Predictions are only kept as long as the features of their song.
+
+        Args:
+            key (str): Fingerprint of the song
+            model_to_use (int): The used model
+            response (dict): The response to store
+            sampling (str, optional): How the predicted snippets were chosen. Defaults to "full".
+        """
+
+        data = json.dumps(response)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO predictions "
+                "SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM features WHERE key = ?)",
+                (key, model_to_use, sampling, data, len(data), key),
+            )
+            self._evict()
+
+    def size(self) -> int:
+        """Stored bytes of features and predictions."""
+
+        with self.lock:
+            return self._size()
+
+    def _size(self) -> int:
+        return self.connection.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM features) + "
+            "(SELECT COALESCE(SUM(size), 0) FROM predictions)"
+        ).fetchone()[0]
+
+    def _touch(self, key: str):
+        self.connection.execute(
+            "UPDATE features SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+
+    def _evict(self):
+        """Remove least recently used songs until the cache fits max_bytes."""
+
+        excess = self._size() - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self.connection.execute(
+            "SELECT key, size + (SELECT COALESCE(SUM(size), 0) FROM predictions "
+            "WHERE predictions.key = features.key) FROM features ORDER BY last_used"
+        )
+        keys = []
+        for key, size in rows:
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM features WHERE key = ?", keys)
+        self.connection.executemany("DELETE FROM predictions WHERE key = ?", keys)
@@ -0,0 +1,444 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import librosa
+import numpy as np
+import soxr
+
+import constants
+
+# feature parameters the models are trained with (librosa defaults)
+SAMPLE_RATE = 22050
+N_MFCC = 20
+N_FFT = 2048
+HOP_LENGTH = 512
+# dB range of the mel spectrogram of a snippet, as in librosa.feature.mfcc
+TOP_DB = 80.0
+
+
+def mfcc_statistics(mfcc: np.ndarray) -> np.ndarray:
+    """Mean and standard deviation of every mfcc over time.
+
+    Args:
+        mfcc (np.ndarray): mfcc matrix (n_mfcc, frames), or a stack of them (..., n_mfcc, frames)
+
+    Returns:
+        np.ndarray: float32 values in the order [mfcc1_mean,mfcc1_std,mfcc2_mean,...,mfcc20_std]
+    """
+
+    statistics = np.stack([mfcc.mean(axis=-1), mfcc.std(axis=-1)], axis=-1)
+    return statistics.reshape(*statistics.shape[:-2], -1).astype(np.float32)
+
+
+def load_audio(file) -> np.ndarray:
+    """Decode and resample an audio file once.
+
+    Args:
+        file: Path or file-like object of the audio file, or a tuple (sample_rate, samples) of
+              already decoded audio, e.g. of gradio.Audio(type="numpy")
+
+    Returns:
+        np.ndarray: Mono samples at SAMPLE_RATE
+    """
+
+    if isinstance(file, tuple):
+        return audio_samples(*file)
+    y, _ = librosa.load(file, sr=SAMPLE_RATE, mono=True)
+    return y
+
+
+def audio_samples(sample_rate: int, samples: np.ndarray) -> np.ndarray:
+    """Convert decoded audio in memory like librosa.load does with a file.
+
+    Args:
+        sample_rate (int): Sample rate of samples
+        samples (np.ndarray): Integer or float samples (length,) or (length, channels)
+
+    Returns:
+        np.ndarray: float32 mono samples in [-1, 1] at SAMPLE_RATE
+    """
+
+    samples = np.asarray(samples)
+    if np.issubdtype(samples.dtype, np.integer):
+        scale = float(1 << (8 * samples.dtype.itemsize - 1))
+        y = samples.astype(np.float32)
+        if np.issubdtype(samples.dtype, np.unsignedinteger):
+            y -= scale
+        y /= scale
+    else:
+        y = samples.astype(np.float32, copy=False)
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    if sample_rate != SAMPLE_RATE:
+        y = librosa.resample(y, orig_sr=sample_rate, target_sr=SAMPLE_RATE, res_type="soxr_hq")
+    return y
+
+
+def snippet_offsets(
+    song_duration: float,
+    max_duration: float = constants.TRAINED_MUSIC_DURATION_IN_SECONDS,
+) -> List[float]:
+    """Offsets of the snippets a song is split into.
+
+    Songs not longer than max_duration are one snippet, longer songs are split in snippets of max_duration.
+
+    Args:
+        song_duration (float): Duration of the song in seconds
+        max_duration (float, optional): Duration of a snippet. Defaults to constants.TRAINED_MUSIC_DURATION_IN_SECONDS.
+
+    Returns:
+        List[float]: Offsets in seconds
+    """
+
+    if song_duration <= max_duration:
+        return [0]
+    offsets = []
+    offset = 0
+    while song_duration - offset > max_duration:
+        offsets.append(offset)
+        offset += max_duration
+    return offsets
+
+
+def song_features(
+    y: np.ndarray,
+    sr: int = SAMPLE_RATE,
+    max_duration: float = constants.TRAINED_MUSIC_DURATION_IN_SECONDS,
+) -> np.ndarray:
+    """mfcc statistics of every snippet of a decoded song.
+
+    One mel spectrogram is computed for the whole song and sliced into the frame ranges
+    of the snippets. Every snippet is dB scaled with its own 80 dB floor like its mfcc
+    computed on its own, and the statistics of all snippets are reduced at once. The
+    rows approximate librosa.feature.mfcc of the snippets, see frame_statistics.
+
+    Args:
+        y (np.ndarray): Mono samples of the song
+        sr (int, optional): Sample rate of y. Defaults to SAMPLE_RATE.
+        max_duration (float, optional): Duration of a snippet. Defaults to constants.TRAINED_MUSIC_DURATION_IN_SECONDS.
+
+    Returns:
+        np.ndarray: float32 array (snippets, 40)
+    """
+
+    offsets = snippet_offsets(len(y) / sr, max_duration)
+    if len(offsets) == 1:
+        mfcc = librosa.feature.mfcc(
+            y=y, sr=sr, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH
+        )
+        return mfcc_statistics(mfcc)[np.newaxis]
+
+    frames, starts = snippet_frames(len(y), sr, offsets, max_duration)
+    return segment_features(y, sr, starts, frames)
+
+
+def snippet_frames(
+    length: int,
+    sr: int,
+    offsets: List[float],
+    max_duration: float = constants.TRAINED_MUSIC_DURATION_IN_SECONDS,
+) -> Tuple[int, np.ndarray]:
+    """Frame ranges of the snippets in the centered spectrogram of a whole song.
+
+    Args:
+        length (int): Number of samples of the song
+        sr (int): Sample rate of the song
+        offsets (List[float]): Offsets of the snippets in seconds
+        max_duration (float, optional): Duration of a snippet. Defaults to constants.TRAINED_MUSIC_DURATION_IN_SECONDS.
+
+    Returns:
+        Tuple[int, np.ndarray]: frames per snippet and first frame of every snippet
+    """
+
+    # frames of a snippet as if it was computed on its own (centered frames)
+    frames = 1 + int(max_duration * sr) // HOP_LENGTH
+    total_frames = 1 + length // HOP_LENGTH
+    starts = np.minimum(
+        np.round(np.asarray(offsets) * sr / HOP_LENGTH).astype(int), total_frames - frames
+    )
+    return frames, starts
+
+
+def frame_statistics(mel: np.ndarray, starts: np.ndarray, frames: int) -> np.ndarray:
+    """mfcc statistics of the frame ranges starting at starts of a mel power spectrogram.
+
+    Every frame range is dB scaled relative to its own loudest frame like
+    librosa.feature.mfcc of that snippet on its own, and all snippets are reduced at once.
+    The result only approximates it: snippet starts are rounded to whole hop frames and the
+    border frames of a range see the neighbouring audio instead of zero padding. On test
+    songs the statistics differ by up to about 0.5, a few units for tonal signals, on values
+    of up to a few hundred.
+
+    Args:
+        mel (np.ndarray): mel power spectrogram (n_mels, frames)
+        starts (np.ndarray): First frames of the snippets
+        frames (int): Frames per snippet
+
+    Returns:
+        np.ndarray: float32 array (len(starts), 40)
+    """
+
+    # (n_mels, snippets, frames) -> (snippets, n_mels, frames)
+    snippets = mel[:, starts[:, np.newaxis] + np.arange(frames)].transpose(1, 0, 2)
+    db = librosa.power_to_db(snippets, top_db=None)
+    db = np.maximum(db, db.max(axis=(1, 2), keepdims=True) - TOP_DB)
+    return mfcc_statistics(librosa.feature.mfcc(S=db, n_mfcc=N_MFCC))
+
+
+def snippet_features(
+    y: np.ndarray,
+    indices: List[int],
+    sr: int = SAMPLE_RATE,
+    max_duration: float = constants.TRAINED_MUSIC_DURATION_IN_SECONDS,
+) -> np.ndarray:
+    """mfcc statistics of only some snippets of a decoded song.
+
+    Only the samples of the requested snippets are transformed, the rows equal the ones
+    of song_features.
+
+    Args:
+        y (np.ndarray): Mono samples of the song
+        indices (List[int]): Indices of the snippets, see snippet_offsets
+        sr (int, optional): Sample rate of y. Defaults to SAMPLE_RATE.
+        max_duration (float, optional): Duration of a snippet. Defaults to constants.TRAINED_MUSIC_DURATION_IN_SECONDS.
+
+    Returns:
+        np.ndarray: float32 array (len(indices), 40) in the order of indices
+    """
+
+    offsets = snippet_offsets(len(y) / sr, max_duration)
+    if len(offsets) == 1:
+        return np.repeat(song_features(y, sr, max_duration), len(indices), axis=0)
+
+    frames, starts = snippet_frames(len(y), sr, offsets, max_duration)
+    return np.concatenate(
+        [segment_features(y, sr, starts[index : index + 1], frames) for index in indices]
+    )
+
+
+def segment_features(y: np.ndarray, sr: int, starts: np.ndarray, frames: int) -> np.ndarray:
+    """mfcc statistics of the snippets starting at the frames starts, only their samples are transformed.
+
+    Args:
+        y (np.ndarray): Mono samples of the song
+        sr (int): Sample rate of y
+        starts (np.ndarray): Ascending first frames of the snippets in the centered spectrogram of the song
+        frames (int): Frames per snippet
+
+    Returns:
+        np.ndarray: float32 array (len(starts), 40)
+    """
+
+    # samples of the centered frames [first, last), zero padded at the song borders
+    first, last = starts[0], starts[-1] + frames
+    low = first * HOP_LENGTH - N_FFT // 2
+    high = (last - 1) * HOP_LENGTH + N_FFT // 2
+    segment = np.zeros(high - low, dtype=np.float32)
+    segment[max(low, 0) - low : min(high, len(y)) - low] = y[max(low, 0) : min(high, len(y))]
+
+    mel = librosa.feature.melspectrogram(
+        y=segment, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False
+    )
+    return frame_statistics(mel, starts - first, frames)
+
+
+class FeatureExtractor:
+    """Feature extraction on a process pool.
+
+    The snippets of a long song are split into tasks of contiguous snippets, the decoded
+    audio is passed to the workers through shared memory instead of being pickled.
+    Multiple files are decoded and processed by the workers on their own.
+    """
+
+    def __init__(self, max_workers: int = None, snippets_per_task: int = 8):
+        """Initialize feature extractor.
+
+        Args:
+            max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            snippets_per_task (int, optional): Snippets processed by one task, shorter songs
+                                               are processed in the calling process. Defaults to 8.
+        """
+
+        self.snippets_per_task = snippets_per_task
+        # forking a process with running UI threads is unsafe
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def song_features(self, y: np.ndarray, sr: int = SAMPLE_RATE) -> np.ndarray:
+        """mfcc statistics of every snippet of a decoded song, equal to song_features.
+
+        Args:
+            y (np.ndarray): Mono samples of the song
+            sr (int, optional): Sample rate of y. Defaults to SAMPLE_RATE.
+
+        Returns:
+            np.ndarray: float32 array (snippets, 40)
+        """
+
+        offsets = snippet_offsets(len(y) / sr)
+        if len(offsets) < 2 * self.snippets_per_task:
+            return song_features(y, sr)
+
+        frames, starts = snippet_frames(len(y), sr, offsets)
+        memory = shared_memory.SharedMemory(create=True, size=max(1, len(y) * 4))
+        try:
+            np.ndarray(len(y), dtype=np.float32, buffer=memory.buf)[:] = y
+            futures = [
+                self.executor.submit(
+                    _task_features,
+                    memory.name,
+                    len(y),
+                    sr,
+                    starts[i : i + self.snippets_per_task],
+                    frames,
+                )
+                for i in range(0, len(starts), self.snippets_per_task)
+            ]
+            return np.concatenate([future.result() for future in futures])
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def files_features(self, files: List[str]) -> List[np.ndarray]:
+        """Decode and extract the features of several files in parallel.
+
+        Args:
+            files (List[str]): Paths of the audio files
+
+        Returns:
+            List[np.ndarray]: float32 array (snippets, 40) per file
+        """
+
+        return list(self.executor.map(_file_features, files))
+
+    def shutdown(self):
+        """Stop the worker processes."""
+
+        self.executor.shutdown()
+
+
+def _file_features(file: str) -> np.ndarray:
+    """Worker task: features of a whole file."""
+
+    return song_features(load_audio(file))
+
+
+def _task_features(
+    name: str, length: int, sr: int, starts: np.ndarray, frames: int
+) -> np.ndarray:
+    """Worker task: features of the snippets starting at the frames starts of the song in shared memory."""
+
+    memory = _attach(name)
+    try:
+        y = np.ndarray(length, dtype=np.float32, buffer=memory.buf)
+        features = segment_features(y, sr, starts, frames)
+        del y
+    finally:
+        memory.close()
+    return features
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to shared memory owned by the calling process."""
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks, the owner unlinks it anyway
+        return shared_memory.SharedMemory(name=name)
+
+
+class StreamingFeatures:
+    """Incremental mfcc statistics of a live audio stream.
+
+    Mel spectrogram frames are computed once per chunk as samples arrive and kept in a
+    ring buffer. Whenever a window of the trained duration is complete, only the cheap
+    dB scaling and DCT run over the buffered frames. Frames are not centered, so the
+    first and last frame of a window differ slightly from 'librosa.feature.mfcc' on the
+    same snippet.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        window_seconds: float = constants.TRAINED_MUSIC_DURATION_IN_SECONDS,
+        hop_seconds: float = None,
+    ):
+        """Initialize streaming feature extraction.
+
+        Args:
+            sample_rate (int, optional): Sample rate of the pushed samples, resampled if it differs
+                                         from the trained one. Defaults to SAMPLE_RATE.
+            window_seconds (float, optional): Duration of a window. Defaults to constants.TRAINED_MUSIC_DURATION_IN_SECONDS.
+            hop_seconds (float, optional): Seconds between the starts of two windows. Defaults to window_seconds.
+
+        Raises:
+            ValueError: If sample_rate or hop_seconds is not positive or a window is shorter than one frame
+        """
+
+        if not sample_rate > 0:
+            raise ValueError("sample_rate has to be positive")
+        if hop_seconds is not None and not hop_seconds > 0:
+            raise ValueError("hop_seconds has to be positive")
+        if int(window_seconds * SAMPLE_RATE) < N_FFT:
+            raise ValueError("window_seconds has to cover at least one frame")
+
+        self.resampler = None
+        if sample_rate != SAMPLE_RATE:
+            self.resampler = soxr.ResampleStream(sample_rate, SAMPLE_RATE, 1, dtype="float32")
+        self.window_frames = 1 + (int(window_seconds * SAMPLE_RATE) - N_FFT) // HOP_LENGTH
+        hop_seconds = window_seconds if hop_seconds is None else hop_seconds
+        self.hop_frames = max(1, int(round(hop_seconds * SAMPLE_RATE / HOP_LENGTH)))
+        self.frames = deque(maxlen=self.window_frames)
+        self.frame_count = 0
+        self.next_window_end = self.window_frames
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def push(self, samples: np.ndarray) -> List[Tuple[float, np.ndarray]]:
+        """Add mono samples and return the features of every window completed by them.
+
+        Args:
+            samples (np.ndarray): Mono samples in [-1, 1]
+
+        Returns:
+            List[Tuple[float, np.ndarray]]: start of the window in seconds and its 40 mfcc statistics
+        """
+
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.resampler is not None:
+            samples = self.resampler.resample_chunk(samples)
+        self.pending = np.concatenate([self.pending, samples])
+        if len(self.pending) < N_FFT:
+            return []
+
+        # all complete frames of the pending samples, the overlap stays pending
+        count = 1 + (len(self.pending) - N_FFT) // HOP_LENGTH
+        mel = librosa.feature.melspectrogram(
+            y=self.pending[: N_FFT + (count - 1) * HOP_LENGTH],
+            sr=SAMPLE_RATE,
+            n_fft=N_FFT,
+            hop_length=HOP_LENGTH,
+            center=False,
+        )
+        self.pending = self.pending[count * HOP_LENGTH :]
+
+        windows = []
+        for frame in mel.T:
+            self.frames.append(frame)
+            self.frame_count += 1
+            if self.frame_count == self.next_window_end:
+                start = (self.frame_count - self.window_frames) * HOP_LENGTH / SAMPLE_RATE
+                windows.append((start, self.window_statistics()))
+                self.next_window_end += self.hop_frames
+        return windows
+
+    def window_statistics(self) -> np.ndarray:
+        """mfcc statistics of the buffered window."""
+
+        mel = np.stack(self.frames, axis=1)
+        mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+        return mfcc_statistics(mfcc)
@@ -0,0 +1,134 @@
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def spread_order(count: int) -> List[int]:
+    """Snippet indices in a spread-out order.
+
+    The indices follow the bit-reversed (van der Corput) sequence: the first, the middle,
+    the quarters, the eighths and so on. Every prefix of the order covers the song evenly.
+
+    Args:
+        count (int): Number of snippets
+
+    Returns:
+        List[int]: Every index in [0, count) once
+    """
+
+    bits = max(1, (count - 1).bit_length())
+    order = []
+    for i in range(1 << bits):
+        index = int(format(i, "0{}b".format(bits))[::-1], 2)
+        if index < count:
+            order.append(index)
+    return order
+
+
+class AdaptiveAggregate:
+    """Running mean of snippet confidences with a stopping rule.
+
+    After every round of snippets the lead of the top genre over the runner-up is
+    estimated with a confidence interval over the per-snippet leads. Snippets are
+    sampled without replacement, so the interval shrinks to zero once every snippet
+    was seen. Sampling stops as soon as the lower bound of the lead is above zero or
+    the budget is used up.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        budget: int = None,
+        min_snippets: int = 4,
+        z: float = 2.576,
+    ):
+        """Initialize aggregate.
+
+        Args:
+            total (int): Number of snippets of the song
+            budget (int, optional): Maximum number of snippets to predict, None for all. Defaults to None.
+            min_snippets (int, optional): Snippets predicted before the lead is tested. Defaults to 4.
+            z (float, optional): z-score of the confidence interval. Defaults to 2.576 (99%).
+        """
+
+        self.total = total
+        self.budget = total if budget is None else min(budget, total)
+        self.min_snippets = min_snippets
+        self.z = z
+        self.genres = []
+        self.rows = []
+
+    @property
+    def count(self) -> int:
+        """Number of added snippets."""
+
+        return len(self.rows)
+
+    @property
+    def remaining(self) -> int:
+        """Number of snippets left in the budget."""
+
+        return self.budget - self.count
+
+    def add(self, confidences: Dict[str, float]):
+        """Add the confidences of one snippet.
+
+        Args:
+            confidences (Dict[str, float]): Confidence per genre
+        """
+
+        if not self.genres:
+            self.genres = list(confidences)
+        self.rows.append([confidences.get(genre, 0.0) for genre in self.genres])
+
+    def mean(self) -> Dict[str, float]:
+        """Mean confidence per genre of the added snippets."""
+
+        means = np.mean(self.rows, axis=0)
+        return {genre: float(value) for genre, value in zip(self.genres, means)}
+
+    def lead_interval(self) -> Tuple[float, float]:
+        """Confidence interval of the mean lead of the top genre over the runner-up.
+
+        Returns:
+            Tuple[float, float]: Lower and upper bound
+        """
+
+        rows = np.asarray(self.rows)
+        means = rows.mean(axis=0)
+        if len(means) < 2:
+            return math.inf, math.inf
+        second, top = np.argsort(means)[-2:]
+        leads = rows[:, top] - rows[:, second]
+        lead = float(leads.mean())
+        if self.count < 2:
+            return -math.inf, math.inf
+        # finite population correction, the song has only 'total' snippets
+        correction = math.sqrt((self.total - self.count) / max(1, self.total - 1))
+        margin = self.z * float(leads.std(ddof=1)) / math.sqrt(self.count) * correction
+        return lead - margin, lead + margin
+
+    def is_done(self) -> bool:
+        """Whether the budget is used up or the lead of the top genre is stable."""
+
+        if self.remaining <= 0:
+            return True
+        if self.count < self.min_snippets:
+            return False
+        return self.lead_interval()[0] > 0
+
+    def response(self) -> Dict:
+        """Main genre and mean confidences of the added snippets.
+
+        Returns:
+            Dict: genre, confidences, snippets (used) and total_snippets
+        """
+
+        confidences = self.mean()
+        return {
+            "genre": max(confidences, key=confidences.get),
+            "confidences": confidences,
+            "snippets": self.count,
+            "total_snippets": self.total,
+        }
@@ -1,48 +1,149 @@
+import functools
+import logging
 import os
+from typing import List
+
+import audioread
 import numpy as np
+import soundfile
 import tensorflow as tf
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 
 from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.service import (
+    InferenceQueue,
+    MicroBatcher,
+    ModelRegistry,
+    ResponseCache,
+    fold_scaler,
+)
+from easymlserve.service.upload import receive_upload, upload_route_args
 
-from api_schema import APIRequest, APIResponse
+from api_schema import APIRequest, APIResponse, SongResponse
+from features import SAMPLE_RATE, StreamingFeatures, load_audio, song_features
 from joblib import load
 
 import constants
 
+logger = logging.getLogger(__name__)
+
+# raised by librosa.load for files which are no (supported) audio
+DECODE_ERRORS = (soundfile.SoundFileError, audioread.exceptions.DecodeError)
+
+# model_to_use -> name of the model and scaler files and the genres returned by the model
+MODELS = {
+    0: ("librosa_gtzan", constants.GTZAN_GENRES),  # Librosa GTZAN
+    1: ("librosa_fma", constants.FMA_GENRES),  # Librosa FMA
+    2: ("jlibrosa_gtzan", constants.GTZAN_GENRES),  # JLibrosa GTZAN
+    3: ("jlibrosa_fma", constants.FMA_GENRES),  # JLibrosa FMA
+}
+
 
 class GenreDetectionService(EasyMLService):
     """Genre detection service."""
 
+    # music_array may also be sent as raw float32, .npy or msgpack binary
+    tensor_field = "music_array"
+
+    # uploads to /process_audio beyond 100 MB are rejected with 413
+    max_upload_bytes = 100 * 1024 * 1024
+
+    # predict with a NumPy forward pass of the dense models instead of TensorFlow,
+    # the scaler is folded into the first layer of the model. Models which can not
+    # be converted are predicted with TensorFlow.
+    numpy_inference = True
+
+    def __init__(self, **kwargs):
+        """Create the service with an additional route for uploaded audio files.
+
+        Args:
+            **kwargs: Arguments of EasyMLService
+        """
+
+        super().__init__(**kwargs)
+        self.router.add_api_route(
+            "/process_audio",
+            self.process_audio,
+            methods=["POST"],
+            response_model=SongResponse,
+            **upload_route_args({}),
+        )
+
     def load_model(self):
-        """Called once at startup. Loads all models and scalers used in the service.
+        """Called once at startup. Registers all models and scalers used in the service.
+        Only the most used model is loaded at startup and never unloaded again,
+        the others are loaded on first use.
         The scalers transform the received values so that the model can process them."""
 
         # get path of this file
         path_to_folder = os.path.dirname(os.path.abspath(__file__))
 
-        # load librosa gtzan model & scaler
-        self.librosa_gtzan_model = tf.keras.models.load_model(
-            path_to_folder + "/librosa_gtzan_model.h5"
-        )
-        self.librosa_gtzan_scaler = load(path_to_folder + "/librosa_gtzan_scaler.bin")
+        for model_to_use, (name, _) in MODELS.items():
+            self.models.register(
+                model_to_use,
+                functools.partial(self.load_model_files, path_to_folder, name),
+                pinned=model_to_use == 2,  # JLibrosa GTZAN serves most of the traffic
+            )
 
-        # load librosa fma model & scaler
-        self.librosa_fma_model = tf.keras.models.load_model(
-            path_to_folder + "/librosa_fma_model.h5"
-        )
-        self.librosa_fma_scaler = load(path_to_folder + "/librosa_fma_scaler.bin")
+    def load_model_files(self, path_to_folder: str, name: str) -> tuple:
+        """Load scaler and model stored under the given name
 
-        # load jlibrosa gtzan model & scaler
-        self.jlibrosa_gtzan_model = tf.keras.models.load_model(
-            path_to_folder + "/jlibrosa_gtzan_model.h5"
-        )
-        self.jlibrosa_gtzan_scaler = load(path_to_folder + "/jlibrosa_gtzan_scaler.bin")
+        Args:
+            path_to_folder (str): Folder containing the model and scaler files
+            name (str): Name of the model, e.g. "librosa_gtzan"
 
-        # load jlibrosa fma model & scaler
-        self.jlibrosa_fma_model = tf.keras.models.load_model(
-            path_to_folder + "/jlibrosa_fma_model.h5"
-        )
-        self.jlibrosa_fma_scaler = load(path_to_folder + "/jlibrosa_fma_scaler.bin")
+        Returns:
+            tuple: scaler and model, scaler is None if it is folded into the model
+        """
+
+        model = tf.keras.models.load_model(path_to_folder + "/" + name + "_model.h5")
+        scaler = load(path_to_folder + "/" + name + "_scaler.bin")
+        if self.numpy_inference:
+            try:
+                # validated against scaler and Keras model while folding
+                return None, fold_scaler(scaler, model)
+            except ValueError:
+                logger.warning(
+                    "Model %s can not be predicted with NumPy, using TensorFlow.",
+                    name,
+                    exc_info=True,
+                )
+        return scaler, model
+
+    def warmup(self, batch_size: int):
+        """Predict a dummy batch with every loaded model, so the first requests don't pay for graph tracing.
+
+        Args:
+            batch_size (int): Number of dummy mfcc arrays to predict at once
+        """
+
+        for model_to_use in MODELS:
+            if not self.models.is_loaded(model_to_use):
+                continue
+            scaler, model, genres = self.get_model(model_to_use)
+            if scaler is None:
+                np_array = np.zeros((batch_size, model.input_size), dtype=np.float32)
+            else:
+                np_array = np.tile(scaler.mean_, (batch_size, 1))
+            self.get_batch_return_values(np_array, scaler, model, genres)
+
+    def get_model(self, model_to_use: int) -> tuple:
+        """Return scaler, model and genres of the requested model.
+
+        Args:
+            model_to_use (int): The model requested by the client
+
+        Returns:
+            tuple: scaler, model and the genres which are returned by the model
+        """
+
+        # unknown models fall back to Librosa GTZAN
+        if model_to_use not in MODELS:
+            model_to_use = 0
+
+        scaler, model = self.models.get(model_to_use)
+        return scaler, model, MODELS[model_to_use][1]
 
     def process(self, request: APIRequest) -> APIResponse:
         """Process REST API request and return genre.
@@ -54,39 +155,175 @@ class GenreDetectionService(EasyMLService):
             APIResponse: The response that will be send
         """
 
-        np_array = np.array([request.music_array])
+        return self.process_batch([request])[0]
 
-        if request.model_to_use == 1:  # Librosa FMA
-            main_genre, confidences = self.get_return_values(
-                np_array,
-                self.librosa_fma_scaler,
-                self.librosa_fma_model,
-                constants.FMA_GENRES,
-            )
-        elif request.model_to_use == 2:  # JLibrosa GTZAN
-            main_genre, confidences = self.get_return_values(
-                np_array,
-                self.jlibrosa_gtzan_scaler,
-                self.jlibrosa_gtzan_model,
-                constants.GTZAN_GENRES,
-            )
-        elif request.model_to_use == 3:  # JLibrosa FMA
-            main_genre, confidences = self.get_return_values(
-                np_array,
-                self.jlibrosa_fma_scaler,
-                self.jlibrosa_fma_model,
-                constants.FMA_GENRES,
-            )
-        else:  # Librosa GTZAN
-            main_genre, confidences = self.get_return_values(
-                np_array,
-                self.librosa_gtzan_scaler,
-                self.librosa_gtzan_model,
-                constants.GTZAN_GENRES,
-            )
+    def batch_key(self, request: APIRequest) -> int:
+        """Only requests for the same model are batched together."""
+        return request.model_to_use
 
-        # generate the response as a simple json string
-        return {"genre": main_genre, "confidences": confidences}
+    def process_batch(self, requests: List[APIRequest]) -> List[APIResponse]:
+        """Process multiple requests with one prediction per used model.
+
+        Args:
+            requests (List[APIRequest]): The requests received
+
+        Returns:
+            List[APIResponse]: The responses in the order of the requests
+        """
+
+        # group the requests by the model they want to use
+        indices_per_model = dict()
+        for i, request in enumerate(requests):
+            indices_per_model.setdefault(request.model_to_use, []).append(i)
+
+        responses = [None] * len(requests)
+        for model_to_use, indices in indices_per_model.items():
+            scaler, model, genres = self.get_model(model_to_use)
+            np_array = np.array([requests[i].music_array for i in indices])
+            results = self.get_batch_return_values(np_array, scaler, model, genres)
+
+            # generate the responses as simple json strings
+            for i, (main_genre, confidences) in zip(indices, results):
+                responses[i] = {"genre": main_genre, "confidences": confidences}
+
+        return responses
+
+    async def process_audio(self, http_request: Request) -> SongResponse:
+        """Process an uploaded audio file and return the genre of the whole song.
+
+        The song is sent as multipart/form-data with the fields "file" and "model_to_use",
+        or as raw body with model_to_use as query parameter. The body is spooled to disk
+        and rejected with 413 once it exceeds max_upload_bytes. Decoding and feature
+        extraction run in the threadpool once the inference queue admitted the request,
+        all snippets are predicted in one batch.
+
+        Args:
+            http_request (Request): The request with the audio file as body
+
+        Raises:
+            HTTPException: 400 if model_to_use is no integer, 415 if the file can not be decoded
+
+        Returns:
+            SongResponse: Genre and mean confidences of all snippets
+        """
+
+        async with receive_upload(
+            http_request, self.upload_spool_size, self.max_upload_bytes
+        ) as (file, params):
+            try:
+                model_to_use = int(params.get("model_to_use", 2))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="model_to_use has to be an integer")
+
+            # decoding is the most expensive part, it must not bypass the queue
+            async with self._admit(http_request):
+                with self.stage("feature_extraction"):
+                    try:
+                        np_array = await run_in_threadpool(self.extract_features, file.file)
+                    except DECODE_ERRORS:
+                        raise HTTPException(
+                            status_code=415, detail="Audio file can not be decoded"
+                        )
+                return await run_in_threadpool(self.predict_song, np_array, model_to_use)
+
+    def extract_features(self, file) -> np.ndarray:
+        """Decode the song once and compute the mfcc statistics of all its snippets.
+
+        Args:
+            file: Path or file-like object of the audio file
+
+        Returns:
+            np.ndarray: mfcc values, one row per snippet
+        """
+
+        return song_features(load_audio(file))
+
+    def predict_song(self, np_array: np.ndarray, model_to_use: int) -> dict:
+        """Predict all snippets of a song at once and average their confidences.
+
+        Args:
+            np_array (np.ndarray): mfcc values, one row per snippet
+            model_to_use (int): The model requested by the client
+
+        Returns:
+            dict: Main genre, mean confidences and number of snippets
+        """
+
+        scaler, model, genres = self.get_model(model_to_use)
+        results = self.get_batch_return_values(np_array, scaler, model, genres)
+        confidences = {
+            genre: float(np.mean([result[genre] for _, result in results]))
+            for genre in genres
+        }
+        return {
+            "genre": max(confidences, key=confidences.get),
+            "confidences": confidences,
+            "snippets": len(results),
+        }
+
+    def open_stream(self, params: dict) -> dict:
+        """Start a live stream of mono PCM chunks on /stream.
+
+        Query parameters: model_to_use (default 2), sample_rate (default 22050),
+        hop_seconds between two windows (default the trained duration) and
+        dtype of the samples, "float32" (default) or "int16".
+
+        Args:
+            params (dict): Query parameters of the connection
+
+        Raises:
+            ValueError: If a query parameter is invalid, the connection is closed with code 1008
+
+        Returns:
+            dict: State of the stream
+        """
+
+        dtypes = {"float32": np.dtype("<f4"), "int16": np.dtype("<i2")}
+        dtype = params.get("dtype", "float32")
+        if dtype not in dtypes:
+            raise ValueError("dtype has to be float32 or int16")
+        hop_seconds = params.get("hop_seconds")
+        return {
+            "model_to_use": int(params.get("model_to_use", 2)),
+            "dtype": dtypes[dtype],
+            "rest": b"",
+            "features": StreamingFeatures(
+                sample_rate=int(params.get("sample_rate", SAMPLE_RATE)),
+                hop_seconds=float(hop_seconds) if hop_seconds else None,
+            ),
+        }
+
+    def process_stream(self, state: dict, chunk: bytes) -> List[dict]:
+        """Add a PCM chunk to the stream and predict every window completed by it.
+
+        Args:
+            state (dict): State of the stream
+            chunk (bytes): Received samples, may end within a sample
+
+        Returns:
+            List[dict]: start of the window in seconds, genre and confidences per completed window
+        """
+
+        # keep bytes of an incomplete sample for the next chunk
+        data = state["rest"] + chunk
+        dtype = state["dtype"]
+        usable = len(data) - len(data) % dtype.itemsize
+        state["rest"] = data[usable:]
+        samples = np.frombuffer(data, dtype=dtype, count=usable // dtype.itemsize)
+        if dtype.kind == "i":
+            samples = samples / np.float32(32768)
+
+        windows = state["features"].push(samples)
+        if not windows:
+            return []
+
+        scaler, model, genres = self.get_model(state["model_to_use"])
+        np_array = np.stack([features for _, features in windows])
+        results = self.get_batch_return_values(np_array, scaler, model, genres)
+        return [
+            {"start": start, "genre": genre, "confidences": confidences}
+            for (start, _), (genre, confidences) in zip(windows, results)
+        ]
 
     def get_return_values(
         self, np_array, scaler, model, genres=constants.GTZAN_GENRES
@@ -103,29 +340,67 @@ class GenreDetectionService(EasyMLService):
             tuple[str, dict]: main_genre and confidences with genres as keys
         """
 
+        return self.get_batch_return_values(np_array, scaler, model, genres)[0]
+
+    def get_batch_return_values(
+        self, np_array, scaler, model, genres=constants.GTZAN_GENRES
+    ) -> List[tuple[str, dict]]:
+        """Process every row of np_array with one prediction and return main_genre and confidences per row
+
+        Args:
+            np_array (np_array): mfcc values, one row per snippet
+            scaler: The scaler to use with the model, None if it is folded into the model
+            model: The model used to predict the genres
+            genres (list[str], optional): The genres which are returned by the model. Defaults to constants.GTZAN_GENRES.
+
+        Returns:
+            List[tuple[str, dict]]: main_genre and confidences with genres as keys for every row
+        """
+
         # up or downscale the values to match the trainigs data
-        np_array = scaler.transform(np_array)
+        if scaler is not None:
+            with self.stage("scaler_transform"):
+                np_array = scaler.transform(np_array)
+
+        # get the prediction of all rows at once
+        with self.stage("predict"):
+            predictions = model.predict(np_array)
 
-        # get the prediction
-        prediction = model.predict(np_array)
+        results = list()
+        for prediction in predictions:
+            # get the highest value, as this is the main genre
+            genre = np.argmax(prediction)
 
-        # get the highest value, as this is the main genre
-        genre = np.argmax(prediction[0])
+            confidences = dict()
 
-        confidences = dict()
+            # enter all the confidences into the dict
+            for x in range(len(genres)):
+                confidences[genres[x]] = float(prediction[x])
 
-        # enter all the confidences into the dict
-        for x in range(len(genres)):
-            confidences[genres[x]] = float(prediction[0][x])
+            results.append((genres[genre], confidences))
 
-        return genres[genre], confidences
+        return results
 
 
 if __name__ == "__main__":
-    # create the service
-    service = GenreDetectionService()
+    # create the service, concurrent requests for the same model are predicted together
+    # and requests beyond the queue size are rejected instead of slowing down everyone.
+    # Repeated songs and mfcc values are answered from the cache.
+    service = GenreDetectionService(
+        batcher=MicroBatcher(max_batch_size=32, max_wait=0.005),
+        queue=InferenceQueue(max_concurrency=32, max_queue_size=256),
+        cache=ResponseCache(max_bytes=32 * 1024 * 1024, ttl=24 * 60 * 60),
+        registry=ModelRegistry(memory_budget=256 * 1024 * 1024),
+        preload_models=[2],  # the pinned model, the others are loaded on first use
+        warmup_batch_sizes=[1, 8, 32],  # expected batch sizes of the batcher
+    )
 
-    # create a server with the service and some arguments
-    server = EasyMLServer(service, uvicorn_args={"host": "0.0.0.0", "port": 8000})
+    # create a server with the service and some arguments, a UI on the same host
+    # connects through the local socket instead of TCP
+    server = EasyMLServer(
+        service,
+        uvicorn_args={"host": "0.0.0.0", "port": 8000},
+        local_socket=constants.LOCAL_SOCKET if os.name == "posix" else None,
+    )
     # start the server
     server.deploy()
@@ -1,11 +1,23 @@
 import os
 from typing import List
-import librosa as librosa
+
+import numpy as np
 
 from easymlserve.ui import GradioEasyMLUI, QtEasyMLUI
 from easymlserve.ui.type import *
 
 from api_schema import *
+from feature_cache import FeatureCache
+from features import (
+    N_MFCC,
+    SAMPLE_RATE,
+    FeatureExtractor,
+    load_audio,
+    snippet_features,
+    snippet_offsets,
+    song_features,
+)
+from sampling import AdaptiveAggregate, spread_order
 from pandas import DataFrame
 
 import constants
@@ -16,6 +28,29 @@ class BeatBotUI(GradioEasyMLUI):
     This UI accepts any music file, process it and shows the genre of the music
     """
 
+    def __init__(
+        self,
+        feature_cache: FeatureCache = None,
+        feature_extractor: FeatureExtractor = None,
+        snippet_budget: int = 24,
+        snippets_per_round: int = 4,
+        **kwargs
+    ):
+        """Initialize BeatBot UI.
+
+        Args:
+            feature_cache (FeatureCache, optional): Cache of features and predictions of already analyzed songs. Defaults to None.
+            feature_extractor (FeatureExtractor, optional): Process pool extracting the features of long songs, None to extract them in the callback thread. Defaults to None.
+            snippet_budget (int, optional): Maximum number of snippets predicted by the adaptive sampling. Defaults to 24.
+            snippets_per_round (int, optional): Snippets extracted and predicted at once by the adaptive sampling. Defaults to 4.
+        """
+
+        self.feature_cache = feature_cache
+        self.feature_extractor = feature_extractor
+        self.snippet_budget = snippet_budget
+        self.snippets_per_round = snippets_per_round
+        super().__init__(**kwargs)
+
     def clicked(self, *kwargs) -> List:
         """Gradio clicked process event to prepare and send REST API request.
 
@@ -30,32 +65,37 @@ class BeatBotUI(GradioEasyMLUI):
         file = parent_kwargs["file"]
         music_array = parent_kwargs["music_array"]
         model_to_use = parent_kwargs["model_to_use"]
+        full_coverage = parent_kwargs.get("full_coverage", False)
 
         # if music file is uploaded
         if file:
-            arrays = self.preprocess_music(file)
-            sum_array = {}
-            for array in arrays:
-                request = self.prepare_request(array, model_to_use)
-                response = self.call_process_api(request)
-
-                # sum up all confidences
-                for x in response["confidences"]:
-                    if x in sum_array.keys():
-                        sum_array[x] += response["confidences"][x]
-                    else:
-                        sum_array[x] = response["confidences"][x]
-
-            # mean of all confidences
-            for key in sum_array.keys():
-                sum_array[key] /= len(arrays)
-            response = {
-                "genre": max(sum_array, key=sum_array.get),
-                "confidences": sum_array,
-            }
-
-            # Delete the temorary file
-            os.remove(file)
+            y = load_audio(file)
+            key = None
+            if self.feature_cache is not None:
+                key = self.feature_cache.fingerprint(y)
+            request = self.prepare_request([], model_to_use)
+
+            sampling = "full" if full_coverage else self.adaptive_sampling
+            # the same song was already analyzed with this model, a prediction
+            # of all snippets also answers the adaptive sampling
+            response = None
+            if key is not None:
+                response = self.feature_cache.get_prediction(key, model_to_use)
+                if response is None and not full_coverage:
+                    response = self.feature_cache.get_prediction(key, model_to_use, sampling)
+            if response is None:
+                if full_coverage:
+                    arrays = self.get_features(y, key)
+                    batch = [self.prepare_request(array.tolist(), model_to_use) for array in arrays]
+                    response = self.predict_song(batch)
+                else:
+                    response = self.predict_adaptive(y, model_to_use, key)
+                if key is not None:
+                    self.feature_cache.put_prediction(key, model_to_use, response, sampling)
+
+            # Delete the temorary file, in-memory uploads have none
+            if isinstance(file, str):
+                os.remove(file)
 
         # if mfcc values are inputed
         elif music_array:
@@ -72,6 +112,117 @@ class BeatBotUI(GradioEasyMLUI):
 
         return self.process_response(request, response)
 
+    @property
+    def adaptive_sampling(self) -> str:
+        """Sampling of adaptive predictions in the feature cache.
+
+        The predicted snippets depend on snippet_budget and snippets_per_round.
+        """
+
+        return "adaptive-{}-{}".format(self.snippet_budget, self.snippets_per_round)
+
+    def get_features(self, y: np.ndarray, key: str = None) -> np.ndarray:
+        """Features of all snippets of a decoded song, from the feature cache if possible.
+
+        Args:
+            y (np.ndarray): Decoded mono samples of the song
+            key (str, optional): Fingerprint of the song in the feature cache. Defaults to None.
+
+        Returns:
+            np.ndarray: float32 array with one row of mfcc values per snippet
+        """
+
+        if key is not None:
+            arrays = self.feature_cache.get_features(key)
+            # the adaptive sampling only extracted some snippets, the others are NaN
+            if arrays is not None and not np.isnan(arrays).any():
+                return arrays
+        if self.feature_extractor is not None:
+            # the callback thread only waits for the worker processes
+            arrays = self.feature_extractor.song_features(y)
+        else:
+            arrays = song_features(y)
+        if key is not None:
+            self.feature_cache.put_features(key, arrays)
+        return arrays
+
+    def predict_song(self, batch: List[APIRequest]) -> APIResponse:
+        """Predict all snippets of a song and average their confidences.
+
+        Args:
+            batch (List[APIRequest]): One request per snippet
+
+        Returns:
+            APIResponse: Main genre and mean confidences of the song
+        """
+
+        # all snippets are predicted with one request
+        responses = self.call_process_batch_api(batch)
+
+        sum_array = {}
+        for response in responses:
+            # sum up all confidences
+            for x in response["confidences"]:
+                if x in sum_array.keys():
+                    sum_array[x] += response["confidences"][x]
+                else:
+                    sum_array[x] = response["confidences"][x]
+
+        # mean of all confidences
+        for key in sum_array.keys():
+            sum_array[key] /= len(batch)
+        return {
+            "genre": max(sum_array, key=sum_array.get),
+            "confidences": sum_array,
+            "snippets": len(batch),
+            "total_snippets": len(batch),
+        }
+
+    def predict_adaptive(self, y: np.ndarray, model_to_use: int, key: str = None) -> APIResponse:
+        """Predict snippets in a spread-out order until the main genre is certain.
+
+        Every round extracts and predicts the next snippets_per_round snippets of the spread-out
+        order. Sampling stops once the lead of the top genre is statistically stable or
+        snippet_budget snippets were predicted, see AdaptiveAggregate.
+
+        Args:
+            y (np.ndarray): Decoded mono samples of the song
+            model_to_use (int): The model which should be used by the service/server for interpreting
+            key (str, optional): Fingerprint of the song in the feature cache. Defaults to None.
+
+        Returns:
+            APIResponse: Main genre and mean confidences of the predicted snippets and their number
+        """
+
+        order = spread_order(len(snippet_offsets(len(y) / SAMPLE_RATE)))
+
+        # only the predicted snippets are extracted, rows of the others stay NaN
+        arrays = None
+        if key is not None:
+            arrays = self.feature_cache.get_features(key)
+        if arrays is None:
+            arrays = np.full((len(order), 2 * N_MFCC), np.nan, dtype=np.float32)
+        else:
+            arrays = arrays.copy()
+        extracted = False
+
+        aggregate = AdaptiveAggregate(len(order), budget=self.snippet_budget)
+        while not aggregate.is_done():
+            start = aggregate.count
+            indices = order[start : start + min(self.snippets_per_round, aggregate.remaining)]
+            missing = [index for index in indices if np.isnan(arrays[index]).any()]
+            if missing:
+                arrays[missing] = snippet_features(y, missing)
+                extracted = True
+            batch = [self.prepare_request(row.tolist(), model_to_use) for row in arrays[indices]]
+            for response in self.call_process_batch_api(batch):
+                aggregate.add(response["confidences"])
+
+        # later requests of the song reuse the extracted snippets
+        if key is not None and extracted:
+            self.feature_cache.put_features(key, arrays)
+        return aggregate.response()
+
     def prepare_request(self, music_array: list, model_to_use: int) -> APIRequest:
         """Create a simple json string that will be send to the service/server
 
@@ -119,65 +270,19 @@ class BeatBotUI(GradioEasyMLUI):
         data["Genre"] = response["confidences"].keys()
         data["Genre Strength"] = response["confidences"].values()
 
-        return (genre, path_to_img, data)
-
-    def preprocess_music(self, file: str):
-        """Compute features of music file, splits the song in multiple snippets and extracts the information of them. The duration of the snippet is specifyed in the constants.py file.
-
-        Args:
-            file (str): Path to the sound file
-
-        Returns:
-            list: List of mfcc lists
-        """
-
-        max_duration = constants.TRAINED_MUSIC_DURATION_IN_SECONDS  # snippet length
-        offset = 0
-        song_duration = librosa.get_duration(path=file)
-
-        arrays = list()
-
-        # if the given song is shorter than the duration the model is trained for we send it anyways as we get a result also. It might not be the best result but still we want it.
-        if song_duration <= max_duration:
-            array = self.get_song_array(file)
-            arrays.append(array)
-            return arrays
-
-        # split the song to max_duration and save them in the return array
-        while song_duration - offset > max_duration:
-            array = self.get_song_array(file, max_duration, offset)
-            arrays.append(array)
-            offset += max_duration
-
-        return arrays
-
-    def get_song_array(
-        self, file: str, duration: int = None, offset: int = None
-    ) -> list:
-        """Generates the mfcc values of the given file in the specified snippet
-
-        Args:
-            file (str): Path to the sound file
-            duration (int, optional): Duration in seconds of the processed snippet. Defaults to None.
-            offset (int, optional): Offset in seconds. Defaults to None.
-
-        Returns:
-            list: MFCC Values of the snippet in the order: [mfcc1_mean,mfcc1_std,mfcc2_mean,...,mfcc20_std]
-        """
+        # report how many snippets the genre is based on
+        if response.get("total_snippets", 0) > 1:
+            genre = "{} ({} of {} snippets)".format(
+                genre, response["snippets"], response["total_snippets"]
+            )
 
-        y, sr = librosa.load(file, mono=True, duration=duration, offset=offset)
-        mfcc = librosa.feature.mfcc(y=y, sr=sr)
-        array = []
-        for e in mfcc:
-            array.append(str(np.mean(e)))
-            array.append(str(np.std(e)))
-        return array
+        return (genre, path_to_img, data)
 
 
 if __name__ == "__main__":
     # creates basically the left ui side
     input_schema = {
-        "file": MusicFile(name="Music File"),
+        "file": MusicFile(name="Music File", in_memory=True),  # no temporary files
         "music_array": TextLong(name="Music Array"),
         "model_to_use": SingleChoice(
             name="Model to use",
@@ -188,6 +293,10 @@ if __name__ == "__main__":
                 "JLibrosa - FMA",
             ],
         ),
+        "full_coverage": Checkbox(
+            name="Analyze whole song",
+            info="Predict every snippet instead of stopping once the genre is certain",
+        ),
     }
 
     # creates basically the right ui side
@@ -239,6 +348,9 @@ if __name__ == "__main__":
         gradio_interface_args=gradio_interface_args,
         gradio_launch_args=gradio_launch_args,
         rest_api_port=8000,  # specify the port of the service
+        rest_api_local_socket=constants.LOCAL_SOCKET,  # falls back to the port if the service runs elsewhere
+        feature_cache=FeatureCache("beatbot_cache.sqlite"),  # repeated songs are a lookup
+        feature_extractor=FeatureExtractor(),  # long songs use all cores
     )
 
     # run the server including the ui
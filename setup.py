@@ -15,6 +15,9 @@ setuptools.setup(
     extras_require={
         'dev': [
             'pytest'
+        ],
+        'msgpack': [
+            'msgpack'
         ]
     },
     author='Oliver Neumann',
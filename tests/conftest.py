@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+import uvicorn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the genre detection modules import their siblings and the shared constants top-level
+for path in (ROOT, os.path.join(ROOT, 'genre_detection')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """QApplication of the Qt tests, rendering offscreen without a display."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    widgets = pytest.importorskip('PyQt6.QtWidgets')
+    return widgets.QApplication.instance() or widgets.QApplication([])
+
+
+@pytest.fixture
+def wait_until(qapp):
+    """Process Qt events until a condition is true, e.g. until signals of worker threads arrived."""
+
+    def wait(condition, timeout: float = 10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError('Condition not met in time.')
+            qapp.processEvents()
+            time.sleep(0.001)
+
+    return wait
+
+
+@pytest.fixture
+def live_server():
+    """Serve an app with uvicorn on a background thread, returns its base URL."""
+    servers = []
+
+    def serve(app, **uvicorn_args) -> str:
+        config = uvicorn.Config(app, host='127.0.0.1', port=0, log_level='warning',
+                                **uvicorn_args)
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        deadline = time.monotonic() + 10
+        while not server.started:
+            if time.monotonic() > deadline or not thread.is_alive():
+                raise RuntimeError('Test server did not start.')
+            time.sleep(0.01)
+        if config.uds is not None:
+            return config.uds
+        port = server.servers[0].sockets[0].getsockname()[1]
+        return f'http://127.0.0.1:{port}'
+
+    yield serve
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(10)
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+
+from easymlserve.service import MicroBatcher
+
+
+class Recorder:
+    """process_batch recording the batches it was called with."""
+
+    def __init__(self, fail=()):
+        self.batches = []
+        self.fail = set(fail)
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.fail & set(items):
+            raise ValueError(f'failed {sorted(self.fail & set(items))}')
+        return [item * 10 for item in items]
+
+
+def test_items_are_grouped_by_batch_key():
+    async def run():
+        batcher = MicroBatcher(max_batch_size=8, max_wait=0.01)
+        recorder = Recorder()
+        results = await asyncio.gather(*[batcher.submit(item % 2, item, recorder)
+                                         for item in range(6)])
+        return results, recorder.batches
+
+    results, batches = asyncio.run(run())
+
+    assert results == [0, 10, 20, 30, 40, 50]
+    assert sorted(batches) == [[0, 2, 4], [1, 3, 5]]
+
+
+def test_full_batch_is_flushed_without_waiting():
+    async def run():
+        batcher = MicroBatcher(max_batch_size=3, max_wait=10)
+        recorder = Recorder()
+        start = time.monotonic()
+        results = await asyncio.gather(*[batcher.submit(None, item, recorder)
+                                         for item in range(3)])
+        return results, recorder.batches, time.monotonic() - start
+
+    results, batches, elapsed = asyncio.run(run())
+
+    assert results == [0, 10, 20]
+    assert batches == [[0, 1, 2]]
+    assert elapsed < 1
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    async def run():
+        batcher = MicroBatcher(max_batch_size=32, max_wait=0.05)
+        recorder = Recorder()
+        first = asyncio.ensure_future(batcher.submit(None, 1, recorder))
+        await asyncio.sleep(0.01)
+        assert not recorder.batches
+        second = asyncio.ensure_future(batcher.submit(None, 2, recorder))
+        return await asyncio.gather(first, second), recorder.batches
+
+    results, batches = asyncio.run(run())
+
+    assert results == [10, 20]
+    assert batches == [[1, 2]]
+
+
+def test_failing_items_are_isolated():
+    async def run():
+        batcher = MicroBatcher(max_batch_size=3, max_wait=0.01)
+        recorder = Recorder(fail={1})
+        return await asyncio.gather(*[batcher.submit(None, item, recorder)
+                                      for item in range(3)], return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert results[0] == 0 and results[2] == 20
+    assert isinstance(results[1], ValueError)
+
+
+def test_cancelled_callers_are_not_processed():
+    async def run():
+        batcher = MicroBatcher(max_batch_size=32, max_wait=0.02)
+        recorder = Recorder()
+        cancelled = asyncio.ensure_future(batcher.submit(None, 1, recorder))
+        kept = asyncio.ensure_future(batcher.submit(None, 2, recorder))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        result = await kept
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return result, recorder.batches
+
+    result, batches = asyncio.run(run())
+
+    assert result == 20
+    assert batches == [[2]]
+
+
+def test_coroutine_process_batch_is_awaited():
+    async def process_batch(items):
+        await asyncio.sleep(0)
+        return [item + 1 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(max_batch_size=2, max_wait=0.01)
+        return await asyncio.gather(*[batcher.submit(None, item, process_batch)
+                                      for item in range(2)])
+
+    assert asyncio.run(run()) == [1, 2]
@@ -0,0 +1,55 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.service import ResponseCache
+
+
+class CountingService(EasyMLService):
+
+    def load_model(self):
+        self.offset = getattr(self, 'offset', -1) + 1
+        self.calls = 0
+
+    def process(self, request: dict) -> dict:
+        self.calls += 1
+        return {'value': request['value'] + self.offset}
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('easymlserve.service.cache.time.monotonic', lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl=10)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.put('c', 3)
+
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    now[0] = 11
+    assert cache.get('a') == (False, None)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_keys_are_stable_and_versioned():
+    cache = ResponseCache()
+    request = {'x': np.arange(3, dtype=np.float32), 'name': 'a'}
+
+    assert cache.key('process', request) == cache.key('process', dict(reversed(request.items())))
+    assert cache.key('process', request) != cache.key('process', {**request, 'name': 'b'})
+    assert cache.key('process', request, 0) != cache.key('process', request, 1)
+
+
+def test_load_model_invalidates_cached_responses():
+    service = CountingService(cache=ResponseCache())
+    client = TestClient(EasyMLServer(service).app)
+
+    assert client.post('/process', json={'value': 1}).json() == {'value': 1}
+    assert client.post('/process', json={'value': 1}).json() == {'value': 1}
+    assert service.calls == 1
+
+    service.load_model()
+    assert service.cache.stats()['entries'] == 0
+    assert client.post('/process', json={'value': 1}).json() == {'value': 2}
+    assert service.calls == 1
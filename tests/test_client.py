@@ -0,0 +1,39 @@
+from fastapi import HTTPException
+
+from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.ui import EasyMLClient
+
+
+class FlakyService(EasyMLService):
+
+    def load_model(self):
+        self.calls = 0
+
+    def process(self, request: dict) -> dict:
+        self.calls += 1
+        if request.get('fail_until', 0) >= self.calls:
+            raise HTTPException(status_code=503, detail='Overloaded',
+                                headers={'Retry-After': '0'})
+        if request.get('reject'):
+            raise HTTPException(status_code=400, detail='Rejected')
+        return {'calls': self.calls}
+
+
+def test_retries_retry_statuses(live_server):
+    service = FlakyService()
+    client = EasyMLClient(live_server(EasyMLServer(service).app), retries=3)
+
+    assert client.process({'fail_until': 2}) == {'calls': 3}
+    client.close()
+
+
+def test_error_responses_are_returned(live_server):
+    service = FlakyService()
+    client = EasyMLClient(live_server(EasyMLServer(service).app), retries=1)
+
+    assert client.process({'reject': True}) == {'detail': 'Rejected'}
+    assert service.calls == 1
+    # the last attempt of a retry status is returned as well
+    assert client.process({'fail_until': 10}) == {'detail': 'Overloaded'}
+    assert service.calls == 3
+    client.close()
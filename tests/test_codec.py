@@ -0,0 +1,119 @@
+import io
+import json
+from multiprocessing import shared_memory
+from typing import List
+
+import msgpack
+import numpy as np
+import requests
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.service.codec import SHARED_MEMORY
+from easymlserve.ui import EasyMLClient, LocalEasyMLClient
+
+
+class TensorRequest(BaseModel):
+    features: List[float]
+    scale: float = 1.0
+
+
+class SumService(EasyMLService):
+    tensor_field = 'features'
+
+    def process(self, request: TensorRequest) -> dict:
+        return {'sum': float(np.sum(request.features)) * request.scale}
+
+
+def client() -> TestClient:
+    return TestClient(EasyMLServer(SumService()).app)
+
+
+def test_raw_float32_body():
+    body = np.array([1, 2, 3], dtype=np.float32).tobytes()
+    response = client().post('/process?scale=2', content=body,
+                             headers={'Content-Type': 'application/octet-stream'})
+
+    assert response.status_code == 200
+    assert response.json() == {'sum': 12.0}
+
+
+def test_raw_body_with_dtype_and_shape_as_batch():
+    body = np.array([[1, 2], [3, 4]], dtype=np.float64).tobytes()
+    response = client().post('/process_batch', content=body,
+                             headers={'Content-Type': 'application/octet-stream',
+                                      'X-Tensor-Dtype': '<f8', 'X-Tensor-Shape': '2,2'})
+
+    assert response.status_code == 200
+    assert response.json() == [{'sum': 3.0}, {'sum': 7.0}]
+
+
+def test_npy_body():
+    buffer = io.BytesIO()
+    np.save(buffer, np.arange(4, dtype=np.float32))
+    response = client().post('/process', content=buffer.getvalue(),
+                             headers={'Content-Type': 'application/x-npy'})
+
+    assert response.status_code == 200
+    assert response.json() == {'sum': 6.0}
+
+
+def test_msgpack_request_and_response():
+    body = msgpack.packb({'features': np.float32([1, 1]).tobytes(), 'scale': 3.0})
+    response = client().post('/process', content=body,
+                             headers={'Content-Type': 'application/msgpack',
+                                      'Accept': 'application/msgpack'})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/msgpack'
+    assert msgpack.unpackb(response.content) == {'sum': 6.0}
+
+
+def test_invalid_binary_body_is_rejected():
+    response = client().post('/process', content=b'\x00\x01\x02',
+                             headers={'Content-Type': 'application/octet-stream'})
+
+    assert response.status_code in (400, 422)
+
+
+def test_json_body_still_validated():
+    assert client().post('/process', json={'features': [1, 2]}).json() == {'sum': 3.0}
+    assert client().post('/process', json={'scale': 1}).status_code == 422
+
+
+def shared_body(memory: shared_memory.SharedMemory, values: np.ndarray) -> bytes:
+    np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)[...] = values
+    reference = {'shm': memory.name, 'dtype': values.dtype.str, 'shape': list(values.shape)}
+    return json.dumps({'features': reference}).encode()
+
+
+def test_shared_memory_is_rejected_over_tcp(live_server, tmp_path):
+    values = np.ones(4, dtype=np.float32)
+    memory = shared_memory.SharedMemory(create=True, size=values.nbytes)
+    server = EasyMLServer(SumService(), local_socket=str(tmp_path / 'service.sock'))
+    try:
+        body = shared_body(memory, values)
+        response = requests.post(live_server(server.app) + '/process', data=body,
+                                 headers={'Content-Type': SHARED_MEMORY})
+        assert response.status_code == 415
+        response = client().post('/process', content=body,
+                                 headers={'Content-Type': SHARED_MEMORY})
+        assert response.status_code == 415
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def test_shared_memory_is_accepted_on_the_local_socket(live_server, tmp_path):
+    path = str(tmp_path / 'service.sock')
+    server = EasyMLServer(SumService(), local_socket=path)
+    live_server(server.app, uds=path)
+    http_client = EasyMLClient('http://127.0.0.1:9', retries=0)
+    local_client = LocalEasyMLClient(path, http_client, min_shared_bytes=0)
+
+    response = local_client.process({'features': np.arange(5, dtype=np.float32), 'scale': 2.0})
+
+    assert response == {'sum': 20.0}
+    assert local_client.unavailable_until == 0.0
+    local_client.close()
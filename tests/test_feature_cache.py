@@ -0,0 +1,103 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+
+import feature_cache  # noqa: E402
+from feature_cache import FeatureCache  # noqa: E402
+
+# bytes of the features of one 8 snippet song
+SONG_BYTES = 8 * 40 * 4
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+
+    def time():
+        now[0] += 1
+        return now[0]
+
+    monkeypatch.setattr(feature_cache.time, "time", time)
+    return now
+
+
+def features(value: float) -> np.ndarray:
+    return np.full((8, 40), value, dtype=np.float32)
+
+
+def test_features_and_predictions_are_stored(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache.db"))
+    cache.put_features("a", features(1))
+    cache.put_prediction("a", 2, {"genre": "Rock"})
+    cache.put_prediction("a", 2, {"genre": "Pop"}, sampling="adaptive-24-4")
+
+    np.testing.assert_array_equal(cache.get_features("a"), features(1))
+    assert cache.get_prediction("a", 2) == {"genre": "Rock"}
+    assert cache.get_prediction("a", 2, "adaptive-24-4") == {"genre": "Pop"}
+    assert cache.get_prediction("a", 0) is None
+    assert cache.get_features("b") is None
+    assert cache.size() == SONG_BYTES + len('{"genre": "Rock"}') + len('{"genre": "Pop"}')
+
+
+def test_predictions_need_the_features_of_their_song(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache.db"))
+    cache.put_prediction("a", 2, {"genre": "Rock"})
+
+    assert cache.get_prediction("a", 2) is None
+    assert cache.size() == 0
+
+
+def test_least_recently_used_songs_are_evicted(tmp_path, clock):
+    cache = FeatureCache(str(tmp_path / "cache.db"), max_bytes=3 * SONG_BYTES + 100)
+    for key in "abc":
+        cache.put_features(key, features(1))
+    cache.put_prediction("a", 2, {"genre": "Rock"})
+    # b is the least recently used song now
+    cache.get_features("a")
+
+    cache.put_features("d", features(1))
+
+    assert cache.get_features("b") is None
+    assert cache.get_prediction("a", 2) == {"genre": "Rock"}
+    assert cache.get_features("c") is not None
+    assert cache.size() <= 3 * SONG_BYTES + 100
+
+
+def test_predictions_count_towards_the_size_limit(tmp_path, clock):
+    cache = FeatureCache(str(tmp_path / "cache.db"), max_bytes=2 * SONG_BYTES)
+    cache.put_features("a", features(1))
+    cache.put_features("b", features(1))
+
+    cache.put_prediction("b", 2, {"genre": "Rock"})
+
+    assert cache.get_features("a") is None
+    assert cache.get_prediction("b", 2) == {"genre": "Rock"}
+    assert cache.size() == SONG_BYTES + len('{"genre": "Rock"}')
+
+
+def test_songs_larger_than_the_cache_are_not_kept(tmp_path, clock):
+    cache = FeatureCache(str(tmp_path / "cache.db"), max_bytes=SONG_BYTES // 2)
+    cache.put_features("a", features(1))
+
+    assert cache.get_features("a") is None
+    assert cache.size() == 0
+
+
+def test_predictions_without_sampling_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE predictions ("
+            "key TEXT, model INTEGER, data TEXT, size INTEGER, PRIMARY KEY (key, model))"
+        )
+        connection.execute("INSERT INTO predictions VALUES ('a', 2, '{}', 2)")
+    connection.close()
+
+    cache = FeatureCache(path)
+    cache.put_features("a", features(1))
+
+    assert cache.get_prediction("a", 2) is None
+    assert cache.size() == SONG_BYTES
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+
+import constants  # noqa: E402
+from features import (  # noqa: E402
+    HOP_LENGTH,
+    N_FFT,
+    N_MFCC,
+    SAMPLE_RATE,
+    FeatureExtractor,
+    StreamingFeatures,
+    mfcc_statistics,
+    snippet_features,
+    snippet_frames,
+    snippet_offsets,
+    song_features,
+)
+
+
+def song(seconds: float) -> np.ndarray:
+    """Noise getting louder over time, so every snippet has another loudest frame."""
+
+    rng = np.random.default_rng(0)
+    length = int(seconds * SAMPLE_RATE)
+    loudness = np.geomspace(1e-4, 1, length)
+    return (rng.standard_normal(length) * loudness).astype(np.float32)
+
+
+def reference_features(y: np.ndarray) -> np.ndarray:
+    """librosa.feature.mfcc of every snippet on its own, with its own 80 dB floor."""
+
+    frames, starts = snippet_frames(len(y), SAMPLE_RATE, snippet_offsets(len(y) / SAMPLE_RATE))
+    mel = librosa.feature.melspectrogram(y=y, sr=SAMPLE_RATE, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    rows = []
+    for start in starts:
+        db = librosa.power_to_db(mel[:, start : start + frames])
+        rows.append(mfcc_statistics(librosa.feature.mfcc(S=db, n_mfcc=N_MFCC)))
+    return np.stack(rows)
+
+
+def test_song_features_use_a_floor_per_snippet():
+    y = song(42)
+    features = song_features(y)
+
+    assert features.shape == (8, 40)
+    np.testing.assert_allclose(features, reference_features(y), rtol=1e-5, atol=1e-4)
+
+
+def test_song_features_approximate_mfcc_of_every_snippet():
+    # starts rounded to hop frames and border frames seeing the neighbouring audio
+    y = song(42)
+    features = song_features(y)
+
+    for row, offset in zip(features, snippet_offsets(len(y) / SAMPLE_RATE)):
+        start = int(round(offset * SAMPLE_RATE))
+        snippet = y[start : start + constants.TRAINED_MUSIC_DURATION_IN_SECONDS * SAMPLE_RATE]
+        mfcc = librosa.feature.mfcc(y=snippet, sr=SAMPLE_RATE, n_mfcc=N_MFCC)
+        np.testing.assert_allclose(row, mfcc_statistics(mfcc), atol=0.5)
+
+
+def test_snippet_features_equal_song_features():
+    y = song(42)
+    indices = [7, 0, 3]
+
+    np.testing.assert_array_equal(snippet_features(y, indices), song_features(y)[indices])
+
+
+def test_short_song_is_one_snippet():
+    y = song(3)
+    mfcc = librosa.feature.mfcc(y=y, sr=SAMPLE_RATE, n_mfcc=N_MFCC)
+
+    np.testing.assert_allclose(song_features(y), mfcc_statistics(mfcc)[np.newaxis], rtol=1e-6)
+    np.testing.assert_array_equal(
+        snippet_features(y, [0, 0]), np.repeat(song_features(y), 2, axis=0)
+    )
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    extractor = FeatureExtractor(max_workers=2, snippets_per_task=2)
+    yield extractor
+    extractor.shutdown()
+
+
+@pytest.mark.parametrize("seconds", [12, 42])
+def test_feature_extractor_equals_song_features(extractor, seconds):
+    # 12 s are processed in the calling process, 42 s in tasks of 2 snippets
+    y = song(seconds)
+
+    np.testing.assert_array_equal(extractor.song_features(y), song_features(y))
+
+
+def test_streaming_features_equal_mfcc_of_uncentered_windows():
+    y = song(12)
+    stream = StreamingFeatures(hop_seconds=2)
+    windows = []
+    for chunk in np.array_split(y, 37):
+        windows.extend(stream.push(chunk))
+
+    hop = round(2 * SAMPLE_RATE / HOP_LENGTH) * HOP_LENGTH
+    assert [start for start, _ in windows] == [i * hop / SAMPLE_RATE for i in range(4)]
+    length = N_FFT + (stream.window_frames - 1) * HOP_LENGTH
+    for start, features in windows:
+        offset = int(round(start * SAMPLE_RATE))
+        mel = librosa.feature.melspectrogram(
+            y=y[offset : offset + length],
+            sr=SAMPLE_RATE,
+            n_fft=N_FFT,
+            hop_length=HOP_LENGTH,
+            center=False,
+        )
+        mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+        np.testing.assert_allclose(features, mfcc_statistics(mfcc), rtol=1e-5, atol=1e-4)
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [{"sample_rate": 0}, {"hop_seconds": 0}, {"hop_seconds": -1}, {"window_seconds": 0.01}],
+)
+def test_streaming_features_reject_invalid_arguments(arguments):
+    with pytest.raises(ValueError):
+        StreamingFeatures(**arguments)
@@ -0,0 +1,144 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+pytest.importorskip("librosa")
+
+import constants  # noqa: E402
+import service as genre_service  # noqa: E402
+import soundfile  # noqa: E402
+from easymlserve import EasyMLServer  # noqa: E402
+from easymlserve.service import NumpyModel  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from features import SAMPLE_RATE  # noqa: E402
+from service import GenreDetectionService  # noqa: E402
+from starlette.websockets import WebSocketDisconnect  # noqa: E402
+
+GENRE_FOLDER = os.path.dirname(os.path.abspath(genre_service.__file__))
+
+
+def keras_model(*hidden_layers) -> "tf.keras.Sequential":
+    """Model with the in- and outputs of the trained models, which are not in the repository."""
+    tf.keras.utils.set_random_seed(0)
+    return tf.keras.Sequential(
+        [
+            tf.keras.Input(shape=(40,)),
+            tf.keras.layers.Dense(16, activation="relu"),
+            *hidden_layers,
+            tf.keras.layers.Dense(10, activation="softmax"),
+        ]
+    )
+
+
+def test_dense_model_is_folded_into_numpy(monkeypatch):
+    monkeypatch.setattr(tf.keras.models, "load_model", lambda path: keras_model())
+
+    scaler, model = GenreDetectionService().load_model_files(GENRE_FOLDER, "jlibrosa_gtzan")
+
+    assert scaler is None
+    assert isinstance(model, NumpyModel)
+
+
+def test_unsupported_model_falls_back_to_tensorflow(monkeypatch, caplog):
+    original = keras_model(tf.keras.layers.LeakyReLU())
+    monkeypatch.setattr(tf.keras.models, "load_model", lambda path: original)
+
+    scaler, model = GenreDetectionService().load_model_files(GENRE_FOLDER, "jlibrosa_gtzan")
+
+    assert model is original
+    assert scaler is not None
+    assert "using TensorFlow" in caplog.text
+    inputs = np.tile(scaler.mean_, (2, 1))
+    assert len(GenreDetectionService().get_batch_return_values(inputs, scaler, model)) == 2
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(tf.keras.models, "load_model", lambda path: keras_model())
+    with TestClient(EasyMLServer(GenreDetectionService()).app) as client:
+        yield client
+
+
+def noise(seconds: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.1).astype(np.float32)
+
+
+def test_stream_predicts_completed_windows(client):
+    samples = (noise(7) * 32767).astype("<i2").tobytes()
+
+    with client.websocket_connect("/stream?dtype=int16&hop_seconds=1") as websocket:
+        # chunks end within a sample
+        for offset in range(0, len(samples), 44101):
+            websocket.send_bytes(samples[offset : offset + 44101])
+        results = [websocket.receive_json() for _ in range(3)]
+
+    assert [result["start"] for result in results] == pytest.approx([0, 1, 2], abs=0.02)
+    for result in results:
+        assert result["genre"] in constants.GTZAN_GENRES
+        assert sum(result["confidences"].values()) == pytest.approx(1, abs=1e-4)
+
+
+@pytest.mark.parametrize(
+    "query", ["hop_seconds=0", "hop_seconds=-1", "sample_rate=0", "sample_rate=abc", "dtype=int8"]
+)
+def test_stream_rejects_invalid_parameters(client, query):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/stream?" + query):
+            pass
+    assert closed.value.code == 1008
+
+
+def wav(seconds: float) -> bytes:
+    buffer = io.BytesIO()
+    soundfile.write(buffer, noise(seconds), SAMPLE_RATE, format="WAV")
+    return buffer.getvalue()
+
+
+def test_process_audio_multipart(client):
+    response = client.post(
+        "/process_audio",
+        files={"file": ("song.wav", wav(12), "audio/wav")},
+        data={"model_to_use": "1"},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["snippets"] == 2
+    assert set(body["confidences"]) == set(constants.FMA_GENRES)
+    assert body["genre"] == max(body["confidences"], key=body["confidences"].get)
+
+
+def test_process_audio_raw_body(client):
+    response = client.post(
+        "/process_audio?model_to_use=2",
+        content=wav(6),
+        headers={"Content-Type": "application/octet-stream"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["snippets"] == 1
+    assert set(response.json()["confidences"]) == set(constants.GTZAN_GENRES)
+
+
+def test_process_audio_rejects_undecodable_files(client):
+    response = client.post("/process_audio", files={"file": ("song.mp3", b"no audio" * 100)})
+
+    assert response.status_code == 415
+
+
+def test_process_audio_rejects_invalid_model(client):
+    response = client.post("/process_audio?model_to_use=abc", content=wav(1))
+
+    assert response.status_code == 400
+
+
+def test_process_audio_rejects_large_uploads(client, monkeypatch):
+    monkeypatch.setattr(GenreDetectionService, "max_upload_bytes", 1000)
+
+    response = client.post("/process_audio", files={"file": ("song.wav", wav(1), "audio/wav")})
+
+    assert response.status_code == 413
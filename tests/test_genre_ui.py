@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("gradio")
+pytest.importorskip("librosa")
+
+import ui as genre_ui  # noqa: E402
+from easymlserve.ui.type import Checkbox, MusicFile, SingleChoice, Text, TextLong  # noqa: E402
+from feature_cache import FeatureCache  # noqa: E402
+from features import SAMPLE_RATE, song_features  # noqa: E402
+from sampling import spread_order  # noqa: E402
+from ui import BeatBotUI  # noqa: E402
+
+
+class RecordingUI(BeatBotUI):
+    """UI which predicts the first two mfcc values instead of calling the service."""
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            name="BeatBot",
+            input_schema={
+                "file": MusicFile(name="Music File", in_memory=True),
+                "music_array": TextLong(name="Music Array"),
+                "model_to_use": SingleChoice(name="Model to use", choices=["a", "b"]),
+                "full_coverage": Checkbox(name="Analyze whole song"),
+            },
+            output_schema=[Text(name="Genre")],
+            **kwargs
+        )
+        self.rows = []
+
+    def call_process_batch_api(self, batch):
+        self.rows.extend(request["music_array"] for request in batch)
+        return [
+            {"confidences": {"a": row[0], "b": row[1]}}
+            for row in (request["music_array"] for request in batch)
+        ]
+
+
+def song(seconds: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    length = int(seconds * SAMPLE_RATE)
+    return (rng.standard_normal(length) * np.geomspace(1e-4, 1, length)).astype(np.float32)
+
+
+def test_adaptive_sampling_uses_the_features_of_full_coverage():
+    y = song(42)
+    ui = RecordingUI(snippet_budget=6, snippets_per_round=2)
+
+    response = ui.predict_adaptive(y, 0)
+
+    indices = spread_order(8)[: response["snippets"]]
+    np.testing.assert_array_equal(np.array(ui.rows, dtype=np.float32), song_features(y)[indices])
+
+
+def test_cached_features_equal_adaptive_features(tmp_path):
+    y = song(42)
+    cache = FeatureCache(str(tmp_path / "features.db"))
+    key = cache.fingerprint(y)
+    full = RecordingUI(feature_cache=cache)
+    np.testing.assert_array_equal(full.get_features(y, key), song_features(y))
+
+    uncached = RecordingUI(snippet_budget=4, snippets_per_round=4)
+    cached = RecordingUI(feature_cache=cache, snippet_budget=4, snippets_per_round=4)
+    uncached.predict_adaptive(y, 0)
+    cached.predict_adaptive(y, 0, key)
+
+    np.testing.assert_array_equal(np.array(cached.rows), np.array(uncached.rows))
+
+
+def test_adaptive_features_are_cached(tmp_path, monkeypatch):
+    y = song(42)
+    cache = FeatureCache(str(tmp_path / "features.db"))
+    key = cache.fingerprint(y)
+    first = RecordingUI(feature_cache=cache, snippet_budget=4, snippets_per_round=4)
+    first.predict_adaptive(y, 0, key)
+
+    # only the predicted snippets were extracted
+    cached = cache.get_features(key)
+    indices = spread_order(8)[:4]
+    others = sorted(set(range(8)) - set(indices))
+    np.testing.assert_array_equal(cached[indices], song_features(y)[indices])
+    assert np.isnan(cached[others]).all()
+
+    def extract(y, indices):
+        raise AssertionError("extracted again")
+
+    monkeypatch.setattr(genre_ui, "snippet_features", extract)
+    second = RecordingUI(feature_cache=cache, snippet_budget=4, snippets_per_round=4)
+    second.predict_adaptive(y, 1, key)
+    assert second.rows == first.rows
+    # a full analysis extracts the missing snippets
+    np.testing.assert_array_equal(second.get_features(y, key), song_features(y))
+
+
+def test_adaptive_predictions_are_cached(tmp_path):
+    y = song(42)
+    cache = FeatureCache(str(tmp_path / "features.db"))
+    ui = RecordingUI(feature_cache=cache, snippet_budget=4, snippets_per_round=4)
+
+    first = ui.clicked((SAMPLE_RATE, y), "", 0, False)
+    requests = len(ui.rows)
+    second = ui.clicked((SAMPLE_RATE, y), "", 0, False)
+    assert second[0] == first[0]
+    assert len(ui.rows) == requests
+
+    # another budget samples other snippets
+    ui.snippet_budget = 8
+    ui.clicked((SAMPLE_RATE, y), "", 0, False)
+    assert len(ui.rows) > requests
+
+    # a prediction of all snippets also answers adaptive requests
+    requests = len(ui.rows)
+    full = ui.clicked((SAMPLE_RATE, y), "", 1, True)
+    assert ui.clicked((SAMPLE_RATE, y), "", 1, False)[0] == full[0]
+    assert len(ui.rows) == requests + 8
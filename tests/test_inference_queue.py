@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.service import InferenceQueue
+
+
+class BlockingService(EasyMLService):
+
+    def __init__(self, **kwargs):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        super().__init__(**kwargs)
+
+    def process(self, request: dict) -> dict:
+        self.started.set()
+        self.release.wait(5)
+        return request
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def run():
+        queue = InferenceQueue(max_concurrency=1, max_queue_size=0, status_code=429,
+                               retry_after=3)
+        async with queue.slot():
+            with pytest.raises(HTTPException) as rejected:
+                async with queue.slot():
+                    pass
+        assert queue.running == 0 and queue.waiting == 0
+        return rejected.value
+
+    rejected = asyncio.run(run())
+
+    assert rejected.status_code == 429
+    assert rejected.headers == {'Retry-After': '3'}
+
+
+def test_deadline_expiring_while_waiting_gives_504():
+    class Request:
+        headers = {InferenceQueue.deadline_header: str(time.time() + 0.1)}
+
+        async def is_disconnected(self):
+            return False
+
+    async def run():
+        queue = InferenceQueue(max_concurrency=1, poll_interval=0.01)
+        async with queue.slot():
+            with pytest.raises(HTTPException) as expired:
+                async with queue.slot(Request()):
+                    pass
+        # the slot of the expired request is not leaked
+        async with queue.slot():
+            pass
+        assert queue.running == 0 and queue.waiting == 0
+        return expired.value
+
+    assert asyncio.run(run()).status_code == 504
+
+
+def test_process_route_sheds_load():
+    service = BlockingService(queue=InferenceQueue(max_concurrency=1, max_queue_size=0,
+                                                   status_code=429))
+    client = TestClient(EasyMLServer(service).app)
+    blocked = threading.Thread(target=client.post, args=('/process',), kwargs={'json': {}})
+    blocked.start()
+    try:
+        assert service.started.wait(5)
+        response = client.post('/process', json={'a': 1})
+        assert response.status_code == 429
+        assert response.headers['retry-after'] == '1'
+
+        response = client.post('/process', json={'a': 1},
+                               headers={InferenceQueue.deadline_header: str(time.time() - 1)})
+        assert response.status_code == 504
+    finally:
+        service.release.set()
+        blocked.join(5)
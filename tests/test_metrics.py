@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+
+from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.server import ServiceMount
+from easymlserve.service import InferenceQueue
+
+
+class QueuedService(EasyMLService):
+
+    def process(self, request: dict) -> dict:
+        return request
+
+
+def test_queue_gauges_per_mount():
+    first = QueuedService(queue=InferenceQueue())
+    second = QueuedService(queue=InferenceQueue())
+    first.queue.waiting, second.queue.waiting = 3, 5
+    server = EasyMLServer([ServiceMount(first, prefix='/first'),
+                           ServiceMount(second, prefix='/second')])
+
+    metrics = TestClient(server.app).get('/metrics').text
+
+    assert 'easymlserve_queue_waiting{service="QueuedService",prefix="/first"} 3' in metrics
+    assert 'easymlserve_queue_waiting{service="QueuedService",prefix="/second"} 5' in metrics
+
+
+def test_requests_and_stages_are_recorded():
+    client = TestClient(EasyMLServer(QueuedService()).app)
+    assert client.post('/process', json={'a': 1}).status_code == 200
+
+    metrics = client.get('/metrics').text
+
+    assert 'easymlserve_requests_total{method="POST",route="/process",status="200"}' in metrics
+    assert 'easymlserve_stage_duration_seconds_count{service="QueuedService",stage="process"}' \
+        in metrics
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from easymlserve.service import NumpyModel, fold_scaler
+
+tf = pytest.importorskip('tensorflow')
+preprocessing = pytest.importorskip('sklearn.preprocessing')
+
+
+def dense_model(*preprocessing_layers) -> 'tf.keras.Sequential':
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(8,)),
+        *preprocessing_layers,
+        tf.keras.layers.Dense(16, activation='relu'),
+        tf.keras.layers.Dropout(0.5),
+        tf.keras.layers.Dense(16),
+        tf.keras.layers.BatchNormalization(),
+        tf.keras.layers.Dense(4, activation='softmax'),
+    ])
+    # non-trivial statistics of the normalization layer
+    batch_norm = model.layers[-2]
+    gamma, beta, mean, variance = batch_norm.get_weights()
+    batch_norm.set_weights([gamma * 1.5, beta + 0.1, mean + 0.2, variance * 2])
+    return model
+
+
+def inputs(rows: int = 32) -> np.ndarray:
+    return np.random.default_rng(1).standard_normal((rows, 8)).astype(np.float32) * 3 + 1
+
+
+@pytest.mark.parametrize('preprocessing_layers', [
+    [],
+    [lambda: tf.keras.layers.Rescaling(1 / 255, offset=-0.5)],
+    [lambda: tf.keras.layers.Rescaling(np.linspace(0.5, 2, 8).tolist())],
+])
+def test_from_keras_matches_predict(preprocessing_layers):
+    model = dense_model(*[layer() for layer in preprocessing_layers])
+    numpy_model = NumpyModel.from_keras(model)
+
+    np.testing.assert_allclose(numpy_model.predict(inputs()),
+                               model.predict(inputs(), verbose=0), atol=1e-5, rtol=1e-4)
+
+
+def test_fold_scaler_matches_scaler_and_predict():
+    model = dense_model(tf.keras.layers.Rescaling(2.0))
+    scaler = preprocessing.StandardScaler().fit(inputs(256))
+    folded = fold_scaler(scaler, model)
+
+    expected = model.predict(scaler.transform(inputs()), verbose=0)
+    np.testing.assert_allclose(folded.predict(inputs()), expected, atol=1e-5, rtol=1e-4)
+    assert folded.input_size == 8
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt6.QtWidgets')
+plt = pytest.importorskip('matplotlib.pyplot')
+
+from matplotlib.patches import Rectangle  # noqa: E402
+
+from easymlserve.ui.type.components.qt.image_ui import QtImageUI, array_to_pixmap  # noqa: E402
+from easymlserve.ui.type.components.qt.plot_ui import QtPlotUI  # noqa: E402
+
+
+def image(channels: int) -> np.ndarray:
+    """Image with a distinct value per pixel and channel."""
+    values = (np.arange(5 * 7 * channels).reshape(5, 7, channels) * 3 % 256).astype(np.uint8)
+    if channels == 4:
+        # colors of almost transparent pixels are lost by premultiplied pixmaps
+        values[..., 3] |= 0x80
+    return values if channels > 1 else values[..., 0]
+
+
+def pixels(pixmap) -> np.ndarray:
+    """RGBA values of every pixel of pixmap, (height, width, 4)."""
+    qimage = pixmap.toImage()
+    return np.array([[qimage.pixelColor(x, y).getRgb() for x in range(qimage.width())]
+                     for y in range(qimage.height())])
+
+
+@pytest.mark.parametrize('channels', [1, 3, 4])
+def test_array_to_pixmap(qapp, channels):
+    array = image(channels)
+    pixmap = array_to_pixmap(array)
+
+    assert (pixmap.width(), pixmap.height()) == (7, 5)
+    assert pixmap.hasAlphaChannel() == (channels == 4)
+    expected = np.empty((5, 7, 4), dtype=int)
+    expected[..., :3] = array[..., :3] if channels > 1 else array[..., np.newaxis]
+    expected[..., 3] = array[..., 3] if channels == 4 else 255
+    if channels == 4:
+        # premultiplied pixmaps round colors of translucent pixels
+        np.testing.assert_allclose(pixels(pixmap), expected, atol=2)
+    else:
+        np.testing.assert_array_equal(pixels(pixmap), expected)
+
+
+def test_array_to_pixmap_of_strided_array(qapp):
+    array = image(3)
+    view = array[::2, ::-1]
+
+    np.testing.assert_array_equal(pixels(array_to_pixmap(view))[..., :3], view)
+
+
+def test_image_ui_keeps_its_pixmap(qapp):
+    widget = QtImageUI(name='Image', kind='output')
+    widget.set_value(image(3))
+    assert (widget.pixmap.width(), widget.pixmap.height()) == (7, 5)
+
+    widget.set_value(None)
+    assert widget.pixmap is None
+
+
+def test_plot_ui_renders_the_figure(qapp):
+    figure = plt.figure(figsize=(4, 3), dpi=50, facecolor=(1, 0, 0))
+    # top right quarter blue, the pixmap must not be flipped or mirrored
+    figure.add_artist(Rectangle((0.5, 0.5), 0.5, 0.5, transform=figure.transFigure, color='b'))
+    widget = QtPlotUI(name='Plot', kind='output')
+
+    widget.set_value(figure)
+    plt.close(figure)
+
+    assert (widget.pixmap.width(), widget.pixmap.height()) == (200, 150)
+    rendered = pixels(widget.pixmap)
+    assert tuple(rendered[30, 150]) == (0, 0, 255, 255)
+    for y, x in [(30, 50), (120, 50), (120, 150)]:
+        assert tuple(rendered[y, x]) == (255, 0, 0, 255)
+    assert widget.figure_plane.pixmap() is not None
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('PyQt6.QtWidgets')
+
+from easymlserve.ui import QtEasyMLUI  # noqa: E402
+from easymlserve.ui.qt_worker import RequestQueue  # noqa: E402
+from easymlserve.ui.type import Text  # noqa: E402
+
+
+def record(queue: RequestQueue) -> list:
+    delivered = []
+    queue.result_ready.connect(lambda result: delivered.append(result))
+    queue.error.connect(lambda exception: delivered.append(str(exception)))
+    return delivered
+
+
+def sleep_and_return(value, seconds: float):
+    time.sleep(seconds)
+    if isinstance(value, Exception):
+        raise value
+    return value
+
+
+def test_results_are_delivered_in_submission_order(qapp, wait_until):
+    queue = RequestQueue(max_in_flight=4)
+    delivered = record(queue)
+    # later requests finish first
+    for value, seconds in [(0, 0.3), (1, 0.2), (ValueError('failed'), 0.1), (3, 0)]:
+        queue.submit(sleep_and_return, value=value, seconds=seconds)
+
+    wait_until(lambda: queue.pending == 0)
+
+    assert delivered == [0, 1, 'failed', 3]
+
+
+def test_cancel_all_drops_running_and_waiting_requests(qapp, wait_until):
+    queue = RequestQueue(max_in_flight=1)
+    delivered = record(queue)
+    progress = []
+    queue.progress.connect(lambda done, total: progress.append((done, total)))
+    release = threading.Event()
+    started = []
+
+    def blocked():
+        started.append(True)
+        release.wait(10)
+        return 'stale'
+
+    queue.submit(blocked)
+    # waits for the only thread
+    queue.submit(sleep_and_return, value='never', seconds=0)
+    wait_until(lambda: started)
+
+    queue.cancel_all()
+    assert queue.pending == 0
+    assert progress[-1] == (0, 0)
+    release.set()
+    queue.submit(sleep_and_return, value='fresh', seconds=0)
+    wait_until(lambda: queue.pending == 0 and not queue.workers)
+
+    assert delivered == ['fresh']
+    assert started == [True]
+
+
+class ThreadUI(QtEasyMLUI):
+    """UI recording the threads the request is prepared, sent and processed on."""
+
+    def __init__(self):
+        super().__init__(name='Threads', input_schema={}, output_schema=[Text(name='Result')])
+        self.threads = {}
+
+    def prepare_request(self, **kwargs):
+        self.threads['prepare_request'] = threading.current_thread()
+        return {}
+
+    def call_process_api(self, request):
+        self.threads['call_process_api'] = threading.current_thread()
+        return {'result': 'done'}
+
+    def process_response(self, request, response):
+        self.threads['process_response'] = threading.current_thread()
+        return response['result']
+
+
+def test_process_response_runs_on_the_gui_thread(qapp, wait_until):
+    ui = ThreadUI()
+
+    ui.clicked()
+    wait_until(lambda: 'process_response' in ui.threads)
+
+    assert ui.threads['prepare_request'] is not threading.main_thread()
+    assert ui.threads['call_process_api'] is not threading.main_thread()
+    assert ui.threads['process_response'] is threading.main_thread()
+    assert ui.outputs[0].get_value() == 'done'
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.metrics import MetricsRegistry
+from easymlserve.server import RateLimit, RateLimiter
+
+
+class EchoService(EasyMLService):
+
+    def process(self, request: dict) -> dict:
+        return request
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('easymlserve.server.rate_limit.time.monotonic', lambda: now[0])
+    return now
+
+
+def test_request_bucket_refills(clock):
+    limiter = RateLimiter(RateLimit(requests_per_second=2, burst=2), registry=MetricsRegistry())
+    for _ in range(2):
+        limiter.acquire('key')
+        limiter.release('key')
+
+    with pytest.raises(HTTPException) as rejected:
+        limiter.acquire('key')
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers['Retry-After'] == '1'
+    assert rejected.value.headers['X-RateLimit-Reset'] == '0.500'
+
+    clock[0] += 0.5
+    limiter.acquire('key')
+    assert limiter.usage()[limiter.key_id('key')] == {
+        'accepted': 3, 'rejected': 1, 'bytes': 0, 'in_flight': 1}
+
+
+def test_byte_bucket_and_concurrency(clock):
+    limiter = RateLimiter(limits={'big': RateLimit(bytes_per_second=100, max_concurrency=1)},
+                          registry=MetricsRegistry())
+    limiter.acquire('big', 80)
+    with pytest.raises(HTTPException, match='concurrency'):
+        limiter.acquire('big', 10)
+    limiter.release('big')
+    with pytest.raises(HTTPException, match='bytes'):
+        limiter.acquire('big', 30)
+    # keys without own limit use the unlimited default
+    for _ in range(10):
+        limiter.acquire('other', 1000)
+
+
+def test_limits_are_per_api_key(clock):
+    server = EasyMLServer(EchoService(), api_keys={'limited': RateLimit(requests_per_second=1),
+                                                   'free': None})
+    client = TestClient(server.app)
+
+    assert client.post('/process', json={}, headers={'x-api-key': 'limited'}).status_code == 200
+    response = client.post('/process', json={}, headers={'x-api-key': 'limited'})
+    assert response.status_code == 429
+    assert 'retry-after' in response.headers
+    for _ in range(3):
+        assert client.post('/process', json={}, headers={'x-api-key': 'free'}).status_code == 200
+
+
+def test_malformed_content_length_is_rejected():
+    server = EasyMLServer(EchoService(), api_keys={'limited': RateLimit(bytes_per_second=100)})
+    client = TestClient(server.app)
+
+    for content_length in ('abc', '-5'):
+        response = client.post('/process', content=b'{}',
+                               headers={'x-api-key': 'limited', 'content-length': content_length})
+        assert response.status_code == 400
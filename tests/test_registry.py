@@ -0,0 +1,68 @@
+import numpy as np
+
+from easymlserve import EasyMLService
+from easymlserve.service import ModelRegistry
+
+
+def loader(loads: list, key: str, size: int = 100):
+    def load():
+        loads.append(key)
+        return np.zeros(size, dtype=np.uint8)
+    return load
+
+
+def test_least_recently_used_unpinned_models_are_evicted():
+    loads = []
+    registry = ModelRegistry(memory_budget=250)
+    registry.register('pinned', loader(loads, 'pinned'), pinned=True)
+    registry.register('a', loader(loads, 'a'))
+    registry.register('b', loader(loads, 'b'))
+
+    registry.get('pinned')
+    registry.get('a')
+    registry.get('b')
+
+    assert registry.is_loaded('pinned')
+    assert not registry.is_loaded('a')
+    assert registry.is_loaded('b')
+    assert registry.memory_usage == 200
+
+    registry.get('a')
+    assert loads == ['pinned', 'a', 'b', 'a']
+    assert not registry.is_loaded('b')
+
+
+def test_namespaces_share_the_budget():
+    loads = []
+    registry = ModelRegistry(memory_budget=150)
+    first, second = registry.namespace('first'), registry.namespace('second')
+    first.register(1, loader(loads, 'first'))
+    second.register(1, loader(loads, 'second'))
+
+    first.get(1)
+    second.get(1)
+
+    assert first.keys() == [1] and second.keys() == [1]
+    assert not first.is_loaded(1) and second.is_loaded(1)
+    assert [report['key'] for report in second.memory_report()] == [1]
+
+
+def test_prepare_loads_pinned_models_by_default():
+    loads = []
+
+    class Service(EasyMLService):
+
+        def load_model(self):
+            self.models.register('pinned', loader(loads, 'pinned'), pinned=True)
+            self.models.register('lazy', loader(loads, 'lazy'))
+
+        def process(self, request: dict) -> dict:
+            return request
+
+    service = Service()
+    service.prepare()
+    assert loads == ['pinned'] and service.ready
+
+    loads.clear()
+    Service(preload_models=['lazy', 'pinned']).prepare()
+    assert sorted(loads) == ['lazy', 'pinned']
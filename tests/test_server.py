@@ -0,0 +1,44 @@
+import os
+import socket
+
+import pytest
+
+from easymlserve import EasyMLServer, EasyMLService
+
+
+class EchoService(EasyMLService):
+
+    def process(self, request: dict) -> dict:
+        return request
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_invalid_worker_configuration_binds_no_socket(tmp_path):
+    port = free_port()
+    local_socket = str(tmp_path / 'service.sock')
+    server = EasyMLServer(EchoService, workers=(os.cpu_count() or 1) + 1, cpu_affinity=True,
+                          uvicorn_args={'port': port}, local_socket=local_socket)
+
+    with pytest.raises((ValueError, RuntimeError)):
+        server.deploy()
+
+    assert not os.path.exists(local_socket)
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', port))
+
+
+def test_failing_local_socket_closes_tcp_socket(tmp_path):
+    port = free_port()
+    server = EasyMLServer(EchoService(), uvicorn_args={'port': port},
+                          local_socket=str(tmp_path / 'missing' / 'service.sock'))
+
+    with pytest.raises(OSError):
+        server._bind_sockets()
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', port))
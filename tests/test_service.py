@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from easymlserve import EasyMLServer, EasyMLService
+from easymlserve.service import InferenceQueue, MicroBatcher
+
+
+class AsyncService(EasyMLService):
+
+    async def process(self, request: dict) -> dict:
+        await asyncio.sleep(0)
+        return {'double': request['value'] * 2}
+
+
+def test_async_process_in_batches():
+    client = TestClient(EasyMLServer(AsyncService()).app)
+
+    assert client.post('/process', json={'value': 1}).json() == {'double': 2}
+    response = client.post('/process_batch', json=[{'value': 1}, {'value': 2}])
+    assert response.status_code == 200
+    assert response.json() == [{'double': 2}, {'double': 4}]
+
+
+def test_async_process_behind_batcher():
+    service = AsyncService(batcher=MicroBatcher(max_batch_size=4, max_wait=0.001))
+    client = TestClient(EasyMLServer(service).app)
+
+    assert client.post('/process', json={'value': 3}).json() == {'double': 6}
+
+
+def test_probes_need_no_api_key():
+    client = TestClient(EasyMLServer(AsyncService(), api_keys=['secret']).app)
+
+    assert client.get('/ready').status_code in (200, 503)
+    assert client.get('/models').json() == []
+    assert client.post('/process', json={'value': 1}).status_code in (400, 422)
+    assert client.post('/process', json={'value': 1},
+                       headers={'x-api-key': 'secret'}).json() == {'double': 2}
+
+
+class ChunkService(AsyncService):
+
+    def open_stream(self, params: dict) -> dict:
+        if 'invalid' in params:
+            raise ValueError('invalid parameter')
+        return {'received': 0}
+
+    def process_stream(self, state: dict, chunk: bytes) -> list:
+        state['received'] += len(chunk)
+        return [{'received': state['received']}]
+
+
+def test_stream_sends_results_per_chunk():
+    client = TestClient(EasyMLServer(ChunkService()).app)
+
+    with client.websocket_connect('/stream') as websocket:
+        websocket.send_bytes(b'12')
+        assert websocket.receive_json() == {'received': 2}
+        websocket.send_bytes(b'345')
+        assert websocket.receive_json() == {'received': 5}
+
+
+def test_stream_rejects_invalid_parameters():
+    client = TestClient(EasyMLServer(ChunkService()).app)
+
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect('/stream?invalid=1'):
+            pass
+    assert closed.value.code == 1008
+
+
+def test_stream_is_closed_if_inference_queue_is_full():
+    queue = InferenceQueue(max_concurrency=1, max_queue_size=0)
+    client = TestClient(EasyMLServer(ChunkService(queue=queue)).app)
+
+    with client.websocket_connect('/stream') as websocket:
+        # all slots taken by other requests
+        queue._semaphore = asyncio.Semaphore(0)
+        websocket.send_bytes(b'12')
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 1013
@@ -0,0 +1,17 @@
+import pytest
+
+gradio = pytest.importorskip('gradio')
+
+from easymlserve.ui.type import MusicFile  # noqa: E402
+
+
+def test_music_file_is_passed_in_memory_or_as_file():
+    assert MusicFile(name='Song', in_memory=True).to_gradio().type == 'numpy'
+    assert MusicFile(name='Song').to_gradio().type == 'filepath'
+    # streamed uploads are read from the temporary file
+    assert MusicFile(name='Song', streaming=True).to_gradio().type == 'filepath'
+
+
+def test_streamed_music_file_can_not_be_in_memory():
+    with pytest.raises(ValueError):
+        MusicFile(name='Song', in_memory=True, streaming=True)
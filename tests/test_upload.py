@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from easymlserve import EasyMLServer, EasyMLService
+
+
+class SizeService(EasyMLService):
+    max_upload_bytes = 10_000
+
+    def process(self, request: dict) -> dict:
+        return request
+
+    def process_upload(self, file: UploadFile, params: dict) -> dict:
+        return {'size': len(file.file.read()), **params}
+
+
+def app():
+    return EasyMLServer(SizeService()).app
+
+
+def multipart(size: int) -> bytes:
+    return (b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.bin"\r\n'
+            b'Content-Type: application/octet-stream\r\n\r\n' + b'x' * size + b'\r\n--b--\r\n')
+
+
+def test_uploads_within_the_limit():
+    client = TestClient(app())
+
+    response = client.post('/upload?tag=a', content=b'x' * 5000,
+                           headers={'Content-Type': 'application/octet-stream'})
+    assert response.json() == {'size': 5000, 'tag': 'a'}
+    response = client.post('/upload', files={'file': ('a.bin', b'x' * 5000)}, data={'tag': 'b'})
+    assert response.json() == {'size': 5000, 'tag': 'b'}
+
+
+def test_too_large_bodies_are_rejected():
+    client = TestClient(app())
+
+    response = client.post('/upload', content=b'x' * 20_000,
+                           headers={'Content-Type': 'application/octet-stream'})
+    assert response.status_code == 413
+    response = client.post('/upload', files={'file': ('a.bin', b'x' * 20_000)})
+    assert response.status_code == 413
+
+
+def test_chunked_multipart_body_is_rejected_while_streaming():
+    body = multipart(100_000)
+    sent = []
+
+    async def chunks():
+        for start in range(0, len(body), 1000):
+            sent.append(start)
+            yield body[start:start + 1000]
+
+    async def post():
+        transport = httpx.ASGITransport(app=app())
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.post('/upload', content=chunks(),
+                                     headers={'Content-Type': 'multipart/form-data; boundary=b'})
+
+    response = asyncio.run(post())
+
+    assert response.status_code == 413
+    assert len(sent) < 20